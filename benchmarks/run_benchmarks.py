@@ -0,0 +1,181 @@
+"""Time the main operations of the tracker on synthetic logs of several sizes and output the results as JSON.
+
+Usage: python -m benchmarks.run_benchmarks [--years 1 3 10] [--repeats 5] [--seed 0] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from benchmarks.synthetic_logs import write_synthetic_logs
+from worktime_tracker import logs
+from worktime_tracker.binary_logs import convert_tsv_to_binary
+from worktime_tracker.config import Config
+from worktime_tracker.history import History
+from worktime_tracker.logs import Log, get_day_cache_path, read_last_log, rewrite_history, write_log
+from worktime_tracker.sqlite_logs import convert_tsv_to_sqlite
+from worktime_tracker.tools import get_ghost_plot, get_hourly_worktime_df, get_productivity_plot
+from worktime_tracker.worktime_tracker import WorktimeTracker
+
+# The benchmarks run as if it was this Wednesday afternoon so that they measure the same work whatever the actual date
+# (e.g. there is no ghost plot on weekends)
+FROZEN_NOW = datetime.datetime(2024, 6, 12, 16, 0)
+REAL_DATETIME = datetime.datetime
+
+
+class FrozenDatetimeMeta(type):
+    def __instancecheck__(cls, instance):
+        # Datetimes created before freezing the time are still datetimes
+        return isinstance(instance, REAL_DATETIME)
+
+
+class FrozenDatetime(REAL_DATETIME, metaclass=FrozenDatetimeMeta):
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(time.time(), tz)
+
+
+@contextlib.contextmanager
+def frozen_now(now: datetime.datetime):
+    """Make time.time() and datetime.now() start at now, the clock still advances so that new logs stay in order"""
+    real_time = time.time
+    offset = now.timestamp() - real_time()
+    with (
+        patch("time.time", lambda: real_time() + offset),
+        patch("datetime.datetime", FrozenDatetime),
+        # Modules that imported the class directly
+        patch("worktime_tracker.date_utils.datetime", FrozenDatetime),
+        patch("worktime_tracker.worktime_tracker.datetime", FrozenDatetime),
+    ):
+        yield
+
+
+def time_function(function, repeats: int, setup=None) -> dict:
+    """Run function repeats times (after calling setup each time) and return timing statistics in seconds"""
+    durations = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+        "max": max(durations),
+        "repeats": repeats,
+    }
+
+
+def clear_history_and_day_cache():
+    History.clear()
+    get_day_cache_path().unlink(missing_ok=True)
+
+
+def append_log():
+    """Append a log with the opposite state so that the next refresh has something to read"""
+    state = "locked" if read_last_log().state == "work" else "work"
+    write_log(Log(time.time(), state))
+
+
+def get_benchmarks(repeats: int) -> dict:
+    now = datetime.datetime.now()
+    rewrite_start = now - datetime.timedelta(days=30)
+    tracker = WorktimeTracker()  # Archives the logs of past years like when the tracker starts
+    history = History(refresh_rate=0)
+    return {
+        "History() without day cache": time_function(History, repeats, setup=clear_history_and_day_cache),
+        "History() with day cache": time_function(History, repeats, setup=History.clear),
+        "History.refresh": time_function(history.refresh, repeats, setup=append_log),
+        "WorktimeTracker.get_week_summaries": time_function(tracker.get_week_summaries, repeats),
+        "WorktimeTracker.get_instant_summary": time_function(tracker.get_instant_summary, repeats),
+        "get_ghost_plot": time_function(get_ghost_plot, repeats),
+        "get_productivity_plot": time_function(
+            lambda: get_productivity_plot(now - datetime.timedelta(days=7), now), repeats
+        ),
+        "get_hourly_worktime_df": time_function(
+            get_hourly_worktime_df, repeats, setup=get_hourly_worktime_df.cache_clear  # Cached with lru_cache
+        ),
+        "rewrite_history": time_function(
+            lambda: rewrite_history(rewrite_start, rewrite_start + datetime.timedelta(hours=1), "personal"),
+            repeats,
+        ),
+    }
+
+
+def run_benchmarks(n_years: float, repeats: int, seed: int) -> dict:
+    """Benchmark the tracker on synthetic logs of n_years (until FROZEN_NOW) written in a temporary folder"""
+    with tempfile.TemporaryDirectory() as temp_dir, frozen_now(FROZEN_NOW):
+        logs_path = Path(temp_dir) / "logs.tsv"
+        n_logs = write_synthetic_logs(logs_path, n_years, seed=seed)
+        # Convert the logs to the configured backend
+        if Config().logs_backend == "binary":
+            convert_tsv_to_binary(logs_path, logs_path.with_suffix(".bin"))
+        elif Config().logs_backend == "sqlite":
+            convert_tsv_to_sqlite(logs_path, logs_path.with_suffix(".sqlite"))
+        with patch("worktime_tracker.logs.LOGS_PATH", logs_path), patch(
+            "worktime_tracker.logs.LAST_CHECK_PATH", Path(temp_dir) / "last_check.txt"
+        ):
+            # Checked just now like a running tracker, otherwise the tracker would consider that the last state was
+            # unfinished and append a log right after the last check
+            logs.write_last_check(time.time())
+            History.clear()
+            logs.TAIL_READER.clear()
+            results = get_benchmarks(repeats)
+            History.clear()
+            logs.TAIL_READER.clear()
+    return {"n_years": n_years, "n_logs": n_logs, "results": results}
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 3, 10], help="Sizes of the synthetic logs")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs of each benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic logs generator")
+    parser.add_argument("--output", type=Path, help="Write the results to this file instead of stdout")
+    args = parser.parse_args()
+    report = {
+        "metadata": {
+            "date": datetime.datetime.now().isoformat(),
+            "commit": get_git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "logs_backend": Config().logs_backend,
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+    # Keep stdout for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        for n_years in args.years:
+            print(f"Benchmarking {n_years} years of logs...")
+            report["runs"].append(run_benchmarks(n_years, args.repeats, args.seed))
+    report_json = json.dumps(report, indent=4)
+    if args.output is None:
+        print(report_json)
+    else:
+        args.output.write_text(report_json)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Seeded generator of realistic logs spanning several years, used to benchmark the tracker on big logs files."""
+
+import datetime
+import math
+import random
+
+from worktime_tracker.date_utils import DAY_START_HOUR
+
+
+def generate_workday_logs(rng: random.Random, date: datetime.date) -> list[tuple[float, str]]:
+    """Arrive around 9am, alternate work and personal breaks, lunch break and leave around 6pm"""
+    logs = []
+    current = datetime.datetime.combine(date, datetime.time(9)) + datetime.timedelta(minutes=rng.gauss(0, 30))
+    lunch = datetime.datetime.combine(date, datetime.time(12, 30)) + datetime.timedelta(minutes=rng.gauss(0, 20))
+    leave = datetime.datetime.combine(date, datetime.time(18)) + datetime.timedelta(minutes=rng.gauss(0, 45))
+    had_lunch = False
+    while current < leave:
+        logs.append((current.timestamp(), "work"))
+        current += datetime.timedelta(minutes=rng.uniform(20, 90))
+        if not had_lunch and current > lunch:
+            logs.append((current.timestamp(), "locked"))
+            current += datetime.timedelta(minutes=rng.uniform(40, 80))
+            had_lunch = True
+        elif rng.random() < 0.7:
+            logs.append((current.timestamp(), rng.choice(["personal", "personal", "locked"])))
+            current += datetime.timedelta(minutes=rng.expovariate(1 / 10))
+    logs.append((current.timestamp(), "locked"))
+    return logs
+
+
+def generate_day_off_logs(rng: random.Random, date: datetime.date) -> list[tuple[float, str]]:
+    """A few personal sessions"""
+    logs = []
+    for _ in range(rng.randint(0, 3)):
+        start = datetime.datetime.combine(date, datetime.time(10)) + datetime.timedelta(hours=rng.uniform(0, 11))
+        if len(logs) > 0 and start.timestamp() <= logs[-1][0]:
+            continue
+        logs.append((start.timestamp(), "personal"))
+        logs.append((start.timestamp() + rng.uniform(5, 90) * 60, "locked"))
+    return logs
+
+
+def generate_logs(n_years: float, end_date: datetime.date = None, seed: int = 0) -> list[tuple[float, str]]:
+    """Logs of the n_years before end_date (excluded), the same seed and dates always give the same logs.
+
+    Without end_date, the logs end now (the logs of the current day until now are included).
+    """
+    rng = random.Random(seed)
+    end_timestamp = math.inf
+    if end_date is None:
+        now = datetime.datetime.now()
+        end_date = (now - datetime.timedelta(hours=DAY_START_HOUR)).date() + datetime.timedelta(days=1)
+        end_timestamp = now.timestamp()
+    start_date = end_date - datetime.timedelta(days=int(365.25 * n_years))
+    logs = [(datetime.datetime.combine(start_date, datetime.time(DAY_START_HOUR)).timestamp(), "locked")]
+    date = start_date
+    holidays = set()
+    while date < end_date:
+        if date.month == 1 and date.day == 1:
+            # Two weeks of holidays in the summer and one in the winter
+            summer = datetime.date(date.year, 7, 1) + datetime.timedelta(days=rng.randint(0, 45))
+            winter = datetime.date(date.year, 12, 20) + datetime.timedelta(days=rng.randint(0, 4))
+            holidays |= {summer + datetime.timedelta(days=i) for i in range(14)}
+            holidays |= {winter + datetime.timedelta(days=i) for i in range(7)}
+        if date.weekday() < 5 and date not in holidays and rng.random() > 0.02:
+            day_logs = generate_workday_logs(rng, date)
+        else:
+            day_logs = generate_day_off_logs(rng, date)
+        for timestamp, state in day_logs:
+            # Keep logs sorted and without identical consecutive states, like the tracker writes them
+            if logs[-1][0] < timestamp <= end_timestamp and state != logs[-1][1]:
+                logs.append((timestamp, state))
+        date += datetime.timedelta(days=1)
+    return logs
+
+
+def write_synthetic_logs(path, n_years: float, end_date: datetime.date = None, seed: int = 0) -> int:
+    """Write synthetic logs in the tsv format, returns the number of logs"""
+    logs = generate_logs(n_years, end_date=end_date, seed=seed)
+    with open(path, "w", encoding="utf8") as f:
+        for timestamp, state in logs:
+            f.write(f"{timestamp}\t{state}\n")
+    return len(logs)
@@ -22,17 +22,25 @@ def start_cli_curses():
     start()
 
 
+def start_daemon():
+    from worktime_tracker.daemon import start
+
+    start()
+
+
 INTERFACES = {
     "cli": start_cli,
     "cli-curses": start_cli_curses,
     "macos-status-bar": start_macos_status_bar_app,
+    "daemon": start_daemon,
 }
 
 
 def main():
-    if sys.platform != "darwin":
+    # The interface can be overridden on the command line, e.g. `python main.py daemon`
+    interface = sys.argv[1] if len(sys.argv) > 1 else Config().interface
+    if interface == "macos-status-bar" and sys.platform != "darwin":
         raise NotImplementedError(f"OS {sys.platform} is not supported")
-    interface = Config().interface
     print(f"Starting Worktime Tracker (interface={interface})")
     INTERFACES[interface]()
 
@@ -0,0 +1,28 @@
+import sys
+
+from worktime_tracker.binary_logs import convert_binary_to_tsv, convert_tsv_to_binary
+from worktime_tracker.config import Config
+from worktime_tracker.constants import LOGS_PATH
+from worktime_tracker.sqlite_logs import convert_sqlite_to_tsv, convert_tsv_to_sqlite
+
+BINARY_LOGS_PATH = LOGS_PATH.with_suffix(".bin")
+SQLITE_LOGS_PATH = LOGS_PATH.with_suffix(".sqlite")
+
+if __name__ == "__main__":
+    # Don't forget to set "logs_backend" in config.json accordingly after converting
+    if len(sys.argv) != 2 or sys.argv[1] not in ("to-binary", "to-sqlite", "to-tsv"):
+        print(f"Usage: python {sys.argv[0]} to-binary|to-sqlite|to-tsv")
+        sys.exit(1)
+    if sys.argv[1] == "to-binary":
+        convert_tsv_to_binary(LOGS_PATH, BINARY_LOGS_PATH)
+        print(f"Converted {LOGS_PATH} to {BINARY_LOGS_PATH}")
+    elif sys.argv[1] == "to-sqlite":
+        convert_tsv_to_sqlite(LOGS_PATH, SQLITE_LOGS_PATH)
+        print(f"Converted {LOGS_PATH} to {SQLITE_LOGS_PATH}")
+    elif Config().logs_backend == "sqlite":
+        # Convert back from the backend that is currently used
+        convert_sqlite_to_tsv(SQLITE_LOGS_PATH, LOGS_PATH)
+        print(f"Converted {SQLITE_LOGS_PATH} to {LOGS_PATH}")
+    else:
+        convert_binary_to_tsv(BINARY_LOGS_PATH, LOGS_PATH)
+        print(f"Converted {BINARY_LOGS_PATH} to {LOGS_PATH}")
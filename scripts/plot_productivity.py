@@ -1,9 +1,14 @@
 import time
-from worktime_tracker.tools import plot_productivity
 from worktime_tracker.config import Config
+from worktime_tracker.daemon import DaemonWorker, is_daemon_running
+from worktime_tracker.tools import plot_productivity
 
 if __name__ == "__main__":
     if not Config().show_day_worktime:
         print("Waiting 30s before plotting to prevent using the script as a way to check worktime when disabled...")
         time.sleep(30)
-    plot_productivity()
+    if is_daemon_running():
+        # Computed by the daemon, which already has the History in memory
+        DaemonWorker().plot_productivity()
+    else:
+        plot_productivity()
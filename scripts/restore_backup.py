@@ -0,0 +1,18 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from worktime_tracker.backups import load_versions, restore_backup
+
+if __name__ == "__main__":
+    # Backups are made before rewriting history, see worktime_tracker/backups.py
+    if len(sys.argv) not in (2, 4):
+        print(f"Usage: python {sys.argv[0]} <logs file> [<version> <destination>]")
+        sys.exit(1)
+    path = Path(sys.argv[1])
+    if len(sys.argv) == 2:
+        for version in load_versions(path):
+            print(f"{version['version']}\t{datetime.fromtimestamp(version['timestamp'])}\t{version['kind']}")
+        sys.exit(0)
+    restore_backup(path, int(sys.argv[2]), Path(sys.argv[3]))
+    print(f"Restored version {sys.argv[2]} of {path} to {sys.argv[3]}")
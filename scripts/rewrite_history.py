@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+from worktime_tracker.daemon import is_daemon_running, query
+from worktime_tracker.logs import read_history_edits, rewrite_history_batch
+
+if __name__ == "__main__":
+    # One "start<TAB>end<TAB>new_state" edit per line, e.g. "2022-03-19 12:00	2022-03-19 13:30	personal"
+    if len(sys.argv) != 2:
+        print(f"Usage: python {sys.argv[0]} <edits file>")
+        sys.exit(1)
+    edits = read_history_edits(Path(sys.argv[1]))
+    if is_daemon_running():
+        # The daemon updates its History in place
+        query("rewrite_history", edits=[(start.timestamp(), end.timestamp(), state) for start, end, state in edits])
+    else:
+        rewrite_history_batch(edits)
+    print(f"Applied {len(edits)} edits from {sys.argv[1]}")
@@ -0,0 +1,80 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from worktime_tracker import backups, logs
+from worktime_tracker.logs import Log, rewrite_history, write_log
+from worktime_tracker.sqlite_logs import convert_sqlite_to_tsv
+from worktime_tracker.test_utils import mock_log_file
+
+
+def test_backups(tmp_path):
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 12, 0, 0), "locked"),
+    ]
+    with mock_log_file(mocked_logs), patch("worktime_tracker.backups.SNAPSHOT_INTERVAL", 3):
+        logs_path = logs.get_active_logs_path()
+        contents = []
+        for day in range(8, 13):
+            write_log(Log(datetime(2021, 12, day, 9, 0, 0), "work"))
+            write_log(Log(datetime(2021, 12, day, 10, 0, 0), "locked"))
+            contents.append(logs_path.read_bytes())
+            with patch("time.time", return_value=datetime(2021, 12, day, 11, 0, 0).timestamp()):
+                rewrite_history(datetime(2021, 12, day - 1, 11, 15, 0), datetime(2021, 12, day, 9, 30, 0), "personal")
+        versions = backups.load_versions(logs_path)
+        # A full snapshot every 3 versions, the other versions only store the logs appended since the last rewrite
+        assert [version["kind"] for version in versions] == ["full", "delta", "delta", "full", "delta"]
+        assert versions[1]["content_size"] < len(contents[0])
+        for version, content in zip(versions, contents):
+            assert backups.read_version(logs_path, version["version"]) == content
+        backups.restore_backup(logs_path, 2, tmp_path / "restored.tsv")
+        assert (tmp_path / "restored.tsv").read_bytes() == contents[1]
+        # The file was not only appended to: full snapshot
+        logs.write_logs([(log.timestamp, log.state) for log in mocked_logs])
+        rewrite_history(datetime(2021, 12, 7, 9, 0, 0), datetime(2021, 12, 7, 10, 0, 0), "work")
+        assert backups.load_versions(logs_path)[-1]["kind"] == "full"
+        # Only the last version is kept after the retention period
+        with patch("worktime_tracker.backups.time.time", return_value=versions[-1]["timestamp"] + 1000 * 24 * 3600):
+            backups.prune_backups(logs_path)
+        assert [version["version"] for version in backups.load_versions(logs_path)] == [6]
+        assert sorted(path.name for path in backups.get_backup_dir().iterdir()) == [
+            f"{logs_path.name}.6.full.gz",
+            f"{logs_path.name}.backups.json",
+        ]
+
+
+def test_sqlite_backups(tmp_path):
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 12, 0, 0), "locked"),
+    ]
+    with (
+        patch("worktime_tracker.logs.Config") as mock_config,
+        patch("worktime_tracker.backups.SNAPSHOT_INTERVAL", 3),
+    ):
+        mock_config.return_value.logs_backend = "sqlite"
+        with mock_log_file(mocked_logs):
+            logs_path = logs.get_active_logs_path()
+            contents = []
+            for day in range(8, 13):
+                write_log(Log(datetime(2021, 12, day, 9, 0, 0), "work"))
+                write_log(Log(datetime(2021, 12, day, 10, 0, 0), "locked"))
+                convert_sqlite_to_tsv(logs_path, tmp_path / "dump.tsv")
+                contents.append((tmp_path / "dump.tsv").read_bytes())
+                with patch("time.time", return_value=datetime(2021, 12, day, 11, 0, 0).timestamp()):
+                    rewrite_history(
+                        datetime(2021, 12, day - 1, 11, 15, 0), datetime(2021, 12, day, 9, 30, 0), "personal"
+                    )
+            # The versions are TSV dumps of the database, stored like the versions of the TSV logs
+            versions = backups.load_versions(logs_path)
+            assert [version["kind"] for version in versions] == ["full", "delta", "delta", "full", "delta"]
+            assert versions[1]["content_size"] < len(contents[0])
+            for version, content in zip(versions, contents):
+                assert backups.read_version(logs_path, version["version"]) == content
+            # The database was not only appended to: full snapshot
+            logs.write_logs([(log.timestamp, log.state) for log in mocked_logs])
+            rewrite_history(datetime(2021, 12, 7, 9, 0, 0), datetime(2021, 12, 7, 10, 0, 0), "work")
+            assert backups.load_versions(logs_path)[-1]["kind"] == "full"
+            assert not any(".bck" in path.name for path in backups.get_backup_dir().iterdir())
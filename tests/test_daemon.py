@@ -0,0 +1,53 @@
+import threading
+from datetime import datetime
+
+from worktime_tracker.daemon import DaemonWorker, TrackerDaemon, is_daemon_running, query
+from worktime_tracker.logs import Log
+from worktime_tracker.spaces import FakeStateProvider, set_state_provider
+from worktime_tracker.test_utils import mock_log_file
+
+
+def test_daemon(tmp_path):
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 12, 0, 0), "locked"),
+    ]
+    socket_path = tmp_path / "daemon.sock"
+    set_state_provider(FakeStateProvider(["locked"]))
+    try:
+        with mock_log_file(mocked_logs):
+            daemon = TrackerDaemon(path=socket_path)
+            server_thread = threading.Thread(target=daemon.serve)
+            server_thread.start()
+            try:
+                assert is_daemon_running(socket_path)
+                client = DaemonWorker(path=socket_path)
+                client.start()
+                snapshot = client.wait_for_new_snapshot(timeout=10)
+                assert snapshot == daemon.worker.snapshot
+                assert snapshot.state == "locked"
+                start, end = datetime(2021, 12, 7, 7, 0, 0).timestamp(), datetime(2021, 12, 7, 13, 0, 0).timestamp()
+                assert query("worktime_between", path=socket_path, start=start, end=end) == 3600
+                edit = (
+                    datetime(2021, 12, 7, 11, 30, 0).timestamp(),
+                    datetime(2021, 12, 7, 12, 0, 0).timestamp(),
+                    "personal",
+                )
+                assert query("rewrite_history", path=socket_path, edits=[edit])
+                assert query("worktime_between", path=socket_path, start=start, end=end) == 1800
+                # Pausing stops the polling of the daemon without blocking the other requests
+                client.pause(3600)
+                assert daemon.worker.is_paused
+                assert query("worktime_between", path=socket_path, start=start, end=end, timeout=10) == 1800
+                client.rewrite_history([(datetime(2021, 12, 7, 11, 0, 0), datetime(2021, 12, 7, 11, 30, 0), "locked")])
+                assert query("worktime_between", path=socket_path, start=start, end=end) == 0
+                client.pause(0)
+                assert not daemon.worker.is_paused
+                client.stop()
+            finally:
+                daemon.shutdown()
+                server_thread.join(timeout=10)
+            assert not socket_path.exists()
+    finally:
+        set_state_provider(None)
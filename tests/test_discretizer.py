@@ -0,0 +1,14 @@
+import numpy as np
+
+from worktime_tracker.discretizer import discretize_worktime, get_bin_edges
+
+
+def test_discretize_worktime():
+    starts = np.array([0, 100, 250])
+    ends = np.array([100, 250, 400])
+    is_work = np.array([True, False, True])
+    bin_edges = get_bin_edges(-50, 430, 60)
+    assert bin_edges.tolist() == [-50, 10, 70, 130, 190, 250, 310, 370, 430]
+    worktimes = discretize_worktime(starts, ends, is_work, bin_edges)
+    assert worktimes.tolist() == [10, 60, 30, 0, 0, 60, 60, 30]
+    assert worktimes.sum() == 100 + 150
@@ -0,0 +1,60 @@
+import threading
+from datetime import datetime
+from unittest.mock import patch
+
+from worktime_tracker.history import History
+from worktime_tracker.instrumentation import TIMINGS, Timings
+from worktime_tracker.logs import Log
+from worktime_tracker.test_utils import mock_log_file
+
+
+def test_timings():
+    timings = Timings(window=3)
+    for _ in range(5):
+        with timings.cycle():
+            with timings.stage("stage"):
+                pass
+            timings.count("log lines read", 2)
+    summary = timings.get_summary()
+    # Only the last samples are kept
+    assert summary["stages"]["stage"]["count"] == 3
+    assert summary["stages"]["cycle"]["max"] >= summary["stages"]["stage"]["max"]
+    assert summary["counters"]["log lines read"] == {"count": 3, "p50": 2, "p95": 2, "max": 2}
+    assert "log lines read" in timings.format_summary()
+
+
+def test_timings_threads():
+    timings = Timings()
+    with timings.stage("stage"):
+        pass
+
+    def record_stage():
+        with timings.stage("other stage"):
+            pass
+
+    def get_stats(samples):
+        # Another thread records a new stage while the summary is computed
+        thread = threading.Thread(target=record_stage)
+        thread.start()
+        thread.join()
+        return Timings._get_stats(samples)
+
+    with patch.object(timings, "_get_stats", get_stats):
+        assert "other stage" not in timings.get_summary()["stages"]
+    assert "other stage" in timings.get_summary()["stages"]
+
+
+def test_history_counters():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 30, 0), "personal"),
+    ]
+    TIMINGS.clear()
+    with mock_log_file(mocked_logs), TIMINGS.cycle():
+        History(dont_read_before=None)
+    summary = TIMINGS.get_summary()
+    assert summary["counters"]["log lines read"]["max"] == 3
+    # The 3 logs and the dummy log give 3 intervals
+    assert summary["counters"]["intervals created"]["max"] == 3
+    assert summary["stages"]["History.refresh"]["count"] == 1
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from worktime_tracker.interval_store import IntervalStore
+
+
+def test_add_logs_splits_by_day():
+    store = IntervalStore(capacity=1)
+    timestamps = [datetime(2021, 12, 7, 17, 0, 0).timestamp(), datetime(2021, 12, 8, 9, 0, 0).timestamp()]
+    store.add_logs([*timestamps, datetime(2021, 12, 8, 10, 0, 0).timestamp()], ["work", "personal"])
+    assert len(store) == 3
+    # The work interval is split at 7am (start of the day)
+    assert store.ends[0] == datetime(2021, 12, 8, 7, 0, 0).timestamp()
+    assert store.get_day_worktime(datetime(2021, 12, 7).toordinal()) == 14 * 3600
+    assert store.get_day_worktime(datetime(2021, 12, 8).toordinal()) == 2 * 3600
+
+
+def test_add_logs_replaces_dummy_intervals():
+    store = IntervalStore()
+    start = datetime(2021, 12, 7, 9, 0, 0).timestamp()
+    store.add_logs([start, start + 60], ["work"])
+    # Refreshing from the last read log replaces the dummy interval
+    store.add_logs([start, start + 120, start + 180], ["work", "locked"])
+    assert len(store) == 2
+    assert store.get_worktime_between(start, start + 3600) == 120
+    assert store.get_worktime_between(start + 30, start + 90) == 60
+
+
+def test_get_worktime_between_with_prefix_sums():
+    store = IntervalStore()
+    start = datetime(2021, 12, 7, 9, 0, 0).timestamp()
+    store.add_logs([start, start + 100, start + 200, start + 300, start + 400], ["work", "personal", "work", "locked"])
+    assert store.cumulative_worktimes.tolist() == [0, 100, 100, 200, 200]
+    assert store.get_worktime_between(start, start + 400) == 200
+    # Both boundaries inside work intervals
+    assert store.get_worktime_between(start + 50, start + 250) == 100
+    # Range inside a single work interval
+    assert store.get_worktime_between(start + 210, start + 220) == 10
+    assert store.get_worktime_between(start + 100, start + 200) == 0
+    assert store.get_worktime_between(start, start + 400, dont_count_ordinals=[datetime(2021, 12, 7).toordinal()]) == 0
@@ -1,16 +1,46 @@
 import copy
-from datetime import datetime
+import os
+from datetime import date, datetime
+from unittest.mock import patch
 
+import numpy as np
+import pytest
+
+from worktime_tracker.binary_logs import (
+    RECORD_SIZE,
+    convert_binary_to_tsv,
+    convert_tsv_to_binary,
+    read_last_record,
+    read_records_between,
+)
+from worktime_tracker import logs, sqlite_logs
 from worktime_tracker.history import History, Interval
 from worktime_tracker.logs import (
     Log,
     get_all_logs,
+    get_batch_rewritten_history_logs,
+    get_rewritten_history_logs,
+    read_history_edits,
+    read_last_log,
     rewrite_history,
+    rewrite_history_batch,
+    validate_history_edits,
+    write_log,
 )
 from worktime_tracker.worktime_tracker import get_worktime_between
 from worktime_tracker.test_utils import mock_log_file
 
 
+def test_log():
+    log = Log(datetime(2021, 12, 7, 17, 6, 13), "work")
+    assert not hasattr(log, "__dict__")
+    assert log._datetime is None  # Only computed when needed
+    assert log.datetime == datetime(2021, 12, 7, 17, 6, 13)
+    logs = Log.from_parsed_logs([log.timestamp, log.timestamp + 60], ["work", "locked"])
+    assert logs == [log, Log(datetime(2021, 12, 7, 17, 7, 13), "locked")]
+    assert copy.copy(log) == log
+
+
 def test_get_intervals():
     mocked_logs = [
         Log(datetime(2021, 12, 7, 17, 6, 13), "locked"),
@@ -31,6 +61,10 @@ def test_get_intervals():
         work_intervals = [i for i in filtered if i.state == "work"]
         assert len(work_intervals) == 1
         assert work_intervals[0].duration == (17 * 60 + 24) * 60 + 18 - (17 * 60 + 6) * 60 - 13
+        # The history gives the same worktime as the clipped intervals
+        for end_datetime in [datetime(2021, 12, 8, 17, 10, 0), datetime(2021, 12, 9, 7, 0, 0)]:
+            worktime = sum(i.worktime for i in Interval.get_intervals_between(intervals, start_datetime, end_datetime))
+            assert history.get_worktime_between(start_datetime, end_datetime) == worktime
         # Check that global variable _ALL_LOGS is not modified
         assert initial_logs == get_all_logs()
 
@@ -50,6 +84,31 @@ def test_get_all_intervals():
         assert intervals[-1].start_log == mocked_logs[-1]
 
 
+def test_history_days():
+    mocked_logs = [
+        Log(datetime(2021, 12, 6, 10, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "locked"),
+        Log(datetime(2021, 12, 9, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 9, 12, 0, 0), "locked"),
+    ]
+    with mock_log_file(mocked_logs):
+        history = History()
+        dates = [date(2021, 12, 6), date(2021, 12, 7), date(2021, 12, 8), date(2021, 12, 9)]
+        assert [day.date for day in history.days] == dates
+        assert history[-1] is history.current_day
+        assert history.current_day.date == date(2021, 12, 9)
+        assert [day.date for day in history.get_days_between(date(2021, 12, 7), date(2021, 12, 9))] == dates[1:3]
+        assert [day.date for day in history.days[1:][::1][:-1]] == dates[1:3]
+        assert len(history.get_days_between(date(2021, 12, 10), date(2021, 12, 20))) == 0
+        # Appended logs extend the days
+        write_log(Log(datetime(2021, 12, 10, 9, 0, 0), "work"))
+        with patch("worktime_tracker.history.time.time", return_value=datetime(2021, 12, 10, 10, 0, 0).timestamp()):
+            history.refresh_rate = 0
+            history.refresh()
+            assert [day.date for day in history.days] == dates + [date(2021, 12, 10)]
+            assert history.current_day.worktime == 3600
+
+
 def test_rewrite_history():
     mocked_logs = [
         Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
@@ -67,3 +126,303 @@ def test_rewrite_history():
         rewrite_history(datetime(2021, 12, 7, 11, 30, 0), datetime(2021, 12, 7, 12, 10, 0), "personal")
         # Work from 10:00 to 11:30 and from 12:10 to 12:30
         assert get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 13, 0, 0)) == 110 * 60
+
+
+def test_rewrite_history_patches_history():
+    mocked_logs = [
+        Log(datetime(2021, 12, 6, 10, 0, 0), "work"),
+        Log(datetime(2021, 12, 6, 12, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 10, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 12, 0, 0), "locked"),
+    ]
+    with mock_log_file(mocked_logs):
+        history = History(refresh_rate=0)
+        first_day = history.days[0]
+        # The file is rewritten atomically: only the rewritten range changes and the file is replaced
+        inode = os.stat(logs.LOGS_PATH).st_ino
+        rewrite_history(datetime(2021, 12, 7, 11, 0, 0), datetime(2021, 12, 7, 11, 30, 0), "personal")
+        assert os.stat(logs.LOGS_PATH).st_ino != inode
+        assert [(log.timestamp, log.state) for log in get_all_logs()[:-1]] == [
+            (log.timestamp, log.state) for log in mocked_logs[:3]
+        ] + [
+            (datetime(2021, 12, 7, 11, 0, 0).timestamp(), "personal"),
+            (datetime(2021, 12, 7, 11, 30, 0).timestamp(), "work"),
+            (datetime(2021, 12, 7, 12, 0, 0).timestamp(), "locked"),
+        ]
+        # The live history is patched from the rewritten day, the previous days are kept
+        assert History(refresh_rate=0) is history
+        assert history.days[0] is first_day
+        assert history.days[1].worktime == 90 * 60
+        assert get_worktime_between(datetime(2021, 12, 6, 7, 0, 0), datetime(2021, 12, 8, 7, 0, 0)) == 210 * 60
+
+
+def test_rewrite_history_batch(tmp_path):
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 30, 0), "personal"),
+        Log(datetime(2021, 12, 7, 12, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 12, 30, 0), "personal"),
+        Log(datetime(2021, 12, 7, 14, 0, 0), "locked"),
+    ]
+    edits = [
+        (datetime(2021, 12, 7, 12, 10, 0), datetime(2021, 12, 7, 13, 0, 0), "work"),
+        (datetime(2021, 12, 7, 10, 0, 0), datetime(2021, 12, 7, 11, 45, 0), "work"),
+        (datetime(2021, 12, 7, 11, 45, 0), datetime(2021, 12, 7, 12, 10, 0), "personal"),
+    ]
+    # Same result as applying the edits one after the other
+    expected_logs = mocked_logs
+    for start_datetime, end_datetime, new_state in sorted(edits):
+        expected_logs = get_rewritten_history_logs(expected_logs, start_datetime, end_datetime, new_state)
+        expected_logs = [Log(timestamp, state) for timestamp, state in expected_logs]
+    assert get_batch_rewritten_history_logs(mocked_logs, validate_history_edits(edits)) == [
+        (log.timestamp, log.state) for log in expected_logs
+    ]
+    edits_path = tmp_path / "edits.tsv"
+    edits_path.write_text(
+        "# start\tend\tnew_state\n" + "".join(f"{start}\t{end}\t{new_state}\n" for start, end, new_state in edits)
+    )
+    assert read_history_edits(edits_path) == edits
+    with mock_log_file(mocked_logs):
+        rewrite_history_batch(read_history_edits(edits_path))
+        # Work from 10:00 to 11:45 and from 12:10 to 13:00
+        assert get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 14, 0, 0)) == 155 * 60
+        assert [(log.timestamp, log.state) for log in get_all_logs()[:-1]] == [
+            (log.timestamp, log.state) for log in expected_logs
+        ]
+        # There is no log before the edit
+        with pytest.raises(ValueError):
+            rewrite_history(datetime(2021, 12, 7, 7, 0, 0), datetime(2021, 12, 7, 9, 0, 0), "work")
+    with pytest.raises(ValueError):
+        validate_history_edits([edits[0]], first_timestamp=edits[0][1].timestamp())
+    with pytest.raises(ValueError):
+        validate_history_edits([])
+    with pytest.raises(ValueError):
+        validate_history_edits([(edits[0][1], edits[0][0], "work")])
+    with pytest.raises(ValueError):
+        validate_history_edits([(edits[0][0], datetime(2100, 1, 1), "work")])
+    with pytest.raises(ValueError):
+        validate_history_edits([(edits[0][0], edits[0][1], "wo\trk")])
+    with pytest.raises(ValueError):
+        validate_history_edits([edits[1], (edits[1][0], edits[2][1], "personal")])
+
+
+def test_find_offset_after():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 30, 0), "personal"),
+    ]
+    with mock_log_file(mocked_logs):
+        logs_path = logs.get_active_logs_path()
+        # Blank lines are ignored
+        logs_path.write_text("\n".join(f"\n{log.timestamp}\t{log.state}\n" for log in mocked_logs) + "\n\n")
+        for timestamp, expected_logs in [
+            (datetime(2021, 12, 7, 7, 0, 0).timestamp(), mocked_logs),
+            (mocked_logs[0].timestamp, mocked_logs[1:]),
+            (datetime(2021, 12, 7, 11, 15, 0).timestamp(), mocked_logs[2:]),
+            (mocked_logs[2].timestamp, []),
+        ]:
+            assert [log for _, log in logs.read_logs_from_offset(logs.find_offset_after(timestamp))] == expected_logs
+
+
+def test_binary_logs(tmp_path):
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0).timestamp() + 0.123456, "work"),
+        Log(datetime(2021, 12, 7, 11, 30, 0), "personal"),
+    ]
+    tsv_path = tmp_path / "logs.tsv"
+    tsv_path.write_text("".join(f"{log.timestamp}\t{log.state}\n" for log in mocked_logs))
+    binary_path = tmp_path / "logs.bin"
+    convert_tsv_to_binary(tsv_path, binary_path)
+    assert binary_path.stat().st_size == len(mocked_logs) * RECORD_SIZE
+    assert read_last_record(binary_path) == (mocked_logs[-1].timestamp, "personal")
+    assert read_records_between(binary_path, mocked_logs[1].timestamp, mocked_logs[2].timestamp) == [
+        (mocked_logs[1].timestamp, "work")
+    ]
+    roundtrip_path = tmp_path / "roundtrip.tsv"
+    convert_binary_to_tsv(binary_path, roundtrip_path)
+    assert roundtrip_path.read_text() == tsv_path.read_text()
+    # States that are not in STATES can't be converted
+    tsv_path.write_text(f"{mocked_logs[0].timestamp}\tmeeting\n")
+    with pytest.raises(ValueError, match="meeting"):
+        convert_tsv_to_binary(tsv_path, tmp_path / "custom.bin")
+
+
+def test_binary_logs_truncated_record():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+    ]
+    with patch("worktime_tracker.logs.Config") as mock_config:
+        mock_config.return_value.logs_backend = "binary"
+        with mock_log_file(mocked_logs):
+            logs_path = logs.get_active_logs_path()
+            assert logs_path.suffix == ".bin"
+            # Crash in the middle of a write
+            with open(logs_path, "ab") as f:
+                f.write(b"\x00" * (RECORD_SIZE // 2))
+            new_log = Log(datetime(2021, 12, 7, 11, 30, 0), "personal")
+            write_log(new_log)
+            assert logs_path.stat().st_size % RECORD_SIZE == 0
+            assert read_last_log() == new_log
+            assert get_all_logs()[-2:] == [mocked_logs[-1], new_log]
+            # States that can't be stored are rejected before rewriting
+            with pytest.raises(ValueError, match="binary"):
+                rewrite_history(mocked_logs[0].datetime, mocked_logs[1].datetime, "meeting")
+            assert get_all_logs()[-3:] == [*mocked_logs, new_log][-3:]
+
+
+def test_sqlite_logs(tmp_path):
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 30, 0), "personal"),
+        Log(datetime(2021, 12, 7, 12, 0, 0), "work"),
+    ]
+    with patch("worktime_tracker.logs.Config") as mock_config:
+        mock_config.return_value.logs_backend = "sqlite"
+        with mock_log_file(mocked_logs):
+            logs_path = logs.get_active_logs_path()
+            assert logs_path.suffix == ".sqlite"
+            assert read_last_log() == mocked_logs[-1]
+            assert get_all_logs() == mocked_logs
+            assert logs.read_logs_between(mocked_logs[1].timestamp, mocked_logs[3].timestamp) == mocked_logs[1:3]
+            ids_before = sqlite_logs.query(logs_path, "SELECT id FROM logs ORDER BY timestamp")
+            generation = logs.get_logs_signature()[0]
+            rewrite_history(datetime(2021, 12, 7, 11, 10, 0), datetime(2021, 12, 7, 11, 20, 0), "locked")
+            assert logs.get_logs_signature()[0] == generation + 1
+            # Logs outside of the rewritten range are not touched
+            ids_after = sqlite_logs.query(logs_path, "SELECT id FROM logs ORDER BY timestamp")
+            assert ids_after[:2] + ids_after[-3:-1] == ids_before
+            # Ids are the positions read by the history, they stay in chronological order
+            assert ids_after == sorted(ids_after)
+            assert [log for _, log in logs.read_logs_from_offset(logs.find_offset_after(mocked_logs[1].timestamp))] == (
+                get_all_logs()[2:]
+            )
+            worktime = get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 12, 0, 0))
+            assert worktime == 20 * 60
+            # Migration from and to tsv
+            sqlite_logs.convert_sqlite_to_tsv(logs_path, tmp_path / "logs.tsv")
+            sqlite_logs.convert_tsv_to_sqlite(tmp_path / "logs.tsv", tmp_path / "logs.sqlite")
+            assert sqlite_logs.query(tmp_path / "logs.sqlite", "SELECT timestamp, state FROM logs") == [
+                (log.timestamp, log.state) for log in get_all_logs()
+            ]
+            # Without room between the ids of the neighbours, the following rows are renumbered
+            with patch("worktime_tracker.sqlite_logs.ID_STRIDE", 1):
+                logs.write_logs([(log.timestamp, log.state) for log in mocked_logs])
+                rewrite_history(datetime(2021, 12, 7, 11, 10, 0), datetime(2021, 12, 7, 11, 20, 0), "locked")
+            rows = sqlite_logs.query(logs_path, "SELECT id, timestamp FROM logs ORDER BY timestamp")
+            assert [row_id for row_id, _ in rows] == list(range(1, len(rows) + 1))
+            assert get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 12, 0, 0)) == 20 * 60
+
+
+def test_read_last_log():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+    ]
+    with mock_log_file(mocked_logs):
+        assert read_last_log() == mocked_logs[-1]
+        new_log = Log(datetime(2021, 12, 7, 11, 30, 0), "personal")
+        write_log(new_log)
+        assert read_last_log() == new_log
+        # Appended by another process
+        with open(logs.LOGS_PATH, "a", encoding="utf8") as f:
+            f.write(f"{datetime(2021, 12, 7, 12, 0, 0).timestamp()}\twork\n")
+        assert read_last_log() == Log(datetime(2021, 12, 7, 12, 0, 0), "work")
+        # Rewritten by another process
+        with open(logs.LOGS_PATH, "w", encoding="utf8") as f:
+            f.write(f"{mocked_logs[0].timestamp}\tlocked\n")
+        assert read_last_log() == mocked_logs[0]
+
+
+def test_history_refresh():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 30, 0), "personal"),
+    ]
+    with mock_log_file(mocked_logs):
+        history = History(refresh_rate=0)
+        assert history.get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 13, 0, 0)) == 30 * 60
+        # Appended logs are read from the last offset
+        write_log(Log(datetime(2021, 12, 7, 11, 40, 0), "work"))
+        write_log(Log(datetime(2021, 12, 7, 11, 50, 0), "locked"))
+        with patch("worktime_tracker.history.time.time", return_value=datetime(2021, 12, 7, 12, 0, 0).timestamp()):
+            worktime = history.get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 13, 0, 0))
+            assert worktime == 40 * 60
+            # Logs rewritten by another process trigger a full reload
+            with open(logs.LOGS_PATH, "w", encoding="utf8") as f:
+                for log in mocked_logs:
+                    f.write(f"{log.timestamp}\t{log.state}\n")
+            worktime = history.get_worktime_between(datetime(2021, 12, 7, 8, 0, 0), datetime(2021, 12, 7, 13, 0, 0))
+            assert worktime == 30 * 60
+
+
+def test_day_cache():
+    mocked_logs = [
+        Log(datetime(2021, 12, 6, 9, 0, 0), "work"),
+        Log(datetime(2021, 12, 6, 12, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 9, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 10, 0, 0), "personal"),
+        Log(datetime(2021, 12, 8, 9, 0, 0), "work"),
+        Log(datetime(2021, 12, 8, 11, 0, 0), "locked"),
+    ]
+    with mock_log_file(mocked_logs), patch("worktime_tracker.history.time.time") as mock_time:
+        mock_time.return_value = datetime(2021, 12, 9, 12, 0, 0).timestamp()
+        History.clear()
+        assert not logs.get_day_cache_path().exists()
+        history = History(dont_read_before=None)
+        expected = history.get_day_worktimes()
+        expected_ordinals, expected_curves = (array.copy() for array in history.get_worktime_curves())
+        expected_starts, expected_ends = history.store.starts.copy(), history.store.ends.copy()
+        assert logs.get_day_cache_path().exists()
+        History.clear()
+        # The days before the cutoff are served from the cache without reading their logs
+        history = History(dont_read_before=None)
+        assert history._cached_days.keys() == {datetime(2021, 12, day).toordinal() for day in [6, 7, 8]}
+        assert history.get_day_worktimes() == expected
+        assert history.get_worktime_between(datetime(2021, 12, 6, 7), datetime(2021, 12, 9, 7)) == 6 * 3600
+        day_ordinals, curves = history.get_worktime_curves()
+        assert history._day_cache is not None
+        assert np.array_equal(day_ordinals, expected_ordinals) and np.allclose(curves, expected_curves)
+        # The logs of the cached days are only read when their intervals are needed
+        assert len(history.days) == len(expected_ordinals) and history._day_cache is None
+        assert np.array_equal(history.store.starts, expected_starts)
+        assert np.array_equal(history.store.ends, expected_ends)
+        assert history.get_day_worktimes() == expected
+        # Rewriting the logs invalidates the cached days
+        rewrite_history(datetime(2021, 12, 7, 9, 0, 0), datetime(2021, 12, 7, 10, 0, 0), "locked")
+        history = History(dont_read_before=None)
+        assert history.get_worktime_between(datetime(2021, 12, 6, 7), datetime(2021, 12, 9, 7)) == 5 * 3600
+        # Ranges that don't match day boundaries read the logs of the cached days
+        assert history.get_worktime_between(datetime(2021, 12, 6, 10), datetime(2021, 12, 8, 10)) == 3 * 3600
+
+
+def test_day_cache_coverage():
+    mocked_logs = [
+        Log(datetime(2020, 6, 1, 9, 0, 0), "work"),
+        Log(datetime(2020, 6, 1, 12, 0, 0), "locked"),
+        Log(datetime(2021, 1, 4, 9, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 9, 0, 0), "work"),
+        Log(datetime(2021, 12, 7, 10, 0, 0), "locked"),
+    ]
+    with mock_log_file(mocked_logs), patch("worktime_tracker.history.time.time") as mock_time:
+        mock_time.return_value = datetime(2021, 12, 9, 12, 0, 0).timestamp()
+        History.clear()
+        # The default history only reads the last year, its cache can't be used by a history that reads everything
+        assert History().get_worktime_between(datetime(2020, 6, 1, 7), datetime(2021, 12, 9, 7)) == 3600
+        History.clear()
+        history = History(dont_read_before=None)
+        assert history._day_cache is None
+        assert history.get_worktime_between(datetime(2020, 6, 1, 7), datetime(2021, 12, 9, 7)) == 4 * 3600
+        # The cache of the whole history can be used by the default history
+        History.clear()
+        assert History()._day_cache is not None
+        assert History().get_worktime_between(datetime(2020, 6, 1, 7), datetime(2021, 12, 9, 7)) == 3600
+        assert (
+            History(dont_read_before=None).get_worktime_between(datetime(2020, 6, 1, 7), datetime(2021, 12, 9, 7))
+            == 4 * 3600
+        )
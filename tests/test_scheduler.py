@@ -0,0 +1,36 @@
+from worktime_tracker.constants import REFRESH_RATE
+from worktime_tracker.scheduler import (
+    LOCKED_MAX_PROBE_INTERVAL,
+    LOCKED_RENDER_INTERVAL,
+    MIN_PROBE_INTERVAL,
+    PollScheduler,
+)
+
+
+def test_poll_scheduler():
+    now = 0
+    states = {0: "work", 100: "locked", 4000: "personal"}  # Time -> state from this time
+    probe_times = []
+    render_times = []
+
+    def probe():
+        probe_times.append(now)
+        return states[max(time for time in states if time <= now)]
+
+    scheduler = PollScheduler(clock=lambda: now)
+    while now < 5000:
+        now += scheduler.tick(probe, lambda: render_times.append(now))
+    # Fast probes right after a state change, then backing off to REFRESH_RATE
+    probe_intervals = [end - start for start, end in zip(probe_times, probe_times[1:])]
+    assert probe_intervals[:5] == [min(MIN_PROBE_INTERVAL * 2**i, REFRESH_RATE) for i in range(5)]
+    assert max(probe_intervals[:8]) == REFRESH_RATE
+    # Slower while locked, changes are still detected within LOCKED_MAX_PROBE_INTERVAL
+    assert max(probe_intervals) == LOCKED_MAX_PROBE_INTERVAL
+    assert min(time for time in probe_times if time >= 100) < 100 + REFRESH_RATE
+    assert min(time for time in probe_times if time >= 4000) < 4000 + LOCKED_MAX_PROBE_INTERVAL
+    # Summaries are rendered after each state change and less often than the state is probed
+    assert render_times[0] == 0
+    assert all(time in render_times for time in [min(t for t in probe_times if t >= change) for change in states])
+    render_intervals = [end - start for start, end in zip(render_times, render_times[1:])]
+    assert max(render_intervals) == LOCKED_RENDER_INTERVAL
+    assert len(render_times) < len(probe_times) / 2
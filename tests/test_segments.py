@@ -0,0 +1,59 @@
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+from worktime_tracker import logs
+from worktime_tracker.history import History
+from worktime_tracker.logs import Log, get_all_logs, read_logs_between, rewrite_history
+from worktime_tracker.segments import get_segment_path, load_manifest, read_active_logs, seal_segments
+from worktime_tracker.test_utils import mock_log_file
+
+
+def test_segments():
+    mocked_logs = [
+        Log(datetime(2020, 12, 31, 9, 0, 0), "work"),
+        Log(datetime(2020, 12, 31, 10, 0, 0), "locked"),
+        Log(datetime(2021, 6, 1, 9, 0, 0), "work"),
+        Log(datetime(2021, 6, 1, 12, 0, 0), "locked"),
+        # Before 7am, belongs to the last day of 2021
+        Log(datetime(2022, 1, 1, 6, 0, 0), "work"),
+        Log(datetime(2022, 1, 1, 8, 0, 0), "locked"),
+        Log(datetime(2022, 6, 1, 9, 0, 0), "work"),
+    ]
+    start, end = datetime(2020, 1, 1), datetime(2022, 6, 1, 10, 0, 0)
+    with mock_log_file(mocked_logs):
+        worktime = History(dont_read_before=None).get_worktime_between(start, end)
+        seal_segments()
+        manifest = load_manifest()
+        assert sorted(manifest) == [2020, 2021]
+        assert manifest[2021]["first_state"] == "work" and manifest[2021]["last_timestamp"] == mocked_logs[4].timestamp
+        assert os.stat(get_segment_path(2021)).st_mode & 0o222 == 0  # Sealed segments are read-only
+        assert read_active_logs() == mocked_logs[5:]
+        assert get_all_logs() == mocked_logs
+        assert read_logs_between(mocked_logs[1].timestamp, mocked_logs[6].timestamp) == mocked_logs[1:6]
+        History.clear()
+        assert History(dont_read_before=None).get_worktime_between(start, end) == worktime
+        # Only the segment of 2021 is rewritten and backed up
+        active_mtime = os.stat(logs.get_active_logs_path()).st_mtime_ns
+        rewrite_history(datetime(2021, 6, 1, 10, 0, 0), datetime(2021, 6, 1, 11, 0, 0), "personal")
+        backup_names = [path.name for path in (logs.get_active_logs_path().parent / "backup").iterdir()]
+        assert backup_names[0].startswith("mocked_logs-2021")
+        assert os.stat(logs.get_active_logs_path()).st_mtime_ns == active_mtime
+        assert History(dont_read_before=None).get_worktime_between(start, end) == worktime - 3600
+
+
+def test_seal_segments_placeholder():
+    mocked_logs = [
+        Log(0, "locked"),  # Written when the logs file is created
+        Log(datetime(2021, 6, 1, 9, 0, 0), "work"),
+        Log(datetime(2021, 6, 1, 12, 0, 0), "locked"),
+        Log(datetime(2022, 6, 1, 9, 0, 0), "work"),
+    ]
+    with mock_log_file(mocked_logs):
+        seal_segments()
+        # The placeholder is dropped instead of being archived in a 1969 segment
+        assert sorted(load_manifest()) == [2021]
+        assert get_all_logs() == mocked_logs[1:]
+        # Nothing to seal: only the first and last logs are read
+        with patch("worktime_tracker.segments.read_active_logs", side_effect=AssertionError):
+            seal_segments()
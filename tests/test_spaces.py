@@ -0,0 +1,70 @@
+import os
+import threading
+
+from worktime_tracker import spaces
+from worktime_tracker.spaces import FakeStateProvider, FileStateProvider, get_state, set_state_provider
+
+
+def test_fake_state_provider():
+    set_state_provider(FakeStateProvider(["work", "locked", "personal"]))
+    try:
+        assert [get_state() for _ in range(5)] == ["work", "locked", "personal", "personal", "personal"]
+    finally:
+        set_state_provider(None)
+
+
+def test_file_state_provider(tmp_path, capsys):
+    state_path = tmp_path / "state"
+    provider = FileStateProvider(state_path)
+    # Nothing written yet
+    assert provider.get_state() == "locked"
+    state_path.write_text("work\n")
+    assert provider.get_state() == "work"
+    state_path.write_text("work\npersonal\n")
+    assert provider.get_state() == "personal"
+    # The file is only read again when it is modified
+    modification_time = provider.modification_time
+    assert provider.get_state() == "personal" and provider.modification_time == modification_time
+    # Invalid states are ignored
+    state_path.write_text("sleeping\n")
+    os.utime(state_path, ns=(0, modification_time + 10**9))
+    assert provider.get_state() == "personal"
+    assert "sleeping" in capsys.readouterr().out
+    state_path.write_text("work\n")
+    os.utime(state_path, ns=(0, modification_time + 2 * 10**9))
+    assert provider.get_state() == "work"
+
+
+def test_fifo_state_provider(tmp_path):
+    fifo_path = tmp_path / "state"
+    os.mkfifo(fifo_path)
+    provider = FileStateProvider(fifo_path)
+    assert provider.get_state() == "locked"
+
+    def write(text):
+        with open(fifo_path, "w") as f:
+            f.write(text)
+
+    # Opening the FIFO for writing blocks until the provider has opened it for reading
+    writer = threading.Thread(target=write, args=("personal\nwork\n",))
+    writer.start()
+    writer.join()
+    assert provider.get_state() == "work"
+    # The state stays the same until a new line is written
+    assert provider.get_state() == "work"
+    write("lock")  # Incomplete line
+    assert provider.get_state() == "work"
+    write("ed\n")
+    assert provider.get_state() == "locked"
+    write("sleeping\n")
+    assert provider.get_state() == "locked"
+
+
+def test_space_types_cache(tmp_path, monkeypatch):
+    space_types_path = tmp_path / "space_types.json"
+    space_types_path.write_text('{"0": "personal", "1": "work"}')
+    monkeypatch.setattr(spaces, "SPACE_TYPES_PATH", space_types_path)
+    spaces.read_space_types.cache_clear()
+    assert spaces.get_space_types()["1"] == "work"
+    assert spaces.get_space_types()["1"] == "work"
+    assert spaces.read_space_types.cache_info().misses == 1
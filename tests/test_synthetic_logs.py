@@ -0,0 +1,23 @@
+from datetime import date
+
+from benchmarks.run_benchmarks import FROZEN_NOW, frozen_now
+from benchmarks.synthetic_logs import generate_logs
+from worktime_tracker.date_utils import DAY_START_HOUR, get_current_day_start
+
+
+def test_generate_logs():
+    logs = generate_logs(1, end_date=date(2022, 1, 1), seed=0)
+    assert logs == generate_logs(1, end_date=date(2022, 1, 1), seed=0)
+    assert logs != generate_logs(1, end_date=date(2022, 1, 1), seed=1)
+    timestamps = [timestamp for timestamp, _ in logs]
+    assert timestamps == sorted(timestamps)
+    assert all(state != next_state for (_, state), (_, next_state) in zip(logs, logs[1:]))
+    assert {state for _, state in logs} == {"work", "personal", "locked"}
+
+
+def test_generate_logs_until_now():
+    with frozen_now(FROZEN_NOW):
+        assert get_current_day_start() == FROZEN_NOW.replace(hour=DAY_START_HOUR)
+        logs = generate_logs(0.1, seed=0)
+    # The logs of the current day stop now
+    assert FROZEN_NOW.replace(hour=9).timestamp() < logs[-1][0] <= FROZEN_NOW.timestamp()
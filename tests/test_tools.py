@@ -1,8 +1,20 @@
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 import pytest
 
-from worktime_tracker.tools import get_productivity_plot, get_todays_productivity_plot, get_ghost_plot
+from worktime_tracker.date_utils import get_day_start
+from worktime_tracker.history import History
+from worktime_tracker.worktime_tracker import get_worktime_between
+from worktime_tracker.tools import (
+    get_productivity_plot,
+    get_todays_productivity_plot,
+    get_daily_worktime_df,
+    get_ghost_plot,
+    get_hourly_worktime_df,
+    get_work_days_worktimes_at,
+    get_worktimes_at,
+)
 from worktime_tracker.test_utils import mock_log_file
 from worktime_tracker.logs import Log
 
@@ -27,3 +39,60 @@ def test_get_productivity_plot():
 
 def test_get_ghost_plot():
     assert get_ghost_plot(length=50) is not None
+
+
+def test_get_work_days_worktimes_at():
+    day_start = get_day_start(datetime.now())
+    mocked_logs = []
+    for days_ago in range(14, -1, -1):
+        work_start = day_start - timedelta(days=days_ago, hours=-1, minutes=days_ago)
+        mocked_logs += [Log(work_start, "work"), Log(work_start + timedelta(hours=5), "locked")]
+    mocked_logs = [log for log in mocked_logs if log.timestamp < time.time()] + [Log(time.time(), "locked")]
+    with mock_log_file(mocked_logs):
+        history = History()
+        for hour in [7, 9, 12, 23, 6]:
+            # Seconds are ignored
+            worktimes_at = get_work_days_worktimes_at(datetime(2022, 1, 1, hour, 30, 15).time())
+            assert list(worktimes_at) == get_worktimes_at(history.days, datetime(2022, 1, 1, hour, 30).time())
+        assert not get_work_days_worktimes_at(datetime(2022, 1, 1, 7, 0, 15).time()).any()
+        # Only the curves of the current day are recomputed
+        day_ordinals, curves = history.get_worktime_curves()
+        assert history._n_final_curves == len(day_ordinals) - 1
+        assert curves.shape == (len(day_ordinals), 24 * 60)
+
+
+def test_get_worktime_df():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 9, 30, 0), "work"),
+        Log(datetime(2021, 12, 7, 11, 15, 0), "personal"),
+        Log(datetime(2021, 12, 8, 6, 30, 0), "work"),
+        Log(datetime(2021, 12, 8, 7, 30, 0), "locked"),
+    ]
+    get_hourly_worktime_df.cache_clear()
+    with mock_log_file(mocked_logs):
+        df_hourly = get_hourly_worktime_df()
+        df_daily = get_daily_worktime_df()
+        for hour_start in [
+            datetime(2021, 12, 7, 8),
+            datetime(2021, 12, 7, 9),
+            datetime(2021, 12, 7, 11),
+            datetime(2021, 12, 8, 6),
+        ]:
+            row = df_hourly[df_hourly["start_datetime"] == hour_start].iloc[0]
+            worktime = get_worktime_between(hour_start, hour_start + timedelta(hours=1))
+            assert row["worktime"] == worktime / 3600
+            assert (row["year"], row["month"], row["day"], row["hour"]) == (2021, 12, hour_start.day, hour_start.hour)
+    get_hourly_worktime_df.cache_clear()
+    row = df_hourly[df_hourly["start_datetime"] == datetime(2021, 12, 8, 6)].iloc[0]
+    assert (row["year_month"], row["year_week"], row["year_day"], row["formatted_date"], row["dow"]) == (
+        "Y:21 Dec",
+        "Y:21 w:49",
+        "Y:21 Dec d:08",
+        "2021-12-08",
+        "Wednesday",
+    )
+    # Daily rows are sorted by date and sum the worktime of their hours
+    assert list(df_daily["formatted_date"][:3]) == ["2021-12-07", "2021-12-08", "2021-12-09"]
+    assert list(df_daily["worktime"][:2]) == [1.75, 1]
+    assert df_daily["worktime"].sum() == pytest.approx(df_hourly["worktime"].sum())
@@ -0,0 +1,64 @@
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from worktime_tracker import logs
+from worktime_tracker.constants import LAST_CHECK_PATH
+from worktime_tracker.logs import Log, read_last_log
+from worktime_tracker.spaces import FakeStateProvider, set_state_provider
+from worktime_tracker.test_utils import mock_log_file
+from worktime_tracker.worker import Snapshot, TrackerWorker
+
+
+def test_tracker_worker():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+    ]
+    set_state_provider(FakeStateProvider(["personal"]))
+    published = []
+    try:
+        with mock_log_file(mocked_logs):
+            worker = TrackerWorker(on_snapshot=lambda: published.append(worker.snapshot))
+            worker.start()
+            snapshot = worker.wait_for_new_snapshot(timeout=10)
+            worker.stop()
+            worker.join(timeout=10)
+            assert not worker.is_alive()
+            # The state was polled and logged by the worker before computing the snapshot
+            assert snapshot.state == "personal" and read_last_log().state == "personal"
+            assert published[0] is snapshot
+            # The last check is written next to the mocked logs, not in the real .logs/ directory
+            assert logs.LAST_CHECK_PATH != LAST_CHECK_PATH and logs.LAST_CHECK_PATH.exists()
+            assert isinstance(snapshot.week_summaries, tuple)
+            assert Snapshot.from_dict(snapshot.to_dict()) == snapshot
+            with pytest.raises(dataclasses.FrozenInstanceError):
+                snapshot.state = "work"
+    finally:
+        set_state_provider(None)
+
+
+def test_tracker_worker_pause():
+    mocked_logs = [
+        Log(datetime(2021, 12, 7, 8, 0, 0), "locked"),
+        Log(datetime(2021, 12, 7, 11, 0, 0), "work"),
+    ]
+    provider = FakeStateProvider(["personal"])
+    set_state_provider(provider)
+    try:
+        with mock_log_file(mocked_logs):
+            worker = TrackerWorker()
+            worker.pause(3600)
+            worker.start()
+            # The worker doesn't poll nor hold its lock while paused
+            assert worker.lock.acquire(timeout=1)
+            worker.lock.release()
+            assert provider.n_polls == 0
+            worker.pause(0)
+            assert worker.wait_for_new_snapshot(timeout=10).state == "personal"
+            worker.stop()
+            worker.join(timeout=10)
+            assert not worker.is_alive()
+    finally:
+        set_state_provider(None)
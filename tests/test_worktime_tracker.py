@@ -1,7 +1,19 @@
+import time
 from datetime import datetime, timedelta
+from unittest.mock import patch
 
-from worktime_tracker.worktime_tracker import WorktimeTracker
+import pytest
+
+from worktime_tracker.worktime_tracker import (
+    PAST_DAYS_OVERTIME,
+    WorktimeTracker,
+    get_overtime_between,
+    get_worktime_target_between,
+    get_worktime_target_from_datetime,
+)
 from worktime_tracker.date_utils import get_day_start, get_day_end
+from worktime_tracker.logs import Log, rewrite_history
+from worktime_tracker.test_utils import mock_log_file
 from worktime_tracker.tools import get_average_worktime_at
 from worktime_tracker.history import History
 
@@ -17,3 +29,44 @@ def test_get_average_worktime_at():
     days = History().days
     assert get_average_worktime_at(days, (get_day_start(datetime.now()) + timedelta(seconds=10)).time()) < 3600
     assert get_average_worktime_at(days, (get_day_end(datetime.now()) - timedelta(seconds=10)).time()) > 3600
+
+
+def get_past_workdays_logs(day_start, n_days=10):
+    """Logs of 7 hours of work on each of the n_days before day_start"""
+    mocked_logs = []
+    for days_ago in range(n_days, 0, -1):
+        work_start = day_start - timedelta(days=days_ago, hours=-2)
+        mocked_logs += [Log(work_start, "work"), Log(work_start + timedelta(hours=7), "locked")]
+    mocked_logs.append(Log(time.time(), "locked"))
+    return mocked_logs
+
+
+def test_past_days_overtime(tmp_path):
+    day_start = get_day_start(datetime.now())
+    mocked_logs = get_past_workdays_logs(day_start)
+    days_off_path = tmp_path / "days_off.tsv"
+    start_datetime = day_start - timedelta(days=10)
+    with mock_log_file(mocked_logs), patch("worktime_tracker.worktime_tracker.DAYS_OFF_PATH", days_off_path):
+        overtime = PAST_DAYS_OVERTIME.get_overtime_between(start_datetime, day_start)
+        assert overtime == pytest.approx(get_overtime_between(start_datetime, day_start))
+        # Editing the days off invalidates the cache
+        days_off_path.write_text("".join(f"{(start_datetime + timedelta(days=i)).date()}\t1\n" for i in range(10)))
+        assert PAST_DAYS_OVERTIME.get_overtime_between(start_datetime, day_start) == pytest.approx(10 * 7 * 3600)
+        # Rewriting history invalidates the cache
+        rewrite_start = day_start - timedelta(days=5, hours=-3)
+        rewrite_history(rewrite_start, rewrite_start + timedelta(hours=1), "personal")
+        assert PAST_DAYS_OVERTIME.get_overtime_between(start_datetime, day_start) == pytest.approx(10 * 7 * 3600 - 3600)
+
+
+def test_worktime_target_between():
+    day_start = get_day_start(datetime.now())
+    with mock_log_file(get_past_workdays_logs(day_start)):
+        worked_ordinals = {(day_start - timedelta(days=days_ago)).toordinal() for days_ago in range(1, 11)}
+        assert History().get_worked_ordinals() == worked_ordinals
+        for n_days in range(15):
+            start_datetime = day_start - timedelta(days=n_days)
+            expected_target = sum(
+                get_worktime_target_from_datetime(start_datetime + timedelta(days=i)) for i in range(n_days + 1)
+            )
+            target = get_worktime_target_between(start_datetime, day_start + timedelta(days=1))
+            assert target == pytest.approx(expected_target)
@@ -0,0 +1,218 @@
+"""Incremental compressed backups of the logs files.
+
+Each backup is a version of a logs file from before a rewrite, stored in .logs/backup. A version is either a compressed
+full snapshot of the file or a delta: the bytes appended to the file since the previous rewrite. Each version also
+stores the rewrite that was applied to it (the replaced byte range and the new bytes) so that any version can be rebuilt
+from the last full snapshot before it. A full snapshot is taken every SNAPSHOT_INTERVAL versions, or when the file was
+modified otherwise than by appends since the previous rewrite (e.g. when sealing segments).
+The sqlite database is backed up the same way through a TSV dump of its logs, so its versions are TSV files.
+"""
+
+from contextlib import contextmanager
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+import time
+import zlib
+
+from worktime_tracker.config import Config
+
+SNAPSHOT_INTERVAL = 20
+# The end of the rewritten file is checksummed to check that it was only appended to since
+TAIL_CHECK_SIZE = 4096
+
+
+def get_backup_dir() -> Path:
+    """The backups of the active logs file and of the archived segments are in the same folder"""
+    from worktime_tracker.logs import get_active_logs_path  # Circular import
+
+    return get_active_logs_path().parent / "backup"
+
+
+def get_index_path(path: Path) -> Path:
+    return get_backup_dir() / f"{path.name}.backups.json"
+
+
+def load_versions(path: Path) -> list[dict]:
+    index_path = get_index_path(path)
+    if not index_path.exists():
+        return []
+    with index_path.open() as f:
+        return json.load(f)
+
+
+def save_versions(path: Path, versions: list[dict]) -> None:
+    index_path = get_index_path(path)
+    temp_path = index_path.with_suffix(".tmp")
+    with temp_path.open("w") as f:
+        json.dump(versions, f, indent=4)
+    temp_path.replace(index_path)
+
+
+def get_tail_checksum(f, size: int) -> int:
+    start = max(size - TAIL_CHECK_SIZE, 0)
+    f.seek(start)
+    return zlib.crc32(f.read(size - start))
+
+
+def get_post(source, size: int, identity: dict) -> dict:
+    """State of source after a rewrite, to check whether it was only appended to at the next rewrite"""
+    return dict(identity, size=size, tail_checksum=get_tail_checksum(source, size))
+
+
+def is_appended_to(source, versions: list[dict], identity: dict) -> bool:
+    """Whether source was only appended to since the rewrite of the last version, identity (e.g. the inode of the file)
+    changes when it is replaced"""
+    if len(versions) == 0 or versions[-1]["post"] is None:
+        return False
+    post = versions[-1]["post"]
+    return (
+        all(post.get(key) == value for key, value in identity.items())
+        and source.seek(0, os.SEEK_END) >= post["size"]
+        and get_tail_checksum(source, post["size"]) == post["tail_checksum"]
+    )
+
+
+def get_file_identity(source) -> dict:
+    return {"inode": os.fstat(source.fileno()).st_ino}
+
+
+def add_version(
+    path: Path, source, versions: list[dict], rewrite: tuple[int, int, bytes, bytes] = None, identity: dict = None
+) -> dict:
+    """Back up the current content of source (opened on path, or a dump of path with its identity) as a new version"""
+    if identity is None:
+        identity = get_file_identity(source)
+    n_deltas = next((i for i, version in enumerate(versions[::-1]) if version["kind"] == "full"), len(versions))
+    kind = "delta" if n_deltas < SNAPSHOT_INTERVAL - 1 and is_appended_to(source, versions, identity) else "full"
+    start = versions[-1]["post"]["size"] if kind == "delta" else 0
+    source.seek(start)
+    content = source.read()
+    size = start + len(content)
+    number = versions[-1]["version"] + 1 if len(versions) > 0 else 1
+    version = {
+        "version": number,
+        "timestamp": time.time(),
+        "kind": kind,
+        "file": f"{path.name}.{number}.{kind}.gz",
+        "size": size,
+        "content_size": len(content),
+        "rewrite": None,
+        "post": None,
+    }
+    if rewrite is not None:
+        start_offset, end_offset, replacement, appended = rewrite
+        version["rewrite"] = {
+            "start": start_offset,
+            "end": end_offset,
+            "replacement_size": len(replacement),
+            "appended_size": len(appended),
+        }
+        content += replacement + appended
+    backup_dir = get_backup_dir()
+    backup_dir.mkdir(exist_ok=True)
+    with gzip.open(backup_dir / version["file"], "wb") as f:
+        f.write(content)
+    versions.append(version)
+    save_versions(path, versions)
+    return version
+
+
+def backup_file(path: Path) -> None:
+    """Full compressed snapshot of a file that is going to be rewritten entirely"""
+    versions = load_versions(path)
+    with open(path, "rb") as source:
+        # Without a rewrite, the next version will be a full snapshot
+        add_version(path, source, versions)
+    prune_backups(path)
+
+
+@contextmanager
+def backup_rewrite(path: Path, start_offset: int, end_offset: int, replacement: bytes, appended: bytes):
+    """Back up path before the body of the with statement replaces its bytes [start_offset, end_offset) by replacement
+    and appends appended (in a new file that replaces path)"""
+    versions = load_versions(path)
+    with open(path, "rb") as source:
+        old_size = os.fstat(source.fileno()).st_size
+        version = add_version(path, source, versions, (start_offset, end_offset, replacement, appended))
+    yield
+    post_size = start_offset + len(replacement) + old_size - end_offset + len(appended)
+    with open(path, "rb") as f:
+        version["post"] = get_post(f, post_size, get_file_identity(f))
+    save_versions(path, versions)
+    prune_backups(path)
+
+
+def backup_dump_rewrite(
+    path: Path, dump: bytes, generation: int, start_offset: int, end_offset: int, replacement: bytes, appended: bytes
+) -> None:
+    """Back up a database from a dump of its logs before its logs in the byte range [start_offset, end_offset) of the
+    dump are replaced by replacement and appended is appended.
+
+    Must be called in the transaction of the rewrite. The generation of the database identifies it like the inode of a
+    file, the rewrite increments it.
+    """
+    versions = load_versions(path)
+    version = add_version(
+        path, io.BytesIO(dump), versions, (start_offset, end_offset, replacement, appended), {"generation": generation}
+    )
+    post_dump = dump[:start_offset] + replacement + dump[end_offset:] + appended
+    version["post"] = get_post(io.BytesIO(post_dump), len(post_dump), {"generation": generation + 1})
+    save_versions(path, versions)
+
+
+def apply_rewrite(content: bytes, rewrite: dict, new_bytes: bytes) -> bytes:
+    replacement = new_bytes[: rewrite["replacement_size"]]
+    appended = new_bytes[rewrite["replacement_size"] :]
+    return content[: rewrite["start"]] + replacement + content[rewrite["end"] :] + appended
+
+
+def read_version(path: Path, version_number: int) -> bytes:
+    """Rebuild a version of path from the last full snapshot before it and the following deltas"""
+    versions = load_versions(path)
+    index = next((i for i, version in enumerate(versions) if version["version"] == version_number), None)
+    if index is None:
+        raise ValueError(f"No version {version_number} in the backups of {path}")
+    first_index = max(i for i in range(index + 1) if versions[i]["kind"] == "full")
+    content, previous_rewrite, new_bytes = b"", None, b""
+    for version in versions[first_index : index + 1]:
+        with gzip.open(get_backup_dir() / version["file"], "rb") as f:
+            data = f.read()
+        if version["kind"] == "full":
+            content = data[: version["content_size"]]
+        else:
+            # The previous version was rewritten and then appended to
+            content = apply_rewrite(content, previous_rewrite, new_bytes) + data[: version["content_size"]]
+        previous_rewrite, new_bytes = version["rewrite"], data[version["content_size"] :]
+    assert len(content) == versions[index]["size"], "Corrupted backups"
+    return content
+
+
+def restore_backup(path: Path, version_number: int, destination: Path) -> None:
+    content = read_version(path, version_number)
+    temp_path = destination.with_name(destination.name + ".tmp")
+    with open(temp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, destination)
+
+
+def prune_backups(path: Path) -> None:
+    """Remove the backups older than the retention period, except the ones needed to rebuild the kept versions"""
+    cutoff = time.time() - Config().backup_retention_days * 24 * 3600
+    versions = load_versions(path)
+    # The last version is always kept
+    first_index = next((i for i, version in enumerate(versions) if version["timestamp"] >= cutoff), len(versions) - 1)
+    first_index = max((i for i in range(first_index + 1) if versions[i]["kind"] == "full"), default=0)
+    if first_index > 0:
+        for version in versions[:first_index]:
+            (get_backup_dir() / version["file"]).unlink(missing_ok=True)
+        save_versions(path, versions[first_index:])
+    # Full copies made by previous versions, e.g. logs.tsv.bck1639000000
+    for backup_path in get_backup_dir().glob(f"{path.name}.bck*"):
+        timestamp = backup_path.name[len(f"{path.name}.bck") :]
+        if timestamp.isdigit() and int(timestamp) < cutoff:
+            backup_path.unlink()
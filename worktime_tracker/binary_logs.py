@@ -0,0 +1,123 @@
+"""Fixed-width binary log format.
+
+Each log is a 9 bytes record (little endian float64 timestamp + uint8 state code) so that the file can be memory-mapped,
+the last log can be read with offset arithmetic and timestamp ranges can be found with a binary search.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+from worktime_tracker.constants import STATES
+from worktime_tracker.utils import yield_lines
+
+LOG_DTYPE = np.dtype([("timestamp", "<f8"), ("state", "u1")])
+RECORD_SIZE = LOG_DTYPE.itemsize
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+
+def encode_state(state: str) -> int:
+    if state not in STATE_CODES:
+        raise ValueError(f"State {state} can't be stored in binary logs, known states are {STATES}")
+    return STATE_CODES[state]
+
+
+def decode_state(state_code: int) -> str:
+    return STATES[state_code]
+
+
+def encode_log(timestamp: float, state: str) -> bytes:
+    return np.array([(timestamp, encode_state(state))], dtype=LOG_DTYPE).tobytes()
+
+
+def decode_record(record_bytes: bytes) -> tuple[float, str]:
+    timestamp, state_code = np.frombuffer(record_bytes, dtype=LOG_DTYPE)[0].tolist()
+    return timestamp, decode_state(state_code)
+
+
+def get_n_records(path: Path) -> int:
+    # A truncated record at the end of the file (e.g. crash during a write) is ignored
+    return os.path.getsize(path) // RECORD_SIZE
+
+
+def drop_truncated_record(f) -> None:
+    """Remove a truncated record at the end of a file opened for appending, otherwise the next records would be
+    shifted"""
+    size = os.fstat(f.fileno()).st_size
+    if size % RECORD_SIZE != 0:
+        f.truncate(size - size % RECORD_SIZE)
+
+
+def read_records(path: Path) -> np.ndarray:
+    """Memory-map all records, the returned array has "timestamp" and "state" fields."""
+    n_records = get_n_records(path)
+    if n_records == 0:
+        return np.empty(0, dtype=LOG_DTYPE)
+    return np.memmap(path, dtype=LOG_DTYPE, mode="r", shape=(n_records,))
+
+
+def read_record(path: Path, index: int) -> tuple[float, str]:
+    with open(path, "rb") as f:
+        f.seek(index * RECORD_SIZE)
+        return decode_record(f.read(RECORD_SIZE))
+
+
+def read_last_record(path: Path) -> tuple[float, str]:
+    n_records = get_n_records(path)
+    if n_records == 0:
+        return None
+    return read_record(path, n_records - 1)
+
+
+def get_records_slice(records: np.ndarray, start_timestamp: float, end_timestamp: float) -> slice:
+    """Slice of the records with start_timestamp <= timestamp < end_timestamp (records are sorted by timestamp)."""
+    timestamps = records["timestamp"]
+    return slice(
+        int(np.searchsorted(timestamps, start_timestamp, side="left")),
+        int(np.searchsorted(timestamps, end_timestamp, side="left")),
+    )
+
+
+def read_records_between(path: Path, start_timestamp: float, end_timestamp: float) -> list[tuple[float, str]]:
+    records = read_records(path)
+    records = records[get_records_slice(records, start_timestamp, end_timestamp)]
+    return [(timestamp, decode_state(state_code)) for timestamp, state_code in records.tolist()]
+
+
+def reverse_read_records(path: Path):
+    records = read_records(path)
+    for index in range(len(records) - 1, -1, -1):
+        timestamp, state_code = records[index].tolist()
+        yield timestamp, decode_state(state_code)
+
+
+def encode_logs(logs: list[tuple[float, str]]) -> bytes:
+    return np.array([(timestamp, encode_state(state)) for timestamp, state in logs], dtype=LOG_DTYPE).tobytes()
+
+
+def write_records(path: Path, logs: list[tuple[float, str]]) -> None:
+    with open(path, "wb") as f:
+        f.write(encode_logs(logs))
+
+
+def convert_tsv_to_binary(tsv_path: Path, binary_path: Path) -> None:
+    """Only the states of STATES can be stored in binary logs, a TSV file with other states (e.g. written by a rewrite
+    with the TSV backend) raises a ValueError"""
+    logs = []
+    for line in yield_lines(tsv_path):
+        if line == "":
+            continue
+        timestamp, state = line.split("\t")
+        if state not in STATE_CODES:
+            raise ValueError(
+                f"Can't convert {tsv_path} to binary logs, unknown state in {line!r} (known states: {STATES})"
+            )
+        logs.append((float(timestamp), state))
+    write_records(binary_path, logs)
+
+
+def convert_binary_to_tsv(binary_path: Path, tsv_path: Path) -> None:
+    with open(tsv_path, "w", encoding="utf8") as f:
+        for timestamp, state_code in read_records(binary_path).tolist():
+            f.write(f"{timestamp}\t{decode_state(state_code)}\n")
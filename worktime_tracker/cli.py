@@ -1,26 +1,28 @@
-import time
 from worktime_tracker.config import Config
+from worktime_tracker.instrumentation import dump_timings, install_dump_signal_handler
 
-from worktime_tracker.worktime_tracker import WorktimeTracker
-from worktime_tracker.tools import pause, get_ghost_plot, rewrite_history_prompt, plot_productivity
-from worktime_tracker.constants import REFRESH_RATE
+from worktime_tracker.daemon import get_worker
+from worktime_tracker.tools import pause, rewrite_history_prompt
 
 
 def start():
-    worktime_tracker = WorktimeTracker()
+    install_dump_signal_handler()
+    worker = get_worker()
+    worker.start()
+    snapshot = None
     while True:
         try:
-            worktime_tracker.check_state()
-            summaries = worktime_tracker.get_week_summaries()
+            snapshot = worker.wait_for_new_snapshot(snapshot)
+            summaries = list(snapshot.week_summaries)
             if Config().show_day_worktime:
-                summaries.append(get_ghost_plot(length=50))
+                summaries.append(snapshot.get_ghost_plot(length=50))
             print(" - ".join(summaries) + "\r", end="")
-            time.sleep(REFRESH_RATE)
         except KeyboardInterrupt:
             options_to_methods = {
-                "0. Pause for a certain duration": pause,
-                "1. Plot productivity": plot_productivity,
-                "2. Rewrite history": rewrite_history_prompt,
+                "0. Pause for a certain duration": lambda: pause(worker),
+                "1. Plot productivity": worker.plot_productivity,
+                "2. Rewrite history": lambda: rewrite_history_prompt(worker),
+                "3. Dump timings": dump_timings,
             }
             options_str = "\n".join(options_to_methods.keys())
             option_index = int(
@@ -30,4 +32,5 @@ def start():
                 )
             )
             method = list(options_to_methods.values())[option_index]
+            # The methods that read or write the logs go through the worker (the daemon when it is running)
             method()
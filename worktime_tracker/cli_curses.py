@@ -1,27 +1,28 @@
-import time
 import curses
 
-from worktime_tracker.constants import REFRESH_RATE
-from worktime_tracker.worktime_tracker import WorktimeTracker
-from worktime_tracker.tools import get_ghost_plot
+from worktime_tracker.instrumentation import TIMINGS, install_dump_signal_handler
+from worktime_tracker.daemon import get_worker
 
 
 def curses_app(stdscr):
     # Clear screen
     stdscr.clear()
-    worktime_tracker = WorktimeTracker()
+    worker = get_worker()
+    worker.start()
+    snapshot = None
     while True:
-        worktime_tracker.check_state()
-        summaries = worktime_tracker.get_week_summaries()
+        snapshot = worker.wait_for_new_snapshot(snapshot)
         left_margin = 5
         # TODO: Add colors on ghost plot
-        stdscr.addstr(0, left_margin, get_ghost_plot(length=100))
-        for i, summary in enumerate(summaries):
-            stdscr.addstr(i + 1, left_margin, summary)
-        stdscr.refresh()
-        time.sleep(REFRESH_RATE)
+        with TIMINGS.stage("display"):
+            stdscr.addstr(0, left_margin, snapshot.get_ghost_plot(length=100))
+            for i, summary in enumerate(snapshot.week_summaries):
+                stdscr.addstr(i + 1, left_margin, summary)
+            stdscr.refresh()
         # TODO: Add tools like rewrite history (see cli.py)
 
 
 def start():
+    # The timings are written to a file with `kill -USR1 <pid>` so that they don't mess with the screen
+    install_dump_signal_handler()
     curses.wrapper(curses_app)
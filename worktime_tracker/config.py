@@ -15,6 +15,12 @@ class Config:
     config_path = REPO_DIR / "config.json"
     interface: str = "cli"
     show_day_worktime: bool = True
+    # "tsv", "binary" (fixed-width records, see binary_logs.py) or "sqlite" (indexed table, see sqlite_logs.py)
+    logs_backend: str = "tsv"
+    # Backups of the logs made before rewriting history are removed after this number of days (see backups.py)
+    backup_retention_days: int = 90
+    # "macos", "windows", "file" or "fake" (see spaces.py), empty for the provider of the platform
+    state_provider: str = ""
 
     def __post_init__(self):
         self.load_config()
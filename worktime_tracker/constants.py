@@ -8,6 +8,8 @@ LOGS_PATH = LOGS_DIR / "logs.tsv"
 DAYS_OFF_PATH = LOGS_DIR / "days_off.tsv"
 DONT_COUNT_DAYS_PATH = LOGS_DIR / "dont_count_days.tsv"
 LAST_CHECK_PATH = LOGS_DIR / "last_check.txt"
+SOCKET_PATH = LOGS_DIR / "daemon.sock"
+STATE_PATH = LOGS_DIR / "state"  # Written by the user's hooks when using the "file" state provider
 SPACE_TYPES_PATH = REPO_DIR / "space_types.json"
 LOGS_DIR.mkdir(exist_ok=True)
 STATES = ["work", "personal", "locked"]
@@ -0,0 +1,171 @@
+"""Tracker daemon shared by the interfaces.
+
+The daemon owns the polling, the writing of the logs and the History (through a TrackerWorker) and answers queries on a
+Unix socket. Requests and responses are JSON objects on one line: {"method": ..., "params": {...}} gets
+{"result": ...} or {"error": ...}. When the daemon is running, the interfaces are thin clients (DaemonWorker) that
+never read the logs themselves.
+"""
+
+import json
+import socket
+import socketserver
+from datetime import datetime
+
+import plotly.io
+
+from worktime_tracker.constants import SOCKET_PATH
+from worktime_tracker.tools import get_productivity_plot, get_todays_productivity_plot, plot_productivity
+from worktime_tracker.worker import Snapshot, SnapshotSource, TrackerWorker
+from worktime_tracker.worktime_tracker import get_worktime_between
+
+# Long polling of the snapshots, the clients ask again after this timeout
+SNAPSHOT_TIMEOUT = 30
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def send(self, response: dict) -> None:
+        self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                response = {"result": self.server.handle_request(request["method"], request.get("params", {}))}
+            except Exception as e:  # pylint: disable=broad-except
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.send(response)
+
+
+class TrackerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=SOCKET_PATH) -> None:
+        if path.exists():
+            if is_daemon_running(path):
+                raise RuntimeError(f"A daemon is already running on {path}")
+            path.unlink()  # Left by a daemon that crashed
+        self.path = path
+        self.worker = TrackerWorker()
+        super().__init__(str(path), DaemonRequestHandler)
+
+    def handle_request(self, method: str, params: dict):
+        if method == "ping":
+            return True
+        if method == "snapshot":
+            return self.get_snapshot(**params)
+        if method == "pause":
+            # Doesn't hold the lock of the worker so that the other requests are still answered
+            self.worker.pause(params["duration"])
+            return True
+        with self.worker.lock:
+            if method == "worktime_between":
+                return get_worktime_between(
+                    datetime.fromtimestamp(params["start"]), datetime.fromtimestamp(params["end"])
+                )
+            if method == "productivity_plot":
+                if "start" not in params:
+                    return get_todays_productivity_plot().to_json()
+                fig = get_productivity_plot(
+                    datetime.fromtimestamp(params["start"]), datetime.fromtimestamp(params["end"])
+                )
+                return fig.to_json()
+            if method == "rewrite_history":
+                edits = [
+                    (datetime.fromtimestamp(start), datetime.fromtimestamp(end), state)
+                    for start, end, state in params["edits"]
+                ]
+                self.worker.rewrite_history(edits)
+                return True
+        raise ValueError(f"Unknown method {method!r}")
+
+    def get_snapshot(self, after_version: int = None, timeout: float = SNAPSHOT_TIMEOUT) -> dict:
+        """The last snapshot, or the next one if the client already has the last one (None on timeout)"""
+        snapshot = self.worker.snapshot
+        if snapshot is None or snapshot.version == after_version:
+            snapshot = self.worker.wait_for_new_snapshot(snapshot, timeout=timeout)
+        if snapshot is None or snapshot.version == after_version:
+            return None
+        return snapshot.to_dict()
+
+    def serve(self) -> None:
+        self.worker.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.worker.stop()
+            self.worker.join()
+            self.server_close()
+            self.path.unlink(missing_ok=True)
+
+
+def query(method: str, path=SOCKET_PATH, timeout: float = None, **params):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(path))
+        client.sendall(json.dumps({"method": method, "params": params}).encode("utf8") + b"\n")
+        with client.makefile("rb") as f:
+            line = f.readline()
+    if line == b"":
+        raise ConnectionError("The daemon closed the connection")
+    response = json.loads(line)
+    if "error" in response:
+        raise RuntimeError(f"Daemon error: {response['error']}")
+    return response["result"]
+
+
+def is_daemon_running(path=SOCKET_PATH) -> bool:
+    if not path.exists():
+        return False
+    try:
+        return query("ping", path=path, timeout=1)
+    except OSError:
+        return False
+
+
+class DaemonWorker(SnapshotSource):
+    """Same interface as TrackerWorker but the snapshots are computed by the daemon"""
+
+    def __init__(self, on_snapshot=None, path=SOCKET_PATH) -> None:
+        super().__init__(on_snapshot=on_snapshot)
+        self.path = path
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            after_version = self.snapshot.version if self.snapshot is not None else None
+            try:
+                snapshot_dict = query("snapshot", path=self.path, after_version=after_version)
+            except (OSError, RuntimeError) as e:
+                if self._stopped.is_set():
+                    return
+                self.fail(e)
+                raise
+            if snapshot_dict is not None:
+                self.publish_snapshot(Snapshot.from_dict(snapshot_dict))
+
+    def pause(self, duration: float) -> None:
+        query("pause", path=self.path, duration=duration)
+
+    def rewrite_history(self, edits) -> None:
+        """The logs are only written by the daemon"""
+        query(
+            "rewrite_history",
+            path=self.path,
+            edits=[(start.timestamp(), end.timestamp(), state) for start, end, state in edits],
+        )
+
+    def plot_productivity(self) -> None:
+        plot_productivity(fig=plotly.io.from_json(query("productivity_plot", path=self.path)))
+
+
+def get_worker(on_snapshot=None) -> SnapshotSource:
+    """A client of the daemon if it is running, otherwise a worker in this process"""
+    if is_daemon_running():
+        return DaemonWorker(on_snapshot=on_snapshot)
+    return TrackerWorker(on_snapshot=on_snapshot)
+
+
+def start() -> None:
+    daemon = TrackerDaemon()
+    print(f"Worktime Tracker daemon listening on {daemon.path}")
+    daemon.serve()
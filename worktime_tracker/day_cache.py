@@ -0,0 +1,170 @@
+import datetime
+import hashlib
+import json
+import math
+
+from worktime_tracker import sqlite_logs
+from worktime_tracker.date_utils import get_day_end, get_day_start
+from worktime_tracker.interval_store import IntervalStore
+from worktime_tracker.logs import (
+    Log,
+    find_offset_after,
+    get_active_logs_path,
+    get_day_cache_path,
+    get_logs_signature,
+    is_sqlite_backend,
+    read_logs_between,
+)
+from worktime_tracker.segments import read_log_at_or_before
+
+
+def get_prefix_fingerprint(path, prefix_size: int) -> str:
+    """Hash of the first prefix_size bytes of a file (the first prefix_size logs with the sqlite backend)"""
+    if is_sqlite_backend():
+        return sqlite_logs.get_prefix_fingerprint(path, prefix_size)
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        remaining = prefix_size
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            sha1.update(chunk)
+            remaining -= len(chunk)
+    return sha1.hexdigest()
+
+
+class DayCache:
+    """Persistent per-day aggregates of past days (worktime, state durations, number of intervals, work intervals).
+
+    The cache covers the logs from first_timestamp (None if it covers all the logs) up to a cutoff timestamp (the start
+    of a day) and is stamped with a fingerprint of the part of the logs file before the cutoff, so that it is discarded if
+    this part changes.
+    Dates can be missing (e.g. invalidated by rewrite_history), they are recomputed from the logs of these dates only.
+    """
+
+    def __init__(
+        self,
+        cutoff: float,
+        cutoff_state: str,
+        prefix_size: int,
+        first_ordinal: int,
+        days: dict,
+        first_timestamp: float,
+        logs_name: str = None,
+        fingerprint: str = None,
+    ) -> None:
+        self.cutoff = cutoff
+        self.cutoff_state = cutoff_state  # State of the last log before the cutoff
+        self.prefix_size = prefix_size  # Size of the logs file prefix that contains the logs before the cutoff
+        self.first_ordinal = first_ordinal  # First day covered by the cache
+        self.days = {int(day_ordinal): aggregates for day_ordinal, aggregates in days.items()}
+        # dont_read_before of the history that computed the days, the logs before it were not read
+        self.first_timestamp = first_timestamp
+        if logs_name is None:
+            logs_name = get_active_logs_path().name
+            fingerprint = get_prefix_fingerprint(get_active_logs_path(), prefix_size)
+        self.logs_name = logs_name
+        self.fingerprint = fingerprint
+
+    @property
+    def cutoff_ordinal(self) -> int:
+        return get_day_start(datetime.datetime.fromtimestamp(self.cutoff)).date().toordinal()
+
+    @property
+    def first_covered_timestamp(self) -> float:
+        return -math.inf if self.first_timestamp is None else self.first_timestamp
+
+    @staticmethod
+    def from_cutoff(
+        cutoff: float, cutoff_state: str, first_ordinal: int, days: dict, first_timestamp: float
+    ) -> "DayCache":
+        if first_timestamp == -math.inf:
+            first_timestamp = None  # Not valid JSON
+        return DayCache(cutoff, cutoff_state, find_offset_after(cutoff), first_ordinal, days, first_timestamp)
+
+    @staticmethod
+    def load() -> "DayCache":
+        """Load the cache, returns None if there is no valid cache for the current logs file"""
+        cache_path = get_day_cache_path()
+        if not cache_path.exists():
+            return None
+        try:
+            with cache_path.open() as f:
+                cache = DayCache(**json.load(f))
+        except (json.JSONDecodeError, TypeError, ValueError):
+            print("WARNING: Ignoring corrupted day cache")
+            return None
+        if not cache.is_valid():
+            return None
+        return cache
+
+    def is_valid(self) -> bool:
+        logs_path = get_active_logs_path()
+        if self.logs_name != logs_path.name or get_logs_signature()[1] < self.prefix_size:
+            return False
+        return get_prefix_fingerprint(logs_path, self.prefix_size) == self.fingerprint
+
+    def save(self) -> None:
+        cache_path = get_day_cache_path()
+        temp_path = cache_path.with_suffix(".tmp")
+        with temp_path.open("w") as f:
+            json.dump(self.__dict__, f)
+        temp_path.replace(cache_path)
+
+    def get_missing_ordinals(self) -> list[int]:
+        return [
+            day_ordinal
+            for day_ordinal in range(self.first_ordinal, self.cutoff_ordinal)
+            if day_ordinal not in self.days
+        ]
+
+    def fill_missing_days(self) -> None:
+        """Compute the aggregates of missing days by reading only the logs of these days"""
+        missing_ordinals = self.get_missing_ordinals()
+        for day_ordinal in missing_ordinals:
+            date = datetime.date.fromordinal(day_ordinal)
+            self.days[day_ordinal] = get_day_aggregates_from_logs(
+                get_day_start(date).timestamp(), get_day_end(date).timestamp()
+            ).get(day_ordinal, {"worktime": 0, "state_durations": {}, "n_intervals": 0, "work_intervals": []})
+        if len(missing_ordinals) > 0:
+            self.save()
+
+
+def get_day_aggregates_from_logs(start_timestamp: float, end_timestamp: float) -> dict[int, dict]:
+    """Per-day aggregates of the logs between two timestamps, reading only this part of the logs"""
+    previous_log = read_log_at_or_before(start_timestamp)
+    if previous_log is None:
+        logs = []
+    else:
+        logs = [Log(start_timestamp, previous_log.state)]
+    logs += [log for log in read_logs_between(start_timestamp, end_timestamp) if log.timestamp > start_timestamp]
+    store = IntervalStore()
+    store.add_logs([log.timestamp for log in logs] + [end_timestamp], [log.state for log in logs])
+    return store.get_day_aggregates()
+
+
+def invalidate_day_cache(start_datetime: datetime.datetime, end_datetime: datetime.datetime) -> None:
+    """Remove the days between start_datetime and end_datetime from the cache after rewriting the logs."""
+    cache_path = get_day_cache_path()
+    if not cache_path.exists():
+        return
+    try:
+        with cache_path.open() as f:
+            cache = DayCache(**json.load(f))
+    except (json.JSONDecodeError, TypeError, ValueError):
+        cache_path.unlink()
+        return
+    first_ordinal = get_day_start(start_datetime).date().toordinal()
+    last_ordinal = get_day_start(end_datetime).date().toordinal()
+    days = {
+        day_ordinal: aggregates
+        for day_ordinal, aggregates in cache.days.items()
+        if not first_ordinal <= day_ordinal <= last_ordinal
+    }
+    # The prefix before the cutoff changed, compute its new fingerprint
+    cutoff_log = read_log_at_or_before(cache.cutoff)
+    if cutoff_log is None:
+        cache_path.unlink()
+        return
+    DayCache.from_cutoff(cache.cutoff, cutoff_log.state, cache.first_ordinal, days, cache.first_timestamp).save()
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def get_cumulative_worktimes(starts: np.ndarray, ends: np.ndarray, is_work: np.ndarray) -> np.ndarray:
+    """Prefix sums of worktime, the i-th element is the total worktime of the first i intervals."""
+    return np.concatenate([[0], np.cumsum(np.where(is_work, ends - starts, 0))])
+
+
+def get_worktime_before(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    is_work: np.ndarray,
+    timestamps: np.ndarray,
+    cumulative_worktimes: np.ndarray = None,
+) -> np.ndarray:
+    """Total worktime before each timestamp. Intervals must be sorted and not overlapping."""
+    if cumulative_worktimes is None:
+        cumulative_worktimes = get_cumulative_worktimes(starts, ends, is_work)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(starts) == 0:
+        return np.zeros(len(timestamps))
+    # Number of intervals that started before each timestamp, the last one of them might not be finished yet
+    n_started = np.searchsorted(starts, timestamps, side="right")
+    last_started = np.maximum(n_started - 1, 0)
+    overshoot = np.clip(ends[last_started] - timestamps, 0, None)
+    overshoot = np.where((n_started > 0) & is_work[last_started], overshoot, 0)
+    return cumulative_worktimes[n_started] - overshoot
+
+
+def discretize_worktime(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    is_work: np.ndarray,
+    bin_edges: np.ndarray,
+    cumulative_worktimes: np.ndarray = None,
+) -> np.ndarray:
+    """Worktime in each bin [bin_edges[i], bin_edges[i+1]), computed in one vectorized pass.
+
+    Returns an array with len(bin_edges) - 1 elements.
+    """
+    return np.diff(get_worktime_before(starts, ends, is_work, bin_edges, cumulative_worktimes=cumulative_worktimes))
+
+
+def get_bin_edges(start_timestamp: float, end_timestamp: float, bin_size: float) -> np.ndarray:
+    """Edges of the bins of bin_size seconds between start_timestamp and end_timestamp (the last partial bin is
+    dropped)."""
+    n_bins = int((end_timestamp - start_timestamp) / bin_size)
+    return start_timestamp + bin_size * np.arange(n_bins + 1)
@@ -1,16 +1,38 @@
+from collections.abc import Sequence
 from copy import copy
+import bisect
+import itertools
+import math
 import time
 import datetime
 
+import numpy as np
+
 from worktime_tracker.date_utils import get_day_end, get_day_start
-from worktime_tracker.logs import Log, reverse_read_logs
+from worktime_tracker.day_cache import DayCache
+from worktime_tracker.discretizer import discretize_worktime, get_worktime_before
+from worktime_tracker.instrumentation import TIMINGS
+from worktime_tracker.interval_store import IntervalStore
+from worktime_tracker.segments import read_archived_logs
+from worktime_tracker.logs import (
+    Log,
+    find_offset_after,
+    get_logs_signature,
+    read_log_before_offset,
+    read_logs_between,
+    read_logs_from_offset,
+)
 from worktime_tracker.constants import STATES_TYPE, WORK_STATES
 from worktime_tracker.utils import seconds_to_human_readable
 
+MINUTES_PER_DAY = 24 * 60
+
 
 class Interval:
     """Represents an interval of time associated to a given state, i.e. a start and end log."""
 
+    __slots__ = ("start_log", "end_log")
+
     def __init__(self, start_log: Log, end_log: Log):
         assert start_log <= end_log, f"{start_log=}, {end_log=}"
         assert (
@@ -18,8 +40,14 @@ class Interval:
         ), f"Intervals cannot be longer than 1 year: {start_log=}, {end_log=}"
         self.start_log = start_log
         self.end_log = end_log
-        self.start_datetime = start_log.datetime
-        self.end_datetime = end_log.datetime
+
+    @property
+    def start_datetime(self) -> datetime.datetime:
+        return self.start_log.datetime
+
+    @property
+    def end_datetime(self) -> datetime.datetime:
+        return self.end_log.datetime
 
     @staticmethod
     def convert_logs_to_intervals(logs: list[Log]) -> list["Interval"]:
@@ -49,15 +77,18 @@ class Interval:
     ):
         """Get intervals between start_datetime and end_datetime"""
         assert start_datetime <= end_datetime
+        # Compare timestamps to avoid computing the datetimes of the logs
+        start_timestamp = start_datetime.timestamp()
+        end_timestamp = end_datetime.timestamp()
         intervals_between = []
         for interval in intervals:
-            if interval.end_datetime < start_datetime or end_datetime < interval.start_datetime:
+            if interval.end_log.timestamp < start_timestamp or end_timestamp < interval.start_log.timestamp:
                 # Discard intervals that doe not overlap with the range
                 continue
-            if interval.start_datetime < start_datetime:
-                _, interval = interval.split(start_datetime)
-            if end_datetime < interval.end_datetime:
-                interval, _ = interval.split(end_datetime)
+            if interval.start_log.timestamp < start_timestamp:
+                _, interval = interval.split(start_timestamp)
+            if end_timestamp < interval.end_log.timestamp:
+                interval, _ = interval.split(end_timestamp)
             intervals_between.append(interval)
         return intervals_between
 
@@ -78,8 +109,8 @@ class Interval:
         return self.duration if self.is_work_interval else 0
 
     def split(self, timestamp: float) -> list["Interval"]:
+        assert self.start_log.timestamp <= timestamp <= self.end_log.timestamp
         split_log = Log(timestamp, self.state)
-        assert self.start_log <= split_log <= self.end_log
         return Interval(self.start_log, split_log), Interval(split_log, self.end_log)
 
     def __eq__(self, other: "Interval") -> bool:
@@ -90,14 +121,58 @@ class Interval:
         return f"Interval<state:{self.state}, start:{start_str}, duration:{seconds_to_human_readable(self.duration)}>"
 
 
+def compute_worktime_curves(
+    day_ordinals: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    is_work: np.ndarray,
+    cumulative_worktimes: np.ndarray = None,
+) -> np.ndarray:
+    """Cumulative worktime of each day at the end of each minute since the start of the day (days x 1440)"""
+    day_start_timestamps = np.array(
+        [get_day_start(datetime.date.fromordinal(day_ordinal)).timestamp() for day_ordinal in day_ordinals.tolist()]
+    )
+    minute_ends = day_start_timestamps[:, None] + 60 * np.arange(1, MINUTES_PER_DAY + 1)
+    timestamps = np.concatenate([day_start_timestamps, minute_ends.ravel()])
+    worktimes_before = get_worktime_before(starts, ends, is_work, timestamps, cumulative_worktimes=cumulative_worktimes)
+    n_days = len(day_ordinals)
+    return worktimes_before[n_days:].reshape(n_days, MINUTES_PER_DAY) - worktimes_before[:n_days, None]
+
+
+def get_intervals_from_store(store: IntervalStore, index_slice: slice = slice(None)) -> list[Interval]:
+    """Build Interval objects from the columnar store, only used when a caller needs the objects."""
+    intervals = []
+    from_parsed = Log.from_parsed
+    for start, end, state_code in zip(
+        store.starts[index_slice].tolist(), store.ends[index_slice].tolist(), store.states[index_slice].tolist()
+    ):
+        state = store.state_names[state_code]
+        intervals.append(Interval(from_parsed(start, state), from_parsed(end, state)))
+    return intervals
+
+
 class Day:
-    """Represents a day of logs, i.e. a list of Intervals."""
+    """Represents a day of logs, i.e. a list of Intervals.
 
-    def __init__(self, date: datetime.date) -> None:
+    Days are views on the IntervalStore of the History, intervals are only built when accessed.
+    """
+
+    def __init__(self, date: datetime.date, store: IntervalStore) -> None:
         self.date = date
-        self.intervals = []
         self.day_start = get_day_start(date)
         self.day_end = get_day_end(date)
+        self._store = store
+        self._intervals = None
+
+    @property
+    def _slice(self) -> slice:
+        return self._store.get_day_slice(self.date.toordinal())
+
+    @property
+    def intervals(self) -> list[Interval]:
+        if self._intervals is None:
+            self._intervals = get_intervals_from_store(self._store, self._slice)
+        return self._intervals
 
     @property
     def last_interval(self):
@@ -105,31 +180,15 @@ class Day:
             return None
         return self.intervals[-1]
 
-    def add_interval(self, interval: Interval) -> None:
-        assert (
-            self.day_start <= interval.start_datetime <= interval.end_datetime <= self.day_end
-        ), f"Failed assertion: {self.day_start} <= {interval.start_datetime} <= {interval.end_datetime} <= {self.day_end}"
-        # Check that the new interval is not overlapping with the last one
-        if self.last_interval is not None and self.last_interval.start_log == interval.start_log:
-            # If the last interval is starts at the same moment as the new one, it's probably because it was a dummy one that was added programmatically
-            # TODO: It seems that there are many dummy intervals, double check that everything works well
-            # print(f"Removing dummy interval {self.last_interval} in favor of {interval}")
-            self.intervals.pop()
-        if self.last_interval is not None:
-            assert (
-                self.last_interval.end_datetime <= interval.start_datetime
-            ), f"Failed assertion: {self.last_interval} <= {interval}"
-        self.intervals.append(interval)
-
     @property
     def work_intervals(self) -> list[Interval]:
         return [interval for interval in self.intervals if interval.is_work_interval]
 
     def get_worktime_between(self, start_datetime: datetime.datetime, end_datetime: datetime.datetime) -> float:
         """Get the worktime between start_datetime and end_datetime"""
-        return sum(
-            interval.worktime
-            for interval in Interval.get_intervals_between(self.intervals, start_datetime, end_datetime)
+        assert start_datetime <= end_datetime
+        return self._store.get_worktime_between(
+            start_datetime.timestamp(), end_datetime.timestamp(), index_slice=self._slice
         )
 
     def get_worktime_at(self, dt_time: datetime.time) -> float:
@@ -143,7 +202,7 @@ class Day:
 
     @property
     def worktime(self) -> float:
-        return sum([interval.worktime for interval in self.work_intervals])
+        return self._store.get_day_worktime(self.date.toordinal())
 
     def is_week_day(self) -> bool:
         return self.day_start.weekday() < 5
@@ -156,6 +215,35 @@ class Day:
         return f"Day(date='{self.date}', worktime='{seconds_to_human_readable(self.worktime)}')"
 
 
+class DaysView(Sequence):
+    """Read-only view on a contiguous range of the sorted days of a history, without copying them.
+
+    Day objects are only built when they are accessed.
+    """
+
+    def __init__(self, history: "History", start: int, stop: int) -> None:
+        self._history = history
+        self._start = start
+        self._stop = stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            assert step == 1, "Only contiguous slices of days are supported"
+            return DaysView(self._history, self._start + start, self._start + max(start, stop))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Day index out of range: {i}")
+        return self._history._get_day(self._history._day_ordinals[self._start + i])
+
+    def __repr__(self) -> str:
+        return f"{list(self)}"
+
+
 class ArgsSingleton(type):
     """Creates only one instance per set of arguments"""
 
@@ -171,76 +259,281 @@ class ArgsSingleton(type):
 class History(metaclass=ArgsSingleton):
     """Singleton class that tracks the history of worktimes organized by days and intervals."""
 
+    # Incremented each time a history is (re)loaded, shared by all instances so that it also changes after clear()
+    _generations = itertools.count()
+
     @staticmethod
     def clear() -> None:
         """Clear the history singleton"""
         History._instances.clear()
 
+    @staticmethod
+    def reload_all_from(timestamp: float) -> None:
+        """Update the live histories after the logs were rewritten from timestamp"""
+        for history in History._instances.values():
+            history.reload_from(timestamp)
+
     def __init__(self, dont_read_before="default", refresh_rate=1) -> None:
         print("Initializing history...")
-        self._days_dict = {}
         if dont_read_before == "default":
             self.dont_read_before = datetime.datetime.fromtimestamp(time.time()) - datetime.timedelta(days=365)
         elif dont_read_before is None:
             self.dont_read_before = datetime.datetime.min
         else:
             self.dont_read_before = dont_read_before
-        self._last_read_log = None
         self._last_refresh = None
         self.refresh_rate = refresh_rate
+        self.generation = next(History._generations)
+        self.worked_days_version = 0  # Incremented each time the set of worked days changes
+        # Worktime curves of the days, the first _n_final_curves rows are days that are over and won't change
+        self._curves_generation = None
+        self._curve_ordinals = np.empty(0, dtype=np.int64)
+        self._curves = np.empty((0, MINUTES_PER_DAY))
+        self._n_final_curves = 0
+        self._reset()
+        self._load_day_cache()
         self.refresh()
+        self._save_day_cache()
         print("History initialized")
 
+    def _reset(self) -> None:
+        self._store = IntervalStore()
+        self._days_dict = {}
+        self._last_read_log = None
+        self._last_read_log_offset = None  # Offset of the last read log in the logs file
+        self._read_offset = None  # Where to start reading new logs
+        self._logs_signature = None
+        # Aggregates of the days before the cutoff of the day cache, the logs of these days are only read when needed
+        self._day_cache = None
+        self._cached_days = {}
+        self._cache_cutoff = -math.inf
+        self._day_ordinals = []  # Sorted ordinals of the days in the store
+        self._worked_ordinals = set()  # Ordinals of the days with a positive worktime
+        self.worked_days_version += 1
+
+    @property
+    def dont_read_before_timestamp(self) -> float:
+        if self.dont_read_before == datetime.datetime.min:
+            return -math.inf
+        return self.dont_read_before.timestamp()
+
+    def _is_fully_read(self, day_ordinal: int) -> bool:
+        """Whether the day starts after dont_read_before, i.e. all its logs are taken into account"""
+        return get_day_start(datetime.date.fromordinal(day_ordinal)).timestamp() >= self.dont_read_before_timestamp
+
+    def _load_day_cache(self) -> None:
+        day_cache = DayCache.load()
+        if day_cache is None or day_cache.cutoff <= self.dont_read_before_timestamp:
+            return
+        if self.dont_read_before_timestamp < day_cache.first_covered_timestamp:
+            # The cache was computed by a history that didn't read the logs as far back as this one
+            return
+        day_cache.fill_missing_days()
+        self._day_cache = day_cache
+        self._cached_days = {
+            day_ordinal: aggregates
+            for day_ordinal, aggregates in day_cache.days.items()
+            if self._is_fully_read(day_ordinal)
+        }
+        self._cache_cutoff = day_cache.cutoff
+        self._worked_ordinals.update(
+            day_ordinal for day_ordinal, aggregates in self._cached_days.items() if aggregates["worktime"] > 0
+        )
+        self.worked_days_version += 1
+        # Start reading the logs at the cutoff
+        self._last_read_log = Log(day_cache.cutoff, day_cache.cutoff_state)
+        self._read_offset = day_cache.prefix_size
+
+    def _save_day_cache(self) -> None:
+        """Cache the aggregates of the days that are over"""
+        cutoff = get_day_start(datetime.datetime.fromtimestamp(time.time()))
+        cutoff_state = self._store.get_state_at(cutoff.timestamp())
+        if cutoff.timestamp() <= self._cache_cutoff or cutoff_state is None:
+            return
+        if self._day_cache is None:
+            days, first_timestamp = {}, self.dont_read_before_timestamp
+        else:
+            days, first_timestamp = self._day_cache.days, self._day_cache.first_covered_timestamp
+        days.update(
+            {
+                day_ordinal: aggregates
+                for day_ordinal, aggregates in self._store.get_day_aggregates().items()
+                if day_ordinal < cutoff.date().toordinal() and self._is_fully_read(day_ordinal)
+            }
+        )
+        if len(days) == 0:
+            return
+        DayCache.from_cutoff(cutoff.timestamp(), cutoff_state, min(days), days, first_timestamp).save()
+
+    def reload_from(self, timestamp: float) -> None:
+        """Read the logs again from the start of the day of timestamp, the intervals of the previous days are kept"""
+        self.generation = next(History._generations)
+        day_start_timestamp = get_day_start(datetime.datetime.fromtimestamp(timestamp)).timestamp()
+        read_offset = find_offset_after(day_start_timestamp)
+        if (
+            day_start_timestamp < self._cache_cutoff
+            or day_start_timestamp <= self.dont_read_before_timestamp
+            or read_offset == 0
+        ):
+            # The previous days are not all in the store (cached, not read or archived), reload everything
+            self._reset()
+            self._load_day_cache()
+            self.add_logs(self.get_new_logs())
+            return
+        # Start from the state at the start of the day like after loading the day cache, the store is truncated there
+        self._last_read_log = Log(day_start_timestamp, read_log_before_offset(read_offset).state)
+        self._last_read_log_offset = None
+        self._read_offset = read_offset
+        self._logs_signature = None
+        self.add_logs(self.get_new_logs())
+
+    def _ensure_fully_loaded(self) -> None:
+        """Read the logs of the cached days when their intervals are needed, the following logs are not read again"""
+        if self._day_cache is None:
+            return
+        logs = [
+            log
+            for log in read_logs_between(self.dont_read_before_timestamp, self._cache_cutoff)
+            if log.timestamp > self.dont_read_before_timestamp
+        ]
+        # The intervals of the cached days end at the cutoff, where the intervals of the store start
+        store = IntervalStore()
+        store.add_logs([log.timestamp for log in logs] + [self._cache_cutoff], [log.state for log in logs])
+        if len(self._store) > 0:
+            store.add_logs(
+                self._store.starts.tolist() + [float(self._store.ends[-1])],
+                [self._store.state_names[state_code] for state_code in self._store.states.tolist()],
+            )
+        self._store = store
+        self._days_dict = {}
+        self._day_ordinals = store.get_day_ordinals().tolist()
+        self._day_cache = None
+        if len(store) > 0:
+            self._update_worked_ordinals(self._day_ordinals[0])
+
     @property
-    def days(self):
-        return list(self._days_dict.values())
+    def store(self) -> IntervalStore:
+        self._ensure_fully_loaded()
+        return self._store
+
+    def _get_day(self, day_ordinal: int) -> Day:
+        date = datetime.date.fromordinal(day_ordinal)
+        if date not in self._days_dict:
+            self._days_dict[date] = Day(date=date, store=self._store)
+        return self._days_dict[date]
+
+    @property
+    def days(self) -> DaysView:
+        self._ensure_fully_loaded()
+        return DaysView(self, 0, len(self._day_ordinals))
+
+    def get_days_between(self, start_date: datetime.date, end_date: datetime.date) -> DaysView:
+        """Days with start_date <= date < end_date"""
+        self._ensure_fully_loaded()
+        return DaysView(
+            self,
+            bisect.bisect_left(self._day_ordinals, start_date.toordinal()),
+            bisect.bisect_left(self._day_ordinals, end_date.toordinal()),
+        )
 
     @property
     def all_intervals(self):
         # TODO: Deprecate to use day abstraction instead?
-        return [interval for day in self.days for interval in day.intervals]
+        return get_intervals_from_store(self.store)
 
     @property
     def current_day(self):
-        return self.days[-1]
+        return self._get_day(self._day_ordinals[-1])
 
     def refresh(self) -> None:
         if self._last_refresh is not None and time.time() - self._last_refresh < self.refresh_rate:
             return
-        self.add_intervals(self.get_new_intervals())
+        with TIMINGS.stage("History.refresh"):
+            self.add_logs(self.get_new_logs())
         self._last_refresh = time.time()
 
-    def add_intervals(self, intervals: list[Interval]) -> None:
-        for interval in Interval.split_intervals_by_day(intervals):
-            start_date = get_day_start(interval.start_datetime).date()
-            if start_date not in self._days_dict:
-                self._days_dict[start_date] = Day(date=start_date)
-            self._days_dict[start_date].add_interval(interval)
-
-    def get_new_logs(self) -> list[Log]:
-        new_logs = []
-        # Read file in reverse to find new logs that are not loaded yet
-        for log in reverse_read_logs():
-            if log.datetime <= self.dont_read_before:
-                break
-            if self._last_read_log is not None and log <= self._last_read_log:
-                break
-            new_logs.append(log)
-        new_logs = new_logs[::-1]
+    def add_logs(self, new_logs: list[Log]) -> None:
+        last_log = copy(self._last_read_log)  # The log starting the last interval, retrieved before updating it
         if len(new_logs) > 0:
             self._last_read_log = copy(new_logs[-1])
-        return new_logs
-
-    def get_new_intervals(self) -> list[Interval]:
-        last_log = copy(self._last_read_log)  # We need to retrieve it before calling get_new_logs()
-        new_logs = self.get_new_logs()
         # Add dummy log so that we take the last interval into account
         logs = [*new_logs, Log(time.time(), "dummy")]
         if last_log is not None:
-            # FIXME: Sometimes the last log is more recent that logs[0]
-            # I.e. I hust had the result being: [Log<date=2021-08-25 18:01:05, state=dummy>, Log<date=2022-08-25 17:59:58, state=personal>, Log<date=2022-08-25 18:02:04, state=dummy>]
             logs = [last_log, *logs]  # Prepend last log to logs to count the initial interval
-        return Interval.convert_logs_to_intervals(logs)
+        first_index = self._store.add_logs([log.timestamp for log in logs], [log.state for log in logs])
+        TIMINGS.count("intervals created", len(self._store) - first_index)
+        # Drop the days whose intervals changed, they will be rebuilt on demand
+        if first_index < len(self._store):
+            first_ordinal = int(self._store.day_ordinals[first_index])
+            for date in [date for date in self._days_dict if date.toordinal() >= first_ordinal]:
+                del self._days_dict[date]
+            del self._day_ordinals[bisect.bisect_left(self._day_ordinals, first_ordinal) :]
+            self._day_ordinals.extend(np.unique(self._store.day_ordinals[first_index:]).tolist())
+            self._update_worked_ordinals(first_ordinal)
+
+    def _update_worked_ordinals(self, first_ordinal: int) -> None:
+        """Update the worked days from first_ordinal, the previous days did not change"""
+        day_worktimes = self._store.get_day_worktimes(start_index=self._store.get_day_slice(first_ordinal).start)
+        worked_ordinals = {day_ordinal for day_ordinal, worktime in day_worktimes.items() if worktime > 0}
+        last_ordinal = int(self._store.day_ordinals[-1])
+        previous_worked_ordinals = {
+            day_ordinal
+            for day_ordinal in range(first_ordinal, last_ordinal + 1)
+            if day_ordinal in self._worked_ordinals
+        }
+        if worked_ordinals != previous_worked_ordinals:
+            self._worked_ordinals -= previous_worked_ordinals
+            self._worked_ordinals |= worked_ordinals
+            self.worked_days_version += 1
+
+    def get_new_logs(self) -> list[Log]:
+        """Read the logs that were appended since the last refresh, starting from the offset of the last read log"""
+        signature = get_logs_signature()
+        if signature == self._logs_signature:
+            return []
+        if self._logs_signature is not None:
+            same_inode, grew = signature[0] == self._logs_signature[0], signature[1] >= self._logs_signature[1]
+            if not (same_inode and grew):
+                # The file was replaced or truncated, reload everything
+                self.generation = next(History._generations)
+                self._reset()
+        self._logs_signature = signature
+        new_logs = []
+        if self._read_offset is None:
+            self._read_offset = find_offset_after(self.dont_read_before_timestamp)
+            # Logs of past years are in the archives
+            new_logs = [
+                log
+                for log in read_archived_logs(self.dont_read_before_timestamp, math.inf)
+                if log.timestamp > self.dont_read_before_timestamp
+            ]
+        last_log = new_logs[-1] if len(new_logs) > 0 else self._last_read_log
+        n_read_logs = 0
+        for offset, log in read_logs_from_offset(self._read_offset):
+            n_read_logs += 1
+            if offset == self._last_read_log_offset:
+                if log != self._last_read_log:
+                    # The logs that were already read were modified, reload everything
+                    self.generation = next(History._generations)
+                    self._reset()
+                    return self.get_new_logs()
+                continue
+            if last_log is not None and log < last_log:
+                # Logs written out of order can't be added to the history
+                print(f"WARNING: Ignoring log {log} that is older than {last_log}")
+                continue
+            new_logs.append(log)
+            self._last_read_log_offset = self._read_offset = offset
+            last_log = log
+        TIMINGS.count("log lines read", n_read_logs)
+        return new_logs
+
+    @staticmethod
+    def _get_ordinal_if_day_start(timestamp: float) -> int:
+        day_start = get_day_start(datetime.datetime.fromtimestamp(timestamp))
+        if day_start.timestamp() != timestamp:
+            return None
+        return day_start.date().toordinal()
 
     def get_worktime_between(
         self,
@@ -252,15 +545,124 @@ class History(metaclass=ArgsSingleton):
         self.refresh()
         if dont_count_days is None:
             dont_count_days = []
-        # Assign the date to a variable as it might be can be called millions of times
-        start_date = get_day_start(start_datetime).date()
-        end_date = get_day_end(end_datetime).date()
-        days = [day for day in self.days if start_date <= day.date <= end_date and day.date not in dont_count_days]
-        return sum(day.get_worktime_between(start_datetime, end_datetime) for day in days)
+        dont_count_ordinals = [date.toordinal() for date in dont_count_days]
+        start_timestamp = start_datetime.timestamp()
+        end_timestamp = end_datetime.timestamp()
+        worktime = 0
+        if start_timestamp < self._cache_cutoff:
+            # Use the cached days if the range covers full days
+            cached_end_timestamp = min(end_timestamp, self._cache_cutoff)
+            start_ordinal = self._get_ordinal_if_day_start(start_timestamp)
+            end_ordinal = self._get_ordinal_if_day_start(cached_end_timestamp)
+            if start_ordinal is None or end_ordinal is None:
+                self._ensure_fully_loaded()
+            else:
+                worktime += sum(
+                    self._cached_days[day_ordinal]["worktime"]
+                    for day_ordinal in range(start_ordinal, end_ordinal)
+                    if day_ordinal in self._cached_days and day_ordinal not in dont_count_ordinals
+                )
+                start_timestamp = cached_end_timestamp
+        return worktime + self._store.get_worktime_between(
+            start_timestamp, end_timestamp, dont_count_ordinals=dont_count_ordinals
+        )
+
+    def get_past_days_version(self) -> tuple:
+        """Changes whenever the worktime of a day that is over can change.
+
+        That is when the logs are reloaded (e.g. rewritten) or when new logs are read while the last log is still in a
+        past day, because its interval extends to now.
+        """
+        self.refresh()
+        day_start_timestamp = get_day_start(datetime.datetime.fromtimestamp(time.time())).timestamp()
+        last_timestamp = self._last_read_log.timestamp if self._last_read_log is not None else -math.inf
+        return self.generation, min(last_timestamp, day_start_timestamp)
+
+    def get_worked_ordinals(self) -> set[int]:
+        """Ordinals of the days with a positive worktime (the set must not be modified)"""
+        self.refresh()
+        return self._worked_ordinals
+
+    def get_day_worktimes(self) -> dict[datetime.date, float]:
+        """Worktime of each day"""
+        self.refresh()
+        day_worktimes = {day_ordinal: aggregates["worktime"] for day_ordinal, aggregates in self._cached_days.items()}
+        day_worktimes.update(self._store.get_day_worktimes())
+        return {datetime.date.fromordinal(day_ordinal): worktime for day_ordinal, worktime in day_worktimes.items()}
+
+    def _compute_worktime_curves(self, day_ordinals: np.ndarray) -> np.ndarray:
+        if self._day_cache is None:
+            store = self._store
+            return compute_worktime_curves(
+                day_ordinals, store.starts, store.ends, store.work_mask, store.cumulative_worktimes
+            )
+        # The cached days are computed from their cached work intervals, without reading their logs
+        is_cached = day_ordinals < self._day_cache.cutoff_ordinal
+        work_intervals = np.array(
+            [
+                work_interval
+                for day_ordinal in day_ordinals[is_cached].tolist()
+                for work_interval in self._cached_days[day_ordinal]["work_intervals"]
+            ]
+        ).reshape(-1, 2)
+        store = self._store
+        curves = np.empty((len(day_ordinals), MINUTES_PER_DAY))
+        curves[is_cached] = compute_worktime_curves(
+            day_ordinals[is_cached],
+            work_intervals[:, 0],
+            work_intervals[:, 1],
+            np.ones(len(work_intervals), dtype=bool),
+        )
+        curves[~is_cached] = compute_worktime_curves(
+            day_ordinals[~is_cached], store.starts, store.ends, store.work_mask, store.cumulative_worktimes
+        )
+        return curves
+
+    def get_worktime_curves(self) -> tuple[np.ndarray, np.ndarray]:
+        """Day ordinals and the cumulative worktime of each day at the end of each minute since the start of the day,
+        as a (days x 1440) matrix.
+
+        The curves of the days that are over are computed once, only the following days are recomputed. Minutes are
+        counted from the start of the day so they are shifted by one hour after a daylight saving time change.
+        """
+        generation, final_timestamp = self.get_past_days_version()
+        if generation != self._curves_generation:
+            self._curves_generation = generation
+            self._curve_ordinals = np.empty(0, dtype=np.int64)
+            self._curves = np.empty((0, MINUTES_PER_DAY))
+            self._n_final_curves = 0
+        day_ordinals = np.array(self._day_ordinals, dtype=np.int64)
+        if self._day_cache is not None:
+            day_ordinals = np.concatenate([np.array(sorted(self._cached_days), dtype=np.int64), day_ordinals])
+        last_final_ordinal = self._curve_ordinals[self._n_final_curves - 1] if self._n_final_curves > 0 else -1
+        new_ordinals = day_ordinals[day_ordinals > last_final_ordinal]
+        new_curves = self._compute_worktime_curves(new_ordinals)
+        n_final_curves = self._n_final_curves
+        self._curve_ordinals = np.concatenate([self._curve_ordinals[:n_final_curves], new_ordinals])
+        if len(self._curves) == n_final_curves + len(new_ordinals):
+            # Same days as the last call, update them in place instead of copying the whole matrix
+            self._curves[n_final_curves:] = new_curves
+        else:
+            self._curves = np.concatenate([self._curves[:n_final_curves], new_curves])
+        if final_timestamp > -math.inf:
+            final_ordinal = get_day_start(datetime.datetime.fromtimestamp(final_timestamp)).date().toordinal()
+            self._n_final_curves = int(np.searchsorted(self._curve_ordinals, final_ordinal, side="left"))
+        return self._curve_ordinals, self._curves
+
+    def get_worktime_per_bin(self, bin_edges: np.ndarray, dont_count_days: list[datetime.date] = None) -> np.ndarray:
+        """Worktime in each bin [bin_edges[i], bin_edges[i+1]) (timestamps)."""
+        self.refresh()
+        store = self.store
+        if not dont_count_days:
+            return discretize_worktime(
+                store.starts, store.ends, store.work_mask, bin_edges, cumulative_worktimes=store.cumulative_worktimes
+            )
+        is_counted = ~np.isin(store.day_ordinals, [date.toordinal() for date in dont_count_days])
+        return discretize_worktime(store.starts, store.ends, store.work_mask & is_counted, bin_edges)
 
     def __getitem__(self, i) -> Day:
         """Get a specific day."""
-        return list(self._days_dict.values())[i]
+        return self.days[i]
 
     def __repr__(self) -> str:
-        return f"{list(self._days_dict.values())}"
+        return f"{self.days}"
@@ -0,0 +1,108 @@
+import signal
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from worktime_tracker.constants import LOGS_DIR
+
+TIMINGS_PATH = LOGS_DIR / "timings.txt"
+COUNTERS = ("log lines read", "intervals created")
+
+
+class Timings:
+    """Rolling window of the durations of each stage of the refresh cycles and of the counters of each cycle.
+
+    Only the last window samples are kept so that the memory stays bounded when the app runs for days.
+    Samples are recorded and read under a lock since the worker, the daemon and the interfaces run in different threads
+    (reentrant so that the signal handler can read them while the same thread is recording).
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._durations = defaultdict(lambda: deque(maxlen=self.window))
+            self._cycle_counts = {name: deque(maxlen=self.window) for name in COUNTERS}
+            self._current_counts = None  # Counters of the cycle in progress
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._durations[name].append(duration)
+
+    @contextmanager
+    def cycle(self):
+        """A refresh cycle of an interface, the counters are summed over the cycle"""
+        with self._lock:
+            self._current_counts = {name: 0 for name in COUNTERS}
+        try:
+            with self.stage("cycle"):
+                yield
+        finally:
+            with self._lock:
+                for name, count in self._current_counts.items():
+                    self._cycle_counts[name].append(count)
+                self._current_counts = None
+
+    def count(self, name: str, n: int) -> None:
+        with self._lock:
+            # Counts outside of cycles (e.g. in scripts) are ignored
+            if self._current_counts is not None:
+                self._current_counts[name] += n
+
+    @staticmethod
+    def _get_stats(samples) -> dict:
+        p50, p95 = np.percentile(samples, [50, 95]).tolist()
+        return {"count": len(samples), "p50": p50, "p95": p95, "max": max(samples)}
+
+    def get_summary(self) -> dict:
+        """Statistics of the durations (in seconds) of each stage and of the counters per cycle"""
+        # The statistics are computed on a copy so that recording is not blocked meanwhile
+        with self._lock:
+            durations = {name: list(samples) for name, samples in self._durations.items() if samples}
+            cycle_counts = {name: list(counts) for name, counts in self._cycle_counts.items() if counts}
+        return {
+            "stages": {name: self._get_stats(samples) for name, samples in durations.items()},
+            "counters": {name: self._get_stats(counts) for name, counts in cycle_counts.items()},
+        }
+
+    def format_summary(self) -> str:
+        summary = self.get_summary()
+        lines = [f"{'Stage':<40}{'Count':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'max (ms)':>12}"]
+        for name, stats in sorted(summary["stages"].items()):
+            lines.append(
+                f"{name:<40}{stats['count']:>8}{1000 * stats['p50']:>12.2f}{1000 * stats['p95']:>12.2f}"
+                f"{1000 * stats['max']:>12.2f}"
+            )
+        lines.append(f"\n{'Per cycle':<40}{'Cycles':>8}{'p50':>12}{'p95':>12}{'max':>12}")
+        for name, stats in summary["counters"].items():
+            lines.append(f"{name:<40}{stats['count']:>8}{stats['p50']:>12.1f}{stats['p95']:>12.1f}{stats['max']:>12}")
+        return "\n".join(lines)
+
+
+TIMINGS = Timings()
+
+
+def dump_timings() -> None:
+    print(TIMINGS.format_summary())
+
+
+def write_timings(*_) -> None:
+    """Write the timings to a file, used as a signal handler so that it does not mess with the interfaces"""
+    TIMINGS_PATH.write_text(TIMINGS.format_summary() + "\n")
+
+
+def install_dump_signal_handler() -> None:
+    """Dump the timings to TIMINGS_PATH with `kill -USR1 <pid>`"""
+    signal.signal(signal.SIGUSR1, write_timings)
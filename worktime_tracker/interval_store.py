@@ -0,0 +1,225 @@
+import datetime
+
+import numpy as np
+
+from worktime_tracker.constants import STATES, WORK_STATES
+from worktime_tracker.date_utils import get_day_end, get_day_start
+
+
+class IntervalStore:
+    """Columnar storage of day-split intervals.
+
+    Intervals are kept sorted in contiguous numpy arrays (start and end timestamps, state codes and day ordinals)
+    instead of one Python object per interval and per log. Interval and Day objects are built on demand from it.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.state_names = list(STATES)
+        self._state_codes = {state: code for code, state in enumerate(self.state_names)}
+        self._work_codes = [self._state_codes[state] for state in WORK_STATES]
+        self._starts = np.empty(capacity, dtype=np.float64)
+        self._ends = np.empty(capacity, dtype=np.float64)
+        self._states = np.empty(capacity, dtype=np.uint8)
+        self._day_ordinals = np.empty(capacity, dtype=np.int32)
+        # Prefix sums of worktime: _cumulative_worktimes[i] is the total worktime of the first i intervals
+        self._cumulative_worktimes = np.zeros(capacity + 1, dtype=np.float64)
+        self._size = 0
+        # Boundaries of the day currently being filled, so that we don't compute day boundaries for every interval
+        self._day_bounds = (np.inf, -np.inf, None)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts[: self._size]
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends[: self._size]
+
+    @property
+    def states(self) -> np.ndarray:
+        return self._states[: self._size]
+
+    @property
+    def day_ordinals(self) -> np.ndarray:
+        return self._day_ordinals[: self._size]
+
+    @property
+    def work_mask(self) -> np.ndarray:
+        return self.get_work_mask(self.states)
+
+    @property
+    def worktimes(self) -> np.ndarray:
+        return np.where(self.work_mask, self.ends - self.starts, 0)
+
+    def get_work_mask(self, state_codes: np.ndarray) -> np.ndarray:
+        return np.isin(state_codes, self._work_codes)
+
+    def get_state_code(self, state: str) -> int:
+        if state not in self._state_codes:
+            # States that are not in STATES (e.g. custom states written when rewriting history)
+            assert len(self.state_names) < 256, "Too many states to be encoded as uint8"
+            self._state_codes[state] = len(self.state_names)
+            self.state_names.append(state)
+        return self._state_codes[state]
+
+    def _get_day_bounds(self, timestamp: float) -> tuple[float, float, int]:
+        day_start_timestamp, day_end_timestamp, day_ordinal = self._day_bounds
+        if not day_start_timestamp <= timestamp < day_end_timestamp:
+            day_start = get_day_start(datetime.datetime.fromtimestamp(timestamp))
+            day_start_timestamp = day_start.timestamp()
+            day_end_timestamp = get_day_end(day_start).timestamp()
+            day_ordinal = day_start.date().toordinal()
+            self._day_bounds = (day_start_timestamp, day_end_timestamp, day_ordinal)
+        return day_start_timestamp, day_end_timestamp, day_ordinal
+
+    @property
+    def cumulative_worktimes(self) -> np.ndarray:
+        return self._cumulative_worktimes[: self._size + 1]
+
+    def _grow(self, min_capacity: int) -> None:
+        capacity = max(min_capacity, 2 * len(self._starts))
+        array_names = ["_starts", "_ends", "_states", "_day_ordinals", "_cumulative_worktimes"]
+        for name in array_names:
+            # The prefix sums array has one more element than the others
+            extra = 1 if name == "_cumulative_worktimes" else 0
+            old_array = getattr(self, name)
+            new_array = np.empty(capacity + extra, dtype=old_array.dtype)
+            new_array[: self._size + extra] = old_array[: self._size + extra]
+            setattr(self, name, new_array)
+
+    def _append(self, start: float, end: float, state_code: int, day_ordinal: int) -> None:
+        if self._size == len(self._starts):
+            self._grow(self._size + 1)
+        if self._size > 0:
+            assert self._ends[self._size - 1] <= start, f"Overlapping intervals: {self._ends[self._size - 1]} > {start}"
+        self._starts[self._size] = start
+        self._ends[self._size] = end
+        self._states[self._size] = state_code
+        self._day_ordinals[self._size] = day_ordinal
+        worktime = end - start if state_code in self._work_codes else 0
+        self._cumulative_worktimes[self._size + 1] = self._cumulative_worktimes[self._size] + worktime
+        self._size += 1
+
+    def truncate(self, timestamp: float) -> int:
+        """Remove all intervals starting at or after timestamp. Returns the index of the first removed interval.
+
+        The prefix sums of the remaining intervals are still valid so the index does not need to be rebuilt.
+        """
+        self._size = int(np.searchsorted(self.starts, timestamp, side="left"))
+        return self._size
+
+    def add_logs(self, timestamps: list[float], states: list[str]) -> int:
+        """Add the intervals between consecutive logs, each interval taking the state of its starting log.
+
+        Intervals that start at or after the first log are replaced: they come from a previous dummy "now" log that was
+        added programmatically to take the last interval into account.
+        Returns the index of the first added interval.
+        """
+        if len(timestamps) < 2:
+            return self._size
+        first_index = self.truncate(timestamps[0])
+        for start, end, state in zip(timestamps, timestamps[1:], states):
+            assert start <= end, f"{start=}, {end=}"
+            assert end - start <= 365 * 24 * 60 * 60, f"Intervals cannot be longer than 1 year: {start=}, {end=}"
+            state_code = self.get_state_code(state)
+            # Split intervals that span multiple days into one interval per day
+            while True:
+                _, day_end_timestamp, day_ordinal = self._get_day_bounds(start)
+                if end < day_end_timestamp:
+                    self._append(start, end, state_code, day_ordinal)
+                    break
+                self._append(start, day_end_timestamp, state_code, day_ordinal)
+                start = day_end_timestamp
+        return first_index
+
+    def get_day_ordinals(self) -> np.ndarray:
+        """Sorted unique day ordinals that have at least one interval."""
+        return np.unique(self.day_ordinals)
+
+    def get_day_slice(self, day_ordinal: int) -> slice:
+        day_ordinals = self.day_ordinals
+        return slice(
+            int(np.searchsorted(day_ordinals, day_ordinal, side="left")),
+            int(np.searchsorted(day_ordinals, day_ordinal, side="right")),
+        )
+
+    def get_day_worktime(self, day_ordinal: int) -> float:
+        day_slice = self.get_day_slice(day_ordinal)
+        return float(self._cumulative_worktimes[day_slice.stop] - self._cumulative_worktimes[day_slice.start])
+
+    def get_day_worktimes(self, start_index: int = 0) -> dict[int, float]:
+        """Worktime of each day ordinal, only the intervals from start_index (which must start a day) are considered"""
+        day_ordinals, first_indices, counts = np.unique(
+            self.day_ordinals[start_index:], return_index=True, return_counts=True
+        )
+        first_indices += start_index
+        worktimes = self._cumulative_worktimes[first_indices + counts] - self._cumulative_worktimes[first_indices]
+        return dict(zip(day_ordinals.tolist(), worktimes.tolist()))
+
+    def _is_work(self, index: int) -> bool:
+        return int(self._states[index]) in self._work_codes
+
+    def get_worktime_between(
+        self, start_timestamp: float, end_timestamp: float, dont_count_ordinals: list[int] = None, index_slice=None
+    ) -> float:
+        """Worktime in [start_timestamp, end_timestamp), optionally restricted to a slice of intervals.
+
+        Uses two binary searches on the interval boundaries and the worktime prefix sums, only the intervals that are
+        partially inside the range need to be corrected.
+        """
+        # Intervals [lo, hi) are the ones that overlap the range
+        lo = int(np.searchsorted(self.ends, start_timestamp, side="right"))
+        hi = int(np.searchsorted(self.starts, end_timestamp, side="left"))
+        if index_slice is not None:
+            lo = max(lo, index_slice.start)
+            hi = min(hi, index_slice.stop)
+        if hi <= lo:
+            return 0
+        worktime = self._cumulative_worktimes[hi] - self._cumulative_worktimes[lo]
+        if self._starts[lo] < start_timestamp and self._is_work(lo):
+            worktime -= start_timestamp - self._starts[lo]
+        if end_timestamp < self._ends[hi - 1] and self._is_work(hi - 1):
+            worktime -= self._ends[hi - 1] - end_timestamp
+        for day_ordinal in dont_count_ordinals or []:
+            day_slice = self.get_day_slice(day_ordinal)
+            if day_slice.start < hi and lo < day_slice.stop:
+                worktime -= self.get_worktime_between(start_timestamp, end_timestamp, index_slice=day_slice)
+        return float(worktime)
+
+    def get_state_at(self, timestamp: float) -> str:
+        """State of the interval containing timestamp"""
+        index = int(np.searchsorted(self.starts, timestamp, side="right")) - 1
+        if index < 0 or self._ends[index] < timestamp:
+            return None
+        return self.state_names[self._states[index]]
+
+    def get_day_aggregates(self) -> dict[int, dict]:
+        """Worktime, total duration of each state, number of intervals and work intervals (start and end timestamps, to
+        compute the worktime curves) for each day ordinal"""
+        day_ordinals, counts = np.unique(self.day_ordinals, return_counts=True)
+        day_indices = np.repeat(np.arange(len(day_ordinals)), counts)
+        state_durations = np.zeros((len(day_ordinals), len(self.state_names)))
+        np.add.at(state_durations, (day_indices, self.states), self.ends - self.starts)
+        worktimes = state_durations[:, self._work_codes].sum(axis=1)
+        work_mask = self.work_mask
+        work_intervals = {day_ordinal: [] for day_ordinal in day_ordinals.tolist()}
+        for day_ordinal, start, end in zip(
+            self.day_ordinals[work_mask].tolist(), self.starts[work_mask].tolist(), self.ends[work_mask].tolist()
+        ):
+            work_intervals[day_ordinal].append([start, end])
+        return {
+            day_ordinal: {
+                "worktime": worktime,
+                "state_durations": {
+                    state: duration for state, duration in zip(self.state_names, durations) if duration
+                },
+                "n_intervals": count,
+                "work_intervals": work_intervals[day_ordinal],
+            }
+            for day_ordinal, worktime, durations, count in zip(
+                day_ordinals.tolist(), worktimes.tolist(), state_durations.tolist(), counts.tolist()
+            )
+        }
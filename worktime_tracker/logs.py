@@ -1,22 +1,56 @@
 import fcntl
+import math
+import os
 import time
-import shutil
 import datetime
+from contextlib import contextmanager
+from pathlib import Path
 
-from worktime_tracker.constants import STATES_TYPE, LOGS_PATH, LAST_CHECK_PATH
-from worktime_tracker.utils import reverse_read_lines
+import numpy as np
+
+from worktime_tracker import backups, binary_logs, sqlite_logs
+from worktime_tracker.config import Config
+from worktime_tracker.constants import STATES, STATES_TYPE, LOGS_PATH, LAST_CHECK_PATH
+from worktime_tracker.utils import reverse_read_lines, yield_lines_without_comments
 from worktime_tracker.date_utils import coerce_to_timestamp
 
+# Number of binary records converted at once when reading the logs forward
+READ_CHUNK_SIZE = 4096
+
 
 class Log:
     """Represents a log entry at a single point of time, basically containing a timestamp and a state.
     It is supposed to match the format of the logs file.
+    The datetime is only computed when needed, most logs are only compared using their timestamps.
     """
 
+    __slots__ = ("timestamp", "state", "_datetime")
+
     def __init__(self, timestamp: float, state: STATES_TYPE) -> None:
         self.timestamp = coerce_to_timestamp(timestamp)
-        self.datetime = datetime.datetime.fromtimestamp(self.timestamp)
         self.state = state
+        self._datetime = None
+
+    @classmethod
+    def from_parsed(cls, timestamp: float, state: STATES_TYPE) -> "Log":
+        """Create a log from a timestamp that is already a float, without coercion"""
+        log = cls.__new__(cls)
+        log.timestamp = timestamp
+        log.state = state
+        log._datetime = None
+        return log
+
+    @classmethod
+    def from_parsed_logs(cls, timestamps, states) -> list["Log"]:
+        """Bulk constructor from parsed timestamps (floats) and states"""
+        from_parsed = cls.from_parsed
+        return [from_parsed(timestamp, state) for timestamp, state in zip(timestamps, states)]
+
+    @property
+    def datetime(self):
+        if self._datetime is None:
+            self._datetime = datetime.datetime.fromtimestamp(self.timestamp)
+        return self._datetime
 
     def __repr__(self) -> str:
         date_str = self.datetime.strftime("%Y-%m-%d %H:%M:%S")
@@ -51,41 +85,387 @@ def read_last_check_timestamp() -> float:
         return float(f.readline().strip())
 
 
+def is_binary_backend() -> bool:
+    return Config().logs_backend == "binary"
+
+
+def is_sqlite_backend() -> bool:
+    return Config().logs_backend == "sqlite"
+
+
+def get_binary_logs_path():
+    return LOGS_PATH.with_suffix(".bin")
+
+
+def get_sqlite_logs_path():
+    return LOGS_PATH.with_suffix(".sqlite")
+
+
+def get_active_logs_path():
+    """Path of the file the logs are read from and written to, depending on the configured backend"""
+    if is_sqlite_backend():
+        return get_sqlite_logs_path()
+    return get_binary_logs_path() if is_binary_backend() else LOGS_PATH
+
+
+def get_day_cache_path():
+    return LOGS_PATH.parent / "day_cache.json"
+
+
+def format_log(log: Log) -> bytes:
+    if is_binary_backend():
+        return binary_logs.encode_log(log.timestamp, log.state)
+    return f"{log.timestamp}\t{log.state}\n".encode("utf8")
+
+
 def write_log(log: Log) -> None:
-    with LOGS_PATH.open("a") as f:
-        f.write(f"{log.timestamp}\t{log.state}\n")
+    if is_sqlite_backend():
+        sqlite_logs.insert_log(get_sqlite_logs_path(), log.timestamp, log.state)
+        return
+    with get_active_logs_path().open("ab") as f:
+        append_log(f, log)
 
 
-def maybe_write_log(log: Log):
-    with open(LOGS_PATH, "a") as f:
+def append_log(f, log: Log) -> None:
+    """Append a log to an opened logs file and let the tail reader know about it so that it does not re-read it"""
+    log_bytes = format_log(log)
+    if is_binary_backend():
+        binary_logs.drop_truncated_record(f)
+    f.write(log_bytes)
+    f.flush()
+    TAIL_READER.update_after_append(f, log, log_bytes)
+
+
+@contextmanager
+def locked_logs_file(mode: str = "ab"):
+    """Open the logs file with an exclusive lock.
+
+    The logs file is replaced when history is rewritten, so it is reopened if it was replaced while waiting for the lock
+    (the lock would be on the old file).
+    """
+    logs_path = get_active_logs_path()
+    while True:
+        f = open(logs_path, mode)
         fcntl.flock(f, fcntl.LOCK_EX)
-        try:
-            last_log = read_last_log()
-            if last_log is not None and last_log.state == log.state:
-                return
-            f.write(f"{log.timestamp}\t{log.state}\n")
-        finally:
-            fcntl.flock(f, fcntl.LOCK_UN)
+        if os.fstat(f.fileno()).st_ino == os.stat(logs_path).st_ino:
+            break
+        f.close()
+    try:
+        yield f
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def maybe_write_log(log: Log):
+    if is_sqlite_backend():
+        create_logs_file_if_missing()
+        sqlite_logs.maybe_insert_log(get_sqlite_logs_path(), log.timestamp, log.state)
+        return
+    with locked_logs_file() as f:
+        last_log = read_last_log()
+        if last_log is not None and last_log.state == log.state:
+            return
+        append_log(f, log)
+
+
+def replace_logs_file(write) -> None:
+    """Write the logs to a temporary file with write(f) and atomically replace the logs file with it, so that a crash
+    can't leave a truncated logs file"""
+    logs_path = get_active_logs_path()
+    temp_path = logs_path.with_name(logs_path.name + ".tmp")
+    with open(temp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    if logs_path.exists():
+        os.chmod(temp_path, os.stat(logs_path).st_mode)
+    os.replace(temp_path, logs_path)
+    TAIL_READER.clear()
+
+
+def write_logs(logs: list[tuple[float, STATES_TYPE]]) -> None:
+    """Overwrite all the logs"""
+    if is_sqlite_backend():
+        sqlite_logs.write_rows(get_sqlite_logs_path(), logs)
+        return
+
+    def write(f):
+        if is_binary_backend():
+            f.write(binary_logs.encode_logs(logs))
+            return
+        for timestamp, state in logs:
+            f.write(f"{timestamp}\t{state}\n".encode("utf8"))
+
+    replace_logs_file(write)
 
 
 def parse_log_line(log_line: str) -> Log:
     timestamp, state = log_line.strip().split("\t")
-    return Log(timestamp=float(timestamp), state=state)
+    return Log.from_parsed(float(timestamp), state)
 
 
-def reverse_read_logs() -> list[Log]:
-    if not LOGS_PATH.exists():
-        LOGS_PATH.parent.mkdir(exist_ok=True)
+def create_logs_file_if_missing() -> None:
+    logs_path = get_active_logs_path()
+    if not logs_path.exists():
+        logs_path.parent.mkdir(exist_ok=True)
         write_log(Log(timestamp=0, state="locked"))
-    for line in reverse_read_lines(LOGS_PATH):
+
+
+def reverse_read_logs() -> list[Log]:
+    create_logs_file_if_missing()
+    logs_path = get_active_logs_path()
+    if is_binary_backend():
+        for timestamp, state in binary_logs.reverse_read_records(logs_path):
+            yield Log.from_parsed(timestamp, state)
+        return
+    if is_sqlite_backend():
+        for timestamp, state in sqlite_logs.reverse_read_rows(logs_path):
+            yield Log.from_parsed(timestamp, state)
+        return
+    for line in reverse_read_lines(logs_path):
         yield parse_log_line(line)
 
 
+class TailReader:
+    """Reads the last log of the logs file and remembers the byte offset where it starts.
+
+    The file is only re-scanned when it was changed by someone else, which is detected using its (inode, size, mtime).
+    Logs appended by another process are read forward from the remembered offset.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._path = None
+        self._signature = None
+        self._offset = None
+        self._log_bytes = None
+        self._log = None
+
+    @staticmethod
+    def get_signature(stat_result: os.stat_result) -> tuple[int, int, int]:
+        return (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+    def _set(self, path, signature, offset: int, log_bytes: bytes, log: Log) -> None:
+        self._path = path
+        self._signature = signature
+        self._offset = offset
+        self._log_bytes = log_bytes
+        self._log = log
+
+    def update_after_append(self, f, log: Log, log_bytes: bytes) -> None:
+        signature = self.get_signature(os.fstat(f.fileno()))
+        self._set(Path(f.name), signature, signature[1] - len(log_bytes), log_bytes, log)
+
+    def _parse(self, log_bytes: bytes) -> Log:
+        if is_binary_backend():
+            return Log(*binary_logs.decode_record(log_bytes))
+        return parse_log_line(log_bytes.decode("utf8"))
+
+    def _read_last_record(self, f, start_offset: int, file_size: int) -> tuple[int, bytes]:
+        """Find the last record starting at or after start_offset, returns its offset and its bytes"""
+        if is_binary_backend():
+            if file_size < binary_logs.RECORD_SIZE:
+                return 0, b""
+            offset = (file_size // binary_logs.RECORD_SIZE - 1) * binary_logs.RECORD_SIZE
+            f.seek(offset)
+            return offset, f.read(binary_logs.RECORD_SIZE)
+        f.seek(start_offset)
+        data = f.read(file_size - start_offset)
+        end = len(data.rstrip(b"\n"))
+        line_start = data.rfind(b"\n", 0, end) + 1
+        return start_offset + line_start, data[line_start:]
+
+    def _scan(self, path, signature) -> Log:
+        file_size = signature[1]
+        with open(path, "rb") as f:
+            # Read bigger and bigger chunks from the end until we find a full line
+            chunk_size = 4096
+            while True:
+                start_offset = max(file_size - chunk_size, 0)
+                offset, log_bytes = self._read_last_record(f, start_offset, file_size)
+                if offset > start_offset or start_offset == 0:
+                    break
+                chunk_size *= 2
+        if log_bytes.strip(b"\n") == b"":
+            self.clear()
+            return None
+        self._set(path, signature, offset, log_bytes, self._parse(log_bytes))
+        return self._log
+
+    def _read_appended(self, path, signature) -> Log:
+        """The file only grew: check that our last log is still there and read forward from it"""
+        with open(path, "rb") as f:
+            f.seek(self._offset)
+            if f.read(len(self._log_bytes)) != self._log_bytes:
+                return None
+            offset, log_bytes = self._read_last_record(f, self._offset, signature[1])
+        self._set(path, signature, offset, log_bytes, self._parse(log_bytes))
+        return self._log
+
+    def read_last_log(self, path) -> Log:
+        signature = self.get_signature(os.stat(path))
+        if path != self._path or self._signature is None:
+            return self._scan(path, signature)
+        if signature == self._signature:
+            return self._log
+        same_inode, grew = signature[0] == self._signature[0], signature[1] >= self._signature[1]
+        if same_inode and grew:
+            last_log = self._read_appended(path, signature)
+            if last_log is not None:
+                return last_log
+        return self._scan(path, signature)
+
+
+TAIL_READER = TailReader()
+
+
 def read_last_log() -> Log:
-    try:
-        return next(reverse_read_logs())
-    except StopIteration:
+    logs_path = get_active_logs_path()
+    if not logs_path.exists():
+        try:
+            return next(reverse_read_logs())  # Creates the logs file
+        except StopIteration:
+            return None
+    if is_sqlite_backend():
+        # The index gives the last log directly
+        row = sqlite_logs.read_last_row(logs_path)
+        return None if row is None else Log(*row)
+    return TAIL_READER.read_last_log(logs_path)
+
+
+def get_logs_signature() -> tuple:
+    """(inode, size, mtime) of the logs file ((generation, end position) with the sqlite backend), used to check whether
+    it changed without reading it.
+
+    The first element changes when the logs are rewritten and the second one grows when logs are appended.
+    """
+    create_logs_file_if_missing()
+    if is_sqlite_backend():
+        return sqlite_logs.get_signature(get_sqlite_logs_path())
+    return TailReader.get_signature(os.stat(get_active_logs_path()))
+
+
+def _get_line_at_or_after(f, offset: int) -> tuple[int, bytes]:
+    """Start offset and content of the first line starting at or after offset"""
+    if offset > 0:
+        f.seek(offset - 1)
+        f.readline()  # Move to the start of the next line
+    else:
+        f.seek(0)
+    return f.tell(), f.readline()
+
+
+def _get_log_line_at_or_after(f, offset: int) -> tuple[int, bytes]:
+    """Same as _get_line_at_or_after but blank lines are skipped"""
+    line_start, line = _get_line_at_or_after(f, offset)
+    while line.strip() == b"" and line.endswith(b"\n"):
+        line_start, line = f.tell(), f.readline()
+    return line_start, line
+
+
+def find_offset_after(timestamp: float) -> int:
+    """Byte offset (position with the sqlite backend) of the first log strictly after timestamp, found by binary search.
+
+    Logs are assumed to be sorted by timestamp, which holds since they are appended in chronological order and rewrites
+    keep the order. Otherwise the offset is the one of a log after timestamp following a log at or before timestamp,
+    not necessarily the first one.
+    """
+    create_logs_file_if_missing()
+    logs_path = get_active_logs_path()
+    if is_binary_backend():
+        records = binary_logs.read_records(logs_path)
+        return int(np.searchsorted(records["timestamp"], timestamp, side="right")) * binary_logs.RECORD_SIZE
+    if is_sqlite_backend():
+        return sqlite_logs.find_position_after(logs_path, timestamp)
+    with open(logs_path, "rb") as f:
+        file_size = f.seek(0, os.SEEK_END)
+        lo, hi = 0, file_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line_start, line = _get_log_line_at_or_after(f, mid)
+            if not line.endswith(b"\n") or parse_log_line(line.decode("utf8")).timestamp > timestamp:
+                hi = mid
+            else:
+                lo = mid + 1
+        return _get_log_line_at_or_after(f, lo)[0]
+
+
+def read_logs_from_offset(offset: int):
+    """Read logs forward starting at a byte offset, yields the offset of each log with the log.
+
+    Incomplete logs at the end of the file (being written) are not returned.
+    """
+    create_logs_file_if_missing()
+    logs_path = get_active_logs_path()
+    if is_binary_backend():
+        records = binary_logs.read_records(logs_path)
+        # Records are converted by chunks so that reading only the first logs doesn't convert the whole file
+        for chunk_start in range(offset // binary_logs.RECORD_SIZE, len(records), READ_CHUNK_SIZE):
+            chunk = records[chunk_start : chunk_start + READ_CHUNK_SIZE].tolist()
+            for index, (timestamp, state_code) in enumerate(chunk, chunk_start):
+                yield index * binary_logs.RECORD_SIZE, Log.from_parsed(timestamp, binary_logs.decode_state(state_code))
+        return
+    if is_sqlite_backend():
+        for position, row in sqlite_logs.read_rows_from(logs_path, offset):
+            yield position, Log.from_parsed(*row)
+        return
+    with open(logs_path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip() != b"":
+                yield offset, parse_log_line(line.decode("utf8"))
+            offset += len(line)
+
+
+def read_log_before_offset(offset: int) -> Log:
+    """Read the log that ends right before a byte offset (i.e. the last log of the file prefix)"""
+    if offset <= 0:
         return None
+    logs_path = get_active_logs_path()
+    if is_binary_backend():
+        return Log(*binary_logs.read_record(logs_path, offset // binary_logs.RECORD_SIZE - 1))
+    if is_sqlite_backend():
+        return Log(*sqlite_logs.read_row_before(logs_path, offset))
+    with open(logs_path, "rb") as f:
+        chunk_size = 4096
+        while True:
+            start = max(offset - chunk_size, 0)
+            f.seek(start)
+            lines = f.read(offset - start).rstrip(b"\n").split(b"\n")
+            if len(lines) > 1 or start == 0:
+                return parse_log_line(lines[-1].decode("utf8"))
+            chunk_size *= 2
+
+
+def read_logs_between(start_timestamp: float, end_timestamp: float) -> list[Log]:
+    """Logs with start_timestamp <= timestamp < end_timestamp in chronological order, including archived logs"""
+    from worktime_tracker.segments import read_archived_logs  # Circular import
+
+    return read_archived_logs(start_timestamp, end_timestamp) + read_active_logs_between(start_timestamp, end_timestamp)
+
+
+def read_active_logs_between(start_timestamp: float, end_timestamp: float) -> list[Log]:
+    """Logs of the active logs file with start_timestamp <= timestamp < end_timestamp in chronological order"""
+    if is_binary_backend() and get_binary_logs_path().exists():
+        # Binary search in the memory-mapped file
+        records = binary_logs.read_records_between(get_binary_logs_path(), start_timestamp, end_timestamp)
+        return [Log.from_parsed(timestamp, state) for timestamp, state in records]
+    if is_sqlite_backend() and get_sqlite_logs_path().exists():
+        # Range query on the timestamp index
+        rows = sqlite_logs.read_rows_between(get_sqlite_logs_path(), start_timestamp, end_timestamp)
+        return [Log.from_parsed(timestamp, state) for timestamp, state in rows]
+    logs = []
+    for log in reverse_read_logs():
+        if log.timestamp < start_timestamp:
+            break
+        if log.timestamp < end_timestamp:
+            logs.append(log)
+    return logs[::-1]
 
 
 def get_rewritten_history_logs(
@@ -119,28 +499,181 @@ def get_rewritten_history_logs(
     return logs_before + [(start_timestamp, new_state)] + logs_after
 
 
+def validate_history_edits(
+    edits: list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]], first_timestamp: float = -math.inf
+) -> list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]]:
+    """Check that the edits (start_datetime, end_datetime, new_state) can be applied together and sort them.
+
+    Raises a ValueError for empty, reversed, future or overlapping edits, for edits starting before the first log (at
+    first_timestamp, there is no state to restore after them) and for states that can't be written (only the states of
+    STATES with the binary backend).
+    """
+    if len(edits) == 0:
+        raise ValueError("No edits to apply")
+    edits = sorted(edits, key=lambda edit: edit[0])
+    for start_datetime, end_datetime, new_state in edits:
+        if start_datetime >= end_datetime:
+            raise ValueError(f"Edit ends before it starts: {start_datetime} >= {end_datetime}")
+        if end_datetime.timestamp() >= time.time():
+            raise ValueError(f"Rewriting the future not allowed: {end_datetime}")
+        if not isinstance(new_state, str) or new_state == "" or "\t" in new_state or "\n" in new_state:
+            raise ValueError(f"Invalid state: {new_state!r}")
+        if is_binary_backend() and new_state not in binary_logs.STATE_CODES:
+            raise ValueError(f"State {new_state!r} can't be stored in binary logs, known states are {STATES}")
+    for (_, previous_end_datetime, _), (start_datetime, _, _) in zip(edits, edits[1:]):
+        if start_datetime < previous_end_datetime:
+            raise ValueError(f"Overlapping edits: {start_datetime} < {previous_end_datetime}")
+    if edits[0][0].timestamp() < first_timestamp:
+        raise ValueError(f"Rewriting before the first log not allowed: {edits[0][0]}")
+    return edits
+
+
+def get_batch_rewritten_history_logs(
+    logs: list[Log], edits: list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]]
+) -> list[tuple[float, STATES_TYPE]]:
+    """Same as applying get_rewritten_history_logs for each edit in chronological order, in a single pass.
+
+    Each edit only depends on the last log before its range and the logs until the first log after it, so it is applied
+    to this window only. The edits must be validated with validate_history_edits.
+    """
+    logs = [(log.timestamp, log.state) for log in logs]
+    new_logs = []
+    index = 0
+    for start_datetime, end_datetime, new_state in edits:
+        while index < len(logs) and logs[index][0] <= start_datetime.timestamp():
+            new_logs.append(logs[index])
+            index += 1
+        end_index = index
+        while end_index < len(logs) and logs[end_index][0] <= end_datetime.timestamp():
+            end_index += 1
+        # The last new log is the last log before the range, the first log after the range is not modified
+        window = [Log.from_parsed(*log) for log in new_logs[-1:] + logs[index : end_index + 1]]
+        rewritten_logs = get_rewritten_history_logs(window, start_datetime, end_datetime, new_state)
+        new_logs = new_logs[:-1] + rewritten_logs[:-1]
+        index = end_index
+    return new_logs + logs[index:]
+
+
+def _copy_bytes(source, destination, start: int, end: int = math.inf) -> None:
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(remaining, 1 << 20))
+        if not chunk:
+            break
+        destination.write(chunk)
+        remaining -= len(chunk)
+
+
+def rewrite_active_logs(
+    edits: list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]], log_before: Log = None
+) -> None:
+    """Apply validated edits to the active logs file (TSV or binary), only the logs inside the edited range are parsed.
+
+    The byte range of the edited logs is found by binary search, the untouched prefix and suffix are copied as is.
+    log_before is the last log at or before the start of the first edit, only needed when it is not in the active logs
+    file (e.g. archived). Must be called with the lock of the logs file.
+    """
+    start_datetime, end_datetime = edits[0][0], edits[-1][1]
+    start_offset = find_offset_after(start_datetime.timestamp())
+    end_offset = find_offset_after(end_datetime.timestamp())
+    if start_offset > 0:
+        log_before = read_log_before_offset(start_offset)
+    logs_inside = []
+    logs_after = []  # The first log after the range, it is not modified
+    for offset, log in read_logs_from_offset(start_offset):
+        if offset >= end_offset:
+            logs_after = [log]
+            break
+        logs_inside.append(log)
+    dummy_log = Log(time.time(), "locked")  # So that we take the last interval into account
+    new_logs = get_batch_rewritten_history_logs([log_before, *logs_inside, *logs_after, dummy_log], edits)
+    # The log before the range is not modified either
+    assert new_logs[0] == (log_before.timestamp, log_before.state)
+
+    replacement = b"".join(
+        format_log(Log(timestamp, state)) for timestamp, state in new_logs[1 : len(new_logs) - 1 - len(logs_after)]
+    )
+    # The dummy log is written at the end like the other new logs
+    appended = format_log(dummy_log)
+
+    def write(f):
+        with open(get_active_logs_path(), "rb") as source:
+            _copy_bytes(source, f, 0, start_offset)
+            f.write(replacement)
+            _copy_bytes(source, f, end_offset)
+        f.write(appended)
+
+    # Only the replaced byte range and the logs appended since the previous rewrite are backed up
+    with backups.backup_rewrite(get_active_logs_path(), start_offset, end_offset, replacement, appended):
+        replace_logs_file(write)
+
+
 def get_all_logs():
-    return [log for log in reverse_read_logs()][::-1]
+    from worktime_tracker.segments import read_archived_logs  # Circular import
+
+    return read_archived_logs(-math.inf, math.inf) + [log for log in reverse_read_logs()][::-1]
+
+
+def _rewrite_sqlite_history(edits: list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]]) -> None:
+    """Only the logs around the edited range are replaced, using the timestamp index. The backup is a TSV dump of the
+    logs (a delta most of the time, see backups.py)"""
+    logs_path = get_sqlite_logs_path()
+    start_timestamp, end_timestamp = edits[0][0].timestamp(), edits[-1][1].timestamp()
+    dummy_log = Log(time.time(), "locked")  # So that we take the last interval into account
+    appended_rows = [(dummy_log.timestamp, dummy_log.state)]
+
+    def rewrite(rows):
+        logs = [Log(timestamp, state) for timestamp, state in rows]
+        # The dummy log is written at the end like the other new logs
+        new_rows = get_batch_rewritten_history_logs([*logs, dummy_log], edits)[:-1]
+        # Backed up in the transaction of the rewrite so that the backup is the version that is rewritten
+        dump, start_offset, end_offset = sqlite_logs.dump_rows_around(logs_path, start_timestamp, end_timestamp)
+        generation = sqlite_logs.get_signature(logs_path)[0]
+        replacement, appended = sqlite_logs.format_rows(new_rows), sqlite_logs.format_rows(appended_rows)
+        backups.backup_dump_rewrite(logs_path, dump, generation, start_offset, end_offset, replacement, appended)
+        return new_rows
+
+    sqlite_logs.rewrite_rows_around(logs_path, start_timestamp, end_timestamp, rewrite, appended_rows=appended_rows)
+    backups.prune_backups(logs_path)
+
+
+def rewrite_history_batch(edits: list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]]) -> None:
+    """Apply several edits (start_datetime, end_datetime, new_state) at once, with a single backup, write and cache
+    invalidation"""
+    from worktime_tracker.day_cache import invalidate_day_cache  # Circular import
+    from worktime_tracker.history import History  # Circular import
+    from worktime_tracker.segments import read_first_timestamp, rewrite_segments  # Circular import
+
+    edits = validate_history_edits(edits, first_timestamp=read_first_timestamp())
+    start_datetime, end_datetime = edits[0][0], edits[-1][1]
+    if is_sqlite_backend():
+        _rewrite_sqlite_history(edits)
+        invalidate_day_cache(start_datetime, end_datetime)
+    else:
+        with locked_logs_file("r"):
+            rewrite_segments(edits)
+            TAIL_READER.clear()
+            invalidate_day_cache(start_datetime, end_datetime)
+    # Only the days from the start of the rewritten range are read again
+    History.reload_all_from(start_datetime.timestamp())
 
 
 def rewrite_history(start_datetime: datetime.datetime, end_datetime: datetime.datetime, new_state: STATES_TYPE) -> None:
-    from worktime_tracker.history import History  # Circular import
+    rewrite_history_batch([(start_datetime, end_datetime, new_state)])
+
 
-    with open(LOGS_PATH, "r") as lock_file:
-        fcntl.flock(lock_file, fcntl.LOCK_EX)
+def read_history_edits(path: Path) -> list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]]:
+    """Read edits from a file with one "start<TAB>end<TAB>new_state" edit per line (e.g. "2022-03-19 12:00<TAB>
+    2022-03-19 13:30<TAB>personal"), datetimes are in ISO format and comments start with #"""
+    edits = []
+    for line in yield_lines_without_comments(path):
         try:
-            backup_dir = LOGS_PATH.parent / "backup"
-            backup_dir.mkdir(exist_ok=True)
-            shutil.copy(LOGS_PATH, backup_dir / f"{LOGS_PATH.name}.bck{int(time.time())}")
-            logs = get_all_logs()
-            logs += [Log(time.time(), "locked")]  # So that we take the last interval into account
-            new_logs = get_rewritten_history_logs(logs, start_datetime, end_datetime, new_state)
-            with LOGS_PATH.open("w") as f:
-                for timestamp, state in new_logs:
-                    f.write(f"{timestamp}\t{state}\n")
-        finally:
-            fcntl.flock(lock_file, fcntl.LOCK_UN)
-    History.clear()
+            start, end, new_state = line.split("\t")
+            edits.append((datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end), new_state))
+        except ValueError as e:
+            raise ValueError(f"Invalid edit {line!r} in {path}") from e
+    return edits
 
 
 def remove_identical_consecutive_states(logs):
@@ -1,4 +1,5 @@
 import ctypes
+from functools import lru_cache
 
 import Quartz
 import objc
@@ -17,8 +18,12 @@ def _get_cgs_lib():
 _lib = _get_cgs_lib()
 
 
-def _get_builtin_display_uuids():
-    """Return the set of Display Identifier UUIDs that are built-in screens."""
+@lru_cache(maxsize=1)
+def _get_builtin_display_uuids(display_uuids: frozenset):
+    """Return the set of Display Identifier UUIDs that are built-in screens.
+
+    Only queried again when the connected displays (display_uuids) change.
+    """
     from CoreFoundation import CFUUIDCreateString
 
     builtin_uuids = set()
@@ -47,7 +52,7 @@ def get_current_space_index():
         display = displays[0]
     else:
         # Multiple displays: pick the external one (non-built-in)
-        builtin_uuids = _get_builtin_display_uuids()
+        builtin_uuids = _get_builtin_display_uuids(frozenset(str(d["Display Identifier"]) for d in displays))
         display = None
         for d in displays:
             if d["Display Identifier"] not in builtin_uuids:
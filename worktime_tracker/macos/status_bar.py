@@ -4,9 +4,11 @@ from functools import wraps
 import rumps
 from worktime_tracker.config import Config
 
-from worktime_tracker.constants import REFRESH_RATE
-from worktime_tracker.worktime_tracker import WorktimeTracker, get_work_ratio_since_timestamp
-from worktime_tracker.tools import get_ghost_plot, rewrite_history_prompt, plot_productivity, pause
+from worktime_tracker.instrumentation import TIMINGS, install_dump_signal_handler
+from worktime_tracker.scheduler import MIN_PROBE_INTERVAL
+from worktime_tracker.daemon import get_worker
+from worktime_tracker.worktime_tracker import WorktimeTracker
+from worktime_tracker.tools import rewrite_history_prompt, pause
 
 
 NO_ALERT_UNTIL = time.time()
@@ -23,13 +25,17 @@ def discard_args(func):
 class StatusBarApp(rumps.App):
     def __init__(self, *args, **kwargs):
         super().__init__(name="", *args, **kwargs)
-        self.worktime_tracker = WorktimeTracker()
+        self.worker = get_worker()
+        self.worker.start()
+        self.snapshot = None
         self.no_alert_until = time.time()
-        self.refresh(None)
+        # The timer only reads the last snapshot, the computations are done by the worker thread
+        self.timer = rumps.Timer(self.refresh, MIN_PROBE_INTERVAL)
+        self.timer.start()
 
     def maybe_send_alert(self):
-        is_work_state = self.worktime_tracker.is_work_state(self.worktime_tracker.current_state)
-        work_ratio_last_period = get_work_ratio_since_timestamp(time.time() - 3600 / 2)
+        is_work_state = WorktimeTracker.is_work_state(self.snapshot.state)
+        work_ratio_last_period = self.snapshot.work_ratio_last_half_hour
         if time.time() < self.no_alert_until:
             return
         if 0.1 < work_ratio_last_period < 0.80 and not is_work_state:
@@ -39,24 +45,32 @@ class StatusBarApp(rumps.App):
             rumps.notification("Good job!", "", "")
             self.no_alert_until = time.time() + 10 * 60
 
-    @rumps.timer(REFRESH_RATE)
     def refresh(self, _):
-        try:
-            self.worktime_tracker.check_state()
-            self.title = self.worktime_tracker.get_instant_summary()
-            # Get lines to display
-            lines = self.worktime_tracker.get_week_summaries()
-            # Update menu with new times
+        if self.worker.error is not None:
+            self.title = "ERROR"
+            print(self.worker.error)
+            self.timer.stop()
+            return
+        if self.worker.snapshot is None or self.worker.snapshot is self.snapshot:
+            return
+        self.snapshot = self.worker.snapshot
+        self.render()
+
+    def render(self):
+        self.title = self.snapshot.instant_summary
+        lines = list(self.snapshot.week_summaries)
+        # Update menu with new times
+        with TIMINGS.stage("menu"):
             self.menu.clear()
             self.menu = lines[1:][::-1]  # Sort days in chronological order
             if Config().show_day_worktime:
-                self.menu.add(get_ghost_plot(length=30))
+                self.menu.add(self.snapshot.get_ghost_plot(length=30))
             buttons_with_callbacks = {
                 # The callbacks take a sender arg that we don't use
-                "Plot productivity": discard_args(plot_productivity),
+                "Plot productivity": discard_args(self.worker.plot_productivity),
                 # TODO: Find a way to get an input field for pause and rewrite history
-                "Pause (CLI)": discard_args(pause),
-                "Rewrite history (CLI)": discard_args(rewrite_history_prompt),
+                "Pause (CLI)": discard_args(lambda: pause(self.worker)),
+                "Rewrite history (CLI)": discard_args(lambda: rewrite_history_prompt(self.worker)),
                 "Quit": rumps.quit_application,
             }
             if not Config().show_day_worktime:
@@ -65,12 +79,10 @@ class StatusBarApp(rumps.App):
                 button = rumps.MenuItem(button_name)
                 button.set_callback(callback)
                 self.menu.add(button)
+        with TIMINGS.stage("alerts"):
             self.maybe_send_alert()
-        except Exception as e:
-            self.title = "ERROR"
-            print(e)
-            raise e
 
 
 def start():
+    install_dump_signal_handler()
     StatusBarApp().run()
@@ -1,28 +1,13 @@
-import time
-
-from PyQt5.QtCore import pyqtSignal, pyqtSlot, QThread, Qt  # pylint: disable=no-name-in-module
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, Qt  # pylint: disable=no-name-in-module
 from PyQt5.QtWidgets import QApplication, QLabel, QDesktopWidget  # pylint: disable=no-name-in-module
 
-from worktime_tracker.worktime_tracker import WorktimeTracker
 from worktime_tracker.date_utils import get_current_weekday
-from worktime_tracker.constants import REFRESH_RATE
-
-
-class WorktimeTrackerThread(QThread, WorktimeTracker):
-
-    state_changed = pyqtSignal()
-    has_run = False
-
-    def run(self):
-        while True:
-            state_changed = self.check_state()
-            if state_changed or not self.has_run:
-                self.state_changed.emit()
-                self.has_run = True
-            time.sleep(REFRESH_RATE)
+from worktime_tracker.daemon import get_worker
 
 
 class Window(QLabel):
+    snapshot_published = pyqtSignal()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setWindowTitle("State Tracker")
@@ -43,13 +28,14 @@ class Window(QLabel):
         self.move_upper_right()
 
     def start_thread(self):
-        self.worktime_tracker_thread = WorktimeTrackerThread()
-        self.worktime_tracker_thread.state_changed.connect(self.update_text)
-        self.worktime_tracker_thread.start()
+        # The signal is emitted in the worker thread and update_text() runs in the GUI thread
+        self.worker = get_worker(on_snapshot=self.snapshot_published.emit)
+        self.snapshot_published.connect(self.update_text)
+        self.worker.start()
 
     @pyqtSlot()
     def update_text(self):
-        summaries = self.worktime_tracker_thread.get_week_summaries()
+        summaries = self.worker.snapshot.week_summaries
         self.setText("\n".join(summaries))
         self.set_geometry(n_lines=len(summaries), max_characters=max([len(summary) for summary in summaries]))
 
@@ -0,0 +1,62 @@
+"""Adaptive polling shared by the interfaces.
+
+The state is probed every MIN_PROBE_INTERVAL seconds right after a state change, then the probe interval doubles at
+each probe without change up to REFRESH_RATE (LOCKED_MAX_PROBE_INTERVAL while locked). Rendering the summaries is
+slower than probing so it has its own cadence: right after a state change and then every REFRESH_RATE seconds
+(LOCKED_RENDER_INTERVAL while locked, since the worktime doesn't change).
+"""
+
+import time
+
+from worktime_tracker.constants import REFRESH_RATE
+from worktime_tracker.instrumentation import TIMINGS
+
+MIN_PROBE_INTERVAL = 2
+LOCKED_MAX_PROBE_INTERVAL = 60
+LOCKED_RENDER_INTERVAL = 5 * 60
+
+
+class PollScheduler:
+    def __init__(self, clock=time.monotonic) -> None:
+        self.clock = clock
+        self.state = None
+        self.probe_interval = MIN_PROBE_INTERVAL
+        self.next_probe_time = -float("inf")
+        self.next_render_time = -float("inf")
+
+    def get_max_probe_interval(self) -> float:
+        return LOCKED_MAX_PROBE_INTERVAL if self.state == "locked" else REFRESH_RATE
+
+    def get_render_interval(self) -> float:
+        return LOCKED_RENDER_INTERVAL if self.state == "locked" else REFRESH_RATE
+
+    def on_probe(self, state, now: float) -> bool:
+        """Schedule the next probe after probing state, returns whether the state changed"""
+        state_changed = state != self.state
+        self.state = state
+        if state_changed:
+            self.probe_interval = MIN_PROBE_INTERVAL
+        else:
+            self.probe_interval = min(self.probe_interval * 2, self.get_max_probe_interval())
+        self.next_probe_time = now + self.probe_interval
+        return state_changed
+
+    def tick(self, probe, render) -> float:
+        """Call probe() (which returns the current state) and render() if they are due, returns the number of seconds
+        to wait before the next tick"""
+        now = self.clock()
+        if now >= self.next_probe_time or now >= self.next_render_time:
+            with TIMINGS.cycle():
+                if now >= self.next_probe_time:
+                    with TIMINGS.stage("check_state"):
+                        state_changed = self.on_probe(probe(), now)
+                    if state_changed:
+                        self.next_render_time = now
+                if now >= self.next_render_time:
+                    render()
+                    self.next_render_time = now + self.get_render_interval()
+        return max(min(self.next_probe_time, self.next_render_time) - self.clock(), 0)
+
+    def run(self, probe, render, sleep=time.sleep) -> None:
+        while True:
+            sleep(self.tick(probe, render))
@@ -0,0 +1,258 @@
+"""Yearly segments of the logs file.
+
+Logs of past years are moved out of the active logs file into sealed (read-only) archive segments, one per year, in
+.logs/archive. A manifest records the time range and the first and last states of each segment so that queries only
+open the segments that overlap them, and rewrites and backups only touch the affected segments.
+Segments are not used with the sqlite backend, which already has an index on timestamps.
+"""
+
+import datetime
+import json
+import math
+import os
+import time
+
+from worktime_tracker import backups, binary_logs
+from worktime_tracker.constants import STATES_TYPE
+from worktime_tracker.date_utils import DAY_START_HOUR, get_day_start
+from worktime_tracker.logs import (
+    Log,
+    find_offset_after,
+    get_active_logs_path,
+    get_batch_rewritten_history_logs,
+    is_sqlite_backend,
+    locked_logs_file,
+    parse_log_line,
+    read_last_log,
+    read_log_before_offset,
+    read_logs_from_offset,
+    rewrite_active_logs,
+    write_logs,
+)
+from worktime_tracker.utils import yield_lines
+
+# Years are only sealed after the first days of the next year so that the current and previous days (e.g. the cutoff
+# of the day cache) stay in the active logs file
+ARCHIVE_DELAY = datetime.timedelta(days=7)
+
+
+def get_segment_year(timestamp: float) -> int:
+    return get_day_start(datetime.datetime.fromtimestamp(timestamp)).year
+
+
+def get_segment_start(year: int) -> float:
+    # Segments start at the start of the first day of the year so that days are never split
+    return datetime.datetime(year, 1, 1, DAY_START_HOUR).timestamp()
+
+
+def get_archive_dir():
+    return get_active_logs_path().parent / "archive"
+
+
+def get_segment_path(year: int):
+    logs_path = get_active_logs_path()
+    return get_archive_dir() / f"{logs_path.stem}-{year}{logs_path.suffix}"
+
+
+def get_manifest_path():
+    return get_archive_dir() / f"{get_active_logs_path().name}.manifest.json"
+
+
+def load_manifest() -> dict[int, dict]:
+    """Year -> segment entry with the segment name, time range and first and last states"""
+    manifest_path = get_manifest_path()
+    if is_sqlite_backend() or not manifest_path.exists():
+        return {}
+    with manifest_path.open() as f:
+        return {int(year): entry for year, entry in json.load(f).items()}
+
+
+def save_manifest(manifest: dict[int, dict]) -> None:
+    manifest_path = get_manifest_path()
+    temp_path = manifest_path.with_suffix(".tmp")
+    with temp_path.open("w") as f:
+        json.dump({year: manifest[year] for year in sorted(manifest)}, f, indent=4)
+    temp_path.replace(manifest_path)
+
+
+def read_segment(year: int) -> list[Log]:
+    path = get_segment_path(year)
+    if path.suffix == ".bin":
+        records = binary_logs.read_records(path)
+        states = [binary_logs.decode_state(state_code) for state_code in records["state"].tolist()]
+        return Log.from_parsed_logs(records["timestamp"].tolist(), states)
+    return [parse_log_line(line) for line in yield_lines(path) if line != ""]
+
+
+def write_segment(year: int, logs: list[tuple[float, STATES_TYPE]], manifest: dict[int, dict]) -> None:
+    """Write a sealed segment and its manifest entry (the manifest still needs to be saved)"""
+    path = get_segment_path(year)
+    path.parent.mkdir(exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    if path.suffix == ".bin":
+        binary_logs.write_records(temp_path, logs)
+    else:
+        with temp_path.open("w", encoding="utf8") as f:
+            for timestamp, state in logs:
+                f.write(f"{timestamp}\t{state}\n")
+    os.chmod(temp_path, 0o444)
+    temp_path.replace(path)
+    manifest[year] = {
+        "name": path.name,
+        "first_timestamp": logs[0][0],
+        "last_timestamp": logs[-1][0],
+        "first_state": logs[0][1],
+        "last_state": logs[-1][1],
+        "n_logs": len(logs),
+    }
+
+
+def read_active_logs() -> list[Log]:
+    return [log for _, log in read_logs_from_offset(0)]
+
+
+def is_placeholder_log(log: Log) -> bool:
+    """The log written at the epoch when the logs file is created, it is dropped instead of being archived"""
+    return log.timestamp == 0 and log.state == "locked"
+
+
+def read_first_log() -> Log:
+    """First log of the active logs file that is not the placeholder, without reading the following logs"""
+    for _, log in read_logs_from_offset(0):
+        if not is_placeholder_log(log):
+            return log
+    return None
+
+
+def is_sealable(year: int, last_year: int) -> bool:
+    return year < last_year and time.time() >= get_segment_start(year + 1) + ARCHIVE_DELAY.total_seconds()
+
+
+def seal_segments() -> None:
+    """Move the logs of past years from the active logs file to archive segments"""
+    if is_sqlite_backend():
+        return
+    logs_path = get_active_logs_path()
+    if not logs_path.exists():
+        return
+    # Only the first and last logs are read to check if there is something to seal, which is rarely the case
+    first_log = read_first_log()
+    if first_log is None:
+        return
+    if not is_sealable(get_segment_year(first_log.timestamp), get_segment_year(read_last_log().timestamp)):
+        return
+    with locked_logs_file("r"):
+        logs = [log for log in read_active_logs() if not is_placeholder_log(log)]
+        if len(logs) == 0:
+            return
+        # The segment of the last log is never sealed so that the active logs file is never empty
+        last_year = get_segment_year(logs[-1].timestamp)
+        years = [
+            year for year in sorted({get_segment_year(log.timestamp) for log in logs}) if is_sealable(year, last_year)
+        ]
+        if len(years) == 0:
+            return
+        manifest = load_manifest()
+        for year in years:
+            segment_logs = [(log.timestamp, log.state) for log in logs if get_segment_year(log.timestamp) == year]
+            if year in manifest:
+                segment_logs = [(log.timestamp, log.state) for log in read_segment(year)] + segment_logs
+            write_segment(year, segment_logs, manifest)
+        save_manifest(manifest)
+        write_logs([(log.timestamp, log.state) for log in logs if get_segment_year(log.timestamp) > years[-1]])
+    print(f"Archived the logs of {', '.join(str(year) for year in years)} in {get_archive_dir()}")
+
+
+def read_archived_logs(start_timestamp: float, end_timestamp: float) -> list[Log]:
+    """Archived logs with start_timestamp <= timestamp < end_timestamp, only the overlapping segments are read"""
+    logs = []
+    for year, entry in sorted(load_manifest().items()):
+        if entry["last_timestamp"] < start_timestamp or entry["first_timestamp"] >= end_timestamp:
+            continue
+        logs += [log for log in read_segment(year) if start_timestamp <= log.timestamp < end_timestamp]
+    return logs
+
+
+def read_first_timestamp() -> float:
+    """Timestamp of the first log in the archives or in the active logs file (inf if there are no logs)"""
+    manifest = load_manifest()
+    if len(manifest) > 0:
+        return manifest[min(manifest)]["first_timestamp"]
+    for _, log in read_logs_from_offset(0):
+        return log.timestamp
+    return math.inf
+
+
+def read_log_at_or_before(timestamp: float) -> Log:
+    """Last log with a timestamp lower or equal to timestamp in the active logs file or in the archives"""
+    log = read_log_before_offset(find_offset_after(timestamp))
+    if log is not None:
+        return log
+    for year, entry in sorted(load_manifest().items(), reverse=True):
+        if entry["first_timestamp"] > timestamp:
+            continue
+        if entry["last_timestamp"] <= timestamp:
+            # No need to open the segment
+            return Log(entry["last_timestamp"], entry["last_state"])
+        return [log for log in read_segment(year) if log.timestamp <= timestamp][-1]
+    return None
+
+
+def rewrite_segments(edits: list[tuple[datetime.datetime, datetime.datetime, STATES_TYPE]]) -> None:
+    """Apply validated edits to the segments that overlap the edited range, the other segments are not read.
+
+    Must be called with the lock of the active logs file.
+    """
+    start_datetime, end_datetime = edits[0][0], edits[-1][1]
+    manifest = load_manifest()
+    last_archived_year = max(manifest) if len(manifest) > 0 else -1
+    years = range(get_segment_year(start_datetime.timestamp()), get_segment_year(end_datetime.timestamp()) + 1)
+    archived_years = [year for year in years if year <= last_archived_year]
+    # Logs after the last archived year are in the active logs file
+    rewrite_active = years[-1] > last_archived_year
+    if len(archived_years) == 0:
+        # Only the active logs file changes (and is backed up), the log before the range might still be archived
+        log_before = read_log_at_or_before(start_datetime.timestamp())
+        rewrite_active_logs(edits, log_before=log_before)
+        return
+    logs = []
+    for year in archived_years:
+        if year in manifest:
+            logs += read_segment(year)
+    if rewrite_active:
+        logs += read_active_logs()
+        logs += [Log(time.time(), "locked")]  # So that we take the last interval into account
+    else:
+        # First log after the rewritten segments, it won't be modified
+        logs += [read_log_after_segment(years[-1], manifest)]
+    # Last log before the rewritten segments, it won't be modified either
+    log_before = read_log_at_or_before(start_datetime.timestamp())
+    if log_before is not None and (len(logs) == 0 or log_before < logs[0]):
+        logs = [log_before] + logs
+    new_logs = get_batch_rewritten_history_logs(logs, edits)
+    for year in archived_years:
+        segment_logs = [(timestamp, state) for timestamp, state in new_logs if get_segment_year(timestamp) == year]
+        if year in manifest:
+            backups.backup_file(get_segment_path(year))
+            if len(segment_logs) == 0:
+                get_segment_path(year).unlink()
+                del manifest[year]
+                continue
+        if len(segment_logs) > 0:
+            write_segment(year, segment_logs, manifest)
+    if len(archived_years) > 0:
+        save_manifest(manifest)
+    if rewrite_active:
+        backups.backup_file(get_active_logs_path())
+        write_logs(
+            [(timestamp, state) for timestamp, state in new_logs if get_segment_year(timestamp) > last_archived_year]
+        )
+
+
+def read_log_after_segment(year: int, manifest: dict[int, dict]) -> Log:
+    """First log after the segment of a year"""
+    later_years = [later_year for later_year in manifest if later_year > year]
+    if len(later_years) > 0:
+        entry = manifest[min(later_years)]
+        return Log(entry["first_timestamp"], entry["first_state"])
+    return next(read_logs_from_offset(0))[1]
@@ -1,25 +1,171 @@
+"""Providers of the current state ("work", "personal" or "locked") that is polled by the tracker.
+
+Providers are registered by name with register_state_provider and selected with the "state_provider" config option, by
+default the one of the platform. Static configuration (e.g. space_types.json) is cached between polls and only read
+again when it changes.
+"""
+
+import json
+import os
 import sys
+from functools import lru_cache
 
+from worktime_tracker.config import Config
+from worktime_tracker.constants import SPACE_TYPES_PATH, STATE_PATH, STATES, STATES_TYPE
+from worktime_tracker.utils import get_modification_time
 
-if sys.platform == "darwin":
-    from worktime_tracker.macos.get_space_id import get_current_space_index, is_screen_locked
-elif sys.platform == "win32":
-    from worktime_tracker.windows.get_space_id import get_space_id, is_screen_locked
-else:
-    raise NotImplementedError("OS {sys.platform} is not supported yet")
+STATE_PROVIDERS = {}
 
 
-def get_state():
-    if is_screen_locked():
-        return "locked"
-    if sys.platform == "darwin":
-        space_index = get_current_space_index()
+def register_state_provider(name):
+    def decorator(cls):
+        STATE_PROVIDERS[name] = cls
+        return cls
+
+    return decorator
+
+
+class StateProvider:
+    """Base class of the state providers, get_state() is called on every poll"""
+
+    def get_state(self) -> STATES_TYPE:
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=1)
+def read_space_types(modification_time) -> dict[str, STATES_TYPE]:
+    with open(SPACE_TYPES_PATH, "r", encoding="utf8") as f:
+        return json.load(f)
+
+
+def get_space_types() -> dict[str, STATES_TYPE]:
+    """Space id -> state, read again only when space_types.json is modified"""
+    return read_space_types(get_modification_time(SPACE_TYPES_PATH))
+
+
+@register_state_provider("macos")
+class MacosStateProvider(StateProvider):
+    def __init__(self):
+        from worktime_tracker.macos import get_space_id  # Only available on macOS
+
+        self.get_space_id = get_space_id
+
+    def get_state(self) -> STATES_TYPE:
+        if self.get_space_id.is_screen_locked():
+            return "locked"
         # First space (index 0) is personal, all others are work
-        return "personal" if space_index == 0 else "work"
-    else:
-        # Windows fallback: still uses the old space_types.json approach
-        from worktime_tracker.constants import SPACE_TYPES_PATH
-        import json
-        with open(SPACE_TYPES_PATH, "r", encoding="utf8") as f:
-            space_types = json.load(f)
-        return space_types[get_space_id()]
+        return "personal" if self.get_space_id.get_current_space_index() == 0 else "work"
+
+
+@register_state_provider("windows")
+class WindowsStateProvider(StateProvider):
+    def __init__(self):
+        from worktime_tracker.windows import get_space_id  # Only available on Windows
+
+        self.get_space_id = get_space_id
+
+    def get_state(self) -> STATES_TYPE:
+        if self.get_space_id.is_screen_locked():
+            return "locked"
+        # Windows still uses space_types.json
+        return get_space_types()[self.get_space_id.get_space_id()]
+
+
+@register_state_provider("fake")
+class FakeStateProvider(StateProvider):
+    """Returns scripted states, one per poll, and then keeps returning the last one"""
+
+    def __init__(self, states=("work",)):
+        self.states = list(states)
+        self.n_polls = 0
+
+    def get_state(self) -> STATES_TYPE:
+        state = self.states[min(self.n_polls, len(self.states) - 1)]
+        self.n_polls += 1
+        return state
+
+
+@register_state_provider("file")
+class FileStateProvider(StateProvider):
+    """Reads the state from a file or a named pipe (FIFO), e.g. written by screen lock and workspace hooks on Linux:
+    `echo locked > .logs/state`.
+
+    The last line written is the current state. A regular file is only read again when it is modified, a FIFO is read
+    without blocking and the state stays the same until a new line is written. The state is "locked" until a state was
+    written, invalid states are ignored.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.state = "locked"
+        self.modification_time = None
+        self.fifo_fd = None
+        self.fifo_buffer = b""
+
+    def update_state(self, line: str) -> None:
+        """Set the state written on a line, a malformed line is ignored so that a broken hook doesn't stop the tracker"""
+        state = line.strip()
+        if state not in STATES:
+            print(f"WARNING: Ignoring invalid state {state!r} in {self.path}, the state stays {self.state!r}")
+            return
+        self.state = state
+
+    def read_fifo(self) -> None:
+        if self.fifo_fd is None:
+            self.fifo_fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        while True:
+            try:
+                chunk = os.read(self.fifo_fd, 4096)
+            except BlockingIOError:
+                break
+            if chunk == b"":
+                break
+            self.fifo_buffer += chunk
+        *lines, self.fifo_buffer = self.fifo_buffer.split(b"\n")
+        lines = [line for line in lines if line.strip() != b""]
+        if len(lines) > 0:
+            self.update_state(lines[-1].decode("utf8", errors="replace"))
+
+    def get_state(self) -> STATES_TYPE:
+        if self.fifo_fd is not None or (self.path.exists() and self.path.is_fifo()):
+            self.read_fifo()
+            return self.state
+        modification_time = get_modification_time(self.path)
+        if modification_time is not None and modification_time != self.modification_time:
+            text = self.path.read_text(encoding="utf8", errors="replace")
+            lines = [line for line in text.split("\n") if line.strip() != ""]
+            if len(lines) > 0:
+                self.update_state(lines[-1])
+            self.modification_time = modification_time
+        return self.state
+
+
+def get_default_state_provider_name() -> str:
+    if sys.platform == "darwin":
+        return "macos"
+    if sys.platform == "win32":
+        return "windows"
+    return "file"
+
+
+_state_provider = None
+
+
+def get_state_provider() -> StateProvider:
+    """The provider selected in the config, created on the first poll"""
+    global _state_provider
+    if _state_provider is None:
+        name = Config().state_provider or get_default_state_provider_name()
+        if name not in STATE_PROVIDERS:
+            raise ValueError(f"Unknown state provider {name!r}, available: {', '.join(STATE_PROVIDERS)}")
+        _state_provider = STATE_PROVIDERS[name]()
+    return _state_provider
+
+
+def set_state_provider(state_provider: StateProvider) -> None:
+    global _state_provider
+    _state_provider = state_provider
+
+
+def get_state() -> STATES_TYPE:
+    return get_state_provider().get_state()
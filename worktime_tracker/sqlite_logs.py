@@ -0,0 +1,270 @@
+"""SQLite log storage.
+
+Logs are stored in a table indexed by timestamp so that the last log, time ranges and rewrites only touch the affected
+rows. The database is in WAL mode so that readers don't block the process writing the logs.
+Positions in the logs (the equivalent of byte offsets in the files) are row ids, which are kept in chronological order:
+rows are numbered ID_STRIDE apart so that the logs inserted by a rewrite fit between their neighbours.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from worktime_tracker.utils import yield_lines
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, state TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS logs_timestamp ON logs (timestamp, state);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+"""
+ORDER_BY = "ORDER BY timestamp, id"
+REVERSE_ORDER_BY = "ORDER BY timestamp DESC, id DESC"
+ID_STRIDE = 1 << 20
+
+# Connections are reused by the following calls of the same thread (sqlite connections can't be shared by threads)
+_connections = threading.local()
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    connections = _connections.__dict__
+    if str(path) in connections:
+        connection, inode = connections[str(path)]
+        if path.exists() and path.stat().st_ino == inode:
+            return connection
+        connection.close()  # The database was replaced
+    is_new = not path.exists()
+    # Transactions are handled explicitly
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    if is_new:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+    connections[str(path)] = (connection, path.stat().st_ino)
+    return connection
+
+
+@contextmanager
+def transaction(path: Path):
+    """Write transaction, concurrent writers wait for each other"""
+    connection = connect(path)
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def query(path: Path, sql: str, parameters=()) -> list[tuple]:
+    return connect(path).execute(sql, parameters).fetchall()
+
+
+def _insert_last(connection: sqlite3.Connection, timestamp: float, state: str) -> None:
+    connection.execute(
+        "INSERT INTO logs (id, timestamp, state) VALUES ((SELECT COALESCE(MAX(id), 0) FROM logs) + ?, ?, ?)",
+        (ID_STRIDE, timestamp, state),
+    )
+
+
+def insert_log(path: Path, timestamp: float, state: str) -> None:
+    with transaction(path) as connection:
+        _insert_last(connection, timestamp, state)
+
+
+def maybe_insert_log(path: Path, timestamp: float, state: str) -> bool:
+    """Insert the log only if the state changed, returns whether it was inserted"""
+    with transaction(path) as connection:
+        last_row = connection.execute(f"SELECT state FROM logs {REVERSE_ORDER_BY} LIMIT 1").fetchone()
+        if last_row is not None and last_row[0] == state:
+            return False
+        _insert_last(connection, timestamp, state)
+        return True
+
+
+def read_last_row(path: Path) -> tuple[float, str]:
+    rows = query(path, f"SELECT timestamp, state FROM logs {REVERSE_ORDER_BY} LIMIT 1")
+    return rows[0] if rows else None
+
+
+def reverse_read_rows(path: Path):
+    yield from connect(path).execute(f"SELECT timestamp, state FROM logs {REVERSE_ORDER_BY}")
+
+
+def get_end_position(connection: sqlite3.Connection) -> int:
+    """Position after the last log"""
+    return connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM logs").fetchone()[0]
+
+
+def get_signature(path: Path) -> tuple[int, int]:
+    """(generation, end position), the generation is incremented each time logs are rewritten"""
+    connection = connect(path)
+    generation = connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+    return generation, get_end_position(connection)
+
+
+def find_position_after(path: Path, timestamp: float) -> int:
+    """Position of the first log strictly after timestamp (0 if it is the first log)"""
+    connection = connect(path)
+    if connection.execute("SELECT 1 FROM logs WHERE timestamp <= ? LIMIT 1", (timestamp,)).fetchone() is None:
+        return 0
+    row = connection.execute(f"SELECT id FROM logs WHERE timestamp > ? {ORDER_BY} LIMIT 1", (timestamp,)).fetchone()
+    return get_end_position(connection) if row is None else row[0]
+
+
+def read_rows_from(path: Path, position: int):
+    """Read logs forward starting at a position, yields the position of each log with the log"""
+    for row_id, timestamp, state in connect(path).execute(
+        "SELECT id, timestamp, state FROM logs WHERE id >= ? ORDER BY id", (position,)
+    ):
+        yield row_id, (timestamp, state)
+
+
+def read_row_before(path: Path, position: int) -> tuple[float, str]:
+    rows = query(path, "SELECT timestamp, state FROM logs WHERE id < ? ORDER BY id DESC LIMIT 1", (position,))
+    return rows[0] if rows else None
+
+
+def read_rows_between(path: Path, start_timestamp: float, end_timestamp: float) -> list[tuple[float, str]]:
+    return query(
+        path,
+        f"SELECT timestamp, state FROM logs WHERE timestamp >= ? AND timestamp < ? {ORDER_BY}",
+        (start_timestamp, end_timestamp),
+    )
+
+
+def _bump_generation(connection: sqlite3.Connection) -> None:
+    connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+
+def _get_ids_between(previous_id: int, next_id: int, n_ids: int) -> list[int]:
+    """n_ids increasing ids between previous_id and next_id (None if there is no next row), None if there is no room"""
+    if next_id is None:
+        return [previous_id + ID_STRIDE * (i + 1) for i in range(n_ids)]
+    if next_id - previous_id - 1 < n_ids:
+        return None
+    step = (next_id - previous_id) // (n_ids + 1)
+    return [previous_id + step * (i + 1) for i in range(n_ids)]
+
+
+def _get_inserted_rows(previous_id: int, next_id: int, new_rows: list, new_ids: list) -> list[tuple]:
+    """(id, timestamp, state) of the new rows without id, numbered between their neighbours, None if there is no room"""
+    inserted_rows = []
+    run = []  # Consecutive rows without id
+    for row, row_id in zip(new_rows + [None], new_ids + [next_id]):
+        if row is not None and row_id is None:
+            run.append(row)
+            continue
+        ids = _get_ids_between(previous_id, row_id, len(run))
+        if ids is None:
+            return None
+        inserted_rows += [(run_id, *run_row) for run_id, run_row in zip(ids, run)]
+        run = []
+        previous_id = row_id
+    return inserted_rows
+
+
+def _select_rows_around(connection: sqlite3.Connection, start_timestamp: float, end_timestamp: float) -> list[tuple]:
+    """(id, timestamp, state) of the logs from the last log at or before start_timestamp to the first log after
+    end_timestamp"""
+    return connection.execute(
+        f"""SELECT id, timestamp, state FROM logs
+        WHERE timestamp >= (SELECT COALESCE(MAX(timestamp), -1e308) FROM logs WHERE timestamp <= ?)
+        AND timestamp <= (SELECT COALESCE(MIN(timestamp), 1e308) FROM logs WHERE timestamp > ?)
+        {ORDER_BY}""",
+        (start_timestamp, end_timestamp),
+    ).fetchall()
+
+
+def rewrite_rows_around(path: Path, start_timestamp: float, end_timestamp: float, rewrite, appended_rows=()) -> None:
+    """Replace the logs from the last log at or before start_timestamp to the first log after end_timestamp by
+    rewrite(rows) and append appended_rows, only the logs that changed are deleted or inserted"""
+    with transaction(path) as connection:
+        rows = _select_rows_around(connection, start_timestamp, end_timestamp)
+        new_rows = list(rewrite([(timestamp, state) for _, timestamp, state in rows]))
+        # The rows that didn't change keep their id, the others are deleted
+        old_ids = {}
+        for row_id, timestamp, state in rows:
+            old_ids.setdefault((timestamp, state), []).append(row_id)
+        new_ids = [old_ids[row].pop(0) if len(old_ids.get(row, [])) > 0 else None for row in new_rows]
+        deleted_ids = [row_id for row_ids in old_ids.values() for row_id in row_ids]
+        first_id, last_id = (rows[0][0], rows[-1][0]) if len(rows) > 0 else (1, 0)
+        previous_id, next_id = connection.execute(
+            "SELECT (SELECT COALESCE(MAX(id), 0) FROM logs WHERE id < ?), (SELECT MIN(id) FROM logs WHERE id > ?)",
+            (first_id, last_id),
+        ).fetchone()
+        inserted_rows = _get_inserted_rows(previous_id, next_id, new_rows, new_ids)
+        if inserted_rows is None:
+            # No room left between the neighbours (e.g. many rewrites at the same place), renumber the following rows
+            next_rows = connection.execute(
+                "SELECT timestamp, state FROM logs WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+            connection.execute("DELETE FROM logs WHERE id >= ?", (first_id,))
+            deleted_ids = []
+            inserted_rows = [(previous_id + ID_STRIDE * (i + 1), *row) for i, row in enumerate(new_rows + next_rows)]
+        connection.executemany("DELETE FROM logs WHERE id = ?", [(row_id,) for row_id in deleted_ids])
+        connection.executemany("INSERT INTO logs (id, timestamp, state) VALUES (?, ?, ?)", inserted_rows)
+        for timestamp, state in appended_rows:
+            _insert_last(connection, timestamp, state)
+        _bump_generation(connection)
+
+
+def write_rows(path: Path, rows: list[tuple[float, str]]) -> None:
+    """Overwrite all the logs"""
+    with transaction(path) as connection:
+        connection.execute("DELETE FROM logs")
+        connection.executemany(
+            "INSERT INTO logs (id, timestamp, state) VALUES (?, ?, ?)",
+            [(ID_STRIDE * (i + 1), timestamp, state) for i, (timestamp, state) in enumerate(rows)],
+        )
+        _bump_generation(connection)
+
+
+def get_prefix_fingerprint(path: Path, position: int) -> str:
+    """Hash of the logs before a position"""
+    sha1 = hashlib.sha1()
+    for timestamp, state in query(path, "SELECT timestamp, state FROM logs WHERE id < ? ORDER BY id", (position,)):
+        sha1.update(f"{timestamp}\t{state}\n".encode("utf8"))
+    return sha1.hexdigest()
+
+
+def format_rows(rows: list[tuple[float, str]]) -> bytes:
+    """Logs in the TSV format"""
+    return "".join(f"{timestamp}\t{state}\n" for timestamp, state in rows).encode("utf8")
+
+
+def dump_rows_around(path: Path, start_timestamp: float, end_timestamp: float) -> tuple[bytes, int, int]:
+    """All the logs in the TSV format and the byte range of the logs that rewrite_rows_around replaces (called in its
+    transaction, the dump is the content before the rewrite)"""
+    ids = [row_id for row_id, _, _ in _select_rows_around(connect(path), start_timestamp, end_timestamp)]
+    lines = []
+    size = 0
+    start_offset = end_offset = None
+    for row_id, row in read_rows_from(path, 0):
+        if len(ids) > 0 and row_id == ids[0]:
+            start_offset = size
+        lines.append(format_rows([row]))
+        size += len(lines[-1])
+        if len(ids) > 0 and row_id == ids[-1]:
+            end_offset = size
+    if len(ids) == 0:
+        start_offset = end_offset = size
+    return b"".join(lines), start_offset, end_offset
+
+
+def convert_tsv_to_sqlite(tsv_path: Path, sqlite_path: Path) -> None:
+    rows = []
+    for line in yield_lines(tsv_path):
+        if line == "":
+            continue
+        timestamp, state = line.split("\t")
+        rows.append((float(timestamp), state))
+    write_rows(sqlite_path, rows)
+
+
+def convert_sqlite_to_tsv(sqlite_path: Path, tsv_path: Path) -> None:
+    with open(tsv_path, "wb") as f:
+        for _, row in read_rows_from(sqlite_path, 0):
+            f.write(format_rows([row]))
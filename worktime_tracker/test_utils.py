@@ -11,6 +11,8 @@ def mock_log_file(mocked_logs):
     """
     Context manager to mock log file for testing by changing the global constant LOGS_PATH to a temporary file.
     It will then write the dummy logs to the temporary file.
+    LAST_CHECK_PATH is also moved to the temporary directory (the day cache, archive and backups are next to LOGS_PATH)
+    so that tests never touch the real .logs/ directory.
     Also clears the History singleton and mocks time.time() to return a timestamp
     just after the last mocked log (so the dummy "now" interval doesn't span years).
     """
@@ -23,6 +25,7 @@ def mock_log_file(mocked_logs):
         History.clear()
         with (
             patch("worktime_tracker.logs.LOGS_PATH", mocked_logs_path),
+            patch("worktime_tracker.logs.LAST_CHECK_PATH", Path(temp_dir) / "last_check.txt"),
             patch("worktime_tracker.history.time.time", return_value=fake_timestamp),
         ):
             for log in mocked_logs:
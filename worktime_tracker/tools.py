@@ -12,23 +12,27 @@ from tqdm import tqdm
 
 from worktime_tracker.constants import WORK_STATES
 from worktime_tracker.date_utils import (
-    coerce_to_datetime,
+    DAY_START_HOUR,
     get_current_day_end,
     get_current_day_start,
     get_current_weekday,
     parse_time,
 )
+from worktime_tracker.discretizer import get_bin_edges
 from worktime_tracker.history import History
-from worktime_tracker.logs import rewrite_history
 from worktime_tracker.utils import seconds_to_human_readable
 from worktime_tracker.worktime_tracker import (
     WorktimeTracker,
+    get_dont_count_days,
     get_worktime_between,
     get_worktime_from_weekday,
+    get_worktime_per_bin,
 )
 
 
-def rewrite_history_prompt():
+def prompt_history_edit() -> tuple[datetime.datetime, datetime.datetime, str]:
+    """Ask the user for an edit (start_datetime, end_datetime, new_state)"""
+
     def parse_input(input_str, now):
         """
         Parse input in the format "hh:mm +- day_offset" and return a datetime
@@ -51,35 +55,30 @@ def rewrite_history_prompt():
     start_datetime = parse_input(start, now)
     end_datetime = parse_input(end, now)
     new_state = input("New state?: ")
-    rewrite_history(start_datetime, end_datetime, new_state)
+    return start_datetime, end_datetime, new_state
+
+
+def rewrite_history_prompt(worker):
+    """Ask the user for an edit and apply it through the worker (the daemon when it is running)"""
+    worker.rewrite_history([prompt_history_edit()])
 
 
-def get_productivity_plot(start_datetime: datetime, end_datetime: datetime):
+def get_productivity_plot(start_datetime: datetime, end_datetime: datetime, bin_size: float = 15 * 60):
     def format_timestamp(timestamp):
         d = datetime.datetime.fromtimestamp(timestamp)
         # Day of the week, hour, minute
         return f"{d.strftime('%a %Hh%M')}"
 
-    start_timestamp = start_datetime.timestamp()
-    end_timestamp = end_datetime.timestamp()
-    bin_size = 15 * 60
-    n_bins = int((end_timestamp - start_timestamp) / bin_size)
-    end_timestamp = start_timestamp + n_bins * bin_size
-    bin_starts = np.arange(start_timestamp, end_timestamp, bin_size)
-    bin_ends = bin_starts + bin_size
-    table = []
-    for bin_start, bin_end in zip(bin_starts, bin_ends):
-        table.append(
-            {
-                # Very slow for old logs, would be better to use Discretizer
-                "worktime": get_worktime_between(coerce_to_datetime(bin_start), coerce_to_datetime(bin_end)),
-                "bin_start": bin_start,
-                "bin_end": bin_end,
-                "formatted_start_time": format_timestamp(bin_start),
-            }
-        )
+    bin_edges = get_bin_edges(start_datetime.timestamp(), end_datetime.timestamp(), bin_size)
+    df = pd.DataFrame(
+        {
+            "worktime": get_worktime_per_bin(bin_edges),
+            "bin_start": bin_edges[:-1],
+            "bin_end": bin_edges[1:],
+            "formatted_start_time": [format_timestamp(bin_start) for bin_start in bin_edges[:-1]],
+        }
+    )
     total_worktime = get_worktime_between(start_datetime, end_datetime)
-    df = pd.DataFrame(table).sort_values("bin_start")
     df["worktime_m"] = df["worktime"] / 60
     fig = px.histogram(
         df,
@@ -97,60 +96,69 @@ def get_todays_productivity_plot():
     return get_productivity_plot(start_datetime, end_datetime)
 
 
-def download_productivity_plot(path=None):
+def download_productivity_plot(path=None, fig=None):
     if path is None:
         # Temporary path
         path = tempfile.mktemp(suffix=".png")
-    get_todays_productivity_plot().write_image(path)
+    if fig is None:
+        fig = get_todays_productivity_plot()
+    fig.write_image(path)
     return path
 
 
-def plot_productivity():
-    productivity_plot_path = download_productivity_plot()
+def plot_productivity(fig=None):
+    """Open today's productivity plot (fig, e.g. computed by the daemon, or computed here)"""
+    productivity_plot_path = download_productivity_plot(fig=fig)
     # TODO: Only works on macos for now
     subprocess.run(["open", productivity_plot_path], check=True)
 
 
+# Calendar columns that only depend on the date, formatted once per day instead of once per hour
+DAILY_STRING_COLUMNS_FORMATS = {
+    "year_month": "Y:%y %b",
+    "year_week": "Y:%y w:%V",
+    "year_day": "Y:%y %b d:%d",
+    "formatted_date": "%Y-%m-%d",
+    "dow": "%A",
+}
+
+
 @lru_cache()
 def get_hourly_worktime_df():
     history = History(dont_read_before=None)
-    first_datetime = history.all_intervals[0].start_datetime.replace(minute=0, second=0, microsecond=0)
+    first_datetime = datetime.datetime.fromtimestamp(history.store.starts[0]).replace(minute=0, second=0, microsecond=0)
     last_datetime = (datetime.datetime.now() + datetime.timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
-    bin_start_datetime = first_datetime
-    records = []
-    i = 0
-    pbar = tqdm()
-    while bin_start_datetime < last_datetime:
-        bin_end_datetime = bin_start_datetime + datetime.timedelta(hours=1)
-        worktime = get_worktime_between(bin_start_datetime, bin_end_datetime)
-        records.append(
-            {
-                "worktime": worktime / 3600,
-                "start_datetime": bin_start_datetime,
-                "year": bin_start_datetime.year,
-                "month": bin_start_datetime.month,
-                "day": bin_start_datetime.day,
-                "hour": bin_start_datetime.hour,
-                "year_month": bin_start_datetime.strftime("Y:%y %b"),
-                "year_week": bin_start_datetime.strftime("Y:%y w:%V"),
-                "year_day": bin_start_datetime.strftime("Y:%y %b d:%d"),
-                "formatted_date": bin_start_datetime.strftime("%Y-%m-%d"),
-                "dow": bin_start_datetime.strftime("%A"),
-            }
-        )
-        bin_start_datetime = bin_end_datetime
-        pbar.update(1)
-    return pd.DataFrame(records)
+    edge_datetimes = pd.date_range(first_datetime, last_datetime, freq=pd.Timedelta(hours=1))
+    # Local datetimes need to be converted one by one to take daylight saving time into account
+    bin_edges = np.array([edge_datetime.timestamp() for edge_datetime in edge_datetimes.to_pydatetime()])
+    start_datetimes = edge_datetimes[:-1]
+    worktimes = history.get_worktime_per_bin(bin_edges, dont_count_days=get_dont_count_days())
+    df = pd.DataFrame(
+        {
+            "worktime": worktimes / 3600,
+            "start_datetime": start_datetimes,
+            "year": start_datetimes.year,
+            "month": start_datetimes.month,
+            "day": start_datetimes.day,
+            "hour": start_datetimes.hour,
+        }
+    )
+    day_codes, dates = pd.factorize(start_datetimes.normalize())
+    for column, date_format in DAILY_STRING_COLUMNS_FORMATS.items():
+        df[column] = np.asarray(dates.strftime(date_format))[day_codes]
+    return df
 
 
 def get_daily_worktime_df():
     df_hourly = get_hourly_worktime_df()
     daily_columns = [col for col in df_hourly.columns if col not in ["hour", "start_datetime", "worktime"]]
-    return (
-        df_hourly.groupby(daily_columns)[["start_datetime", "worktime"]]
-        .agg({"start_datetime": "min", "worktime": "sum"})
-        .reset_index()
-    )
+    # Group on an integer key instead of the formatted strings
+    day_keys = df_hourly["year"] * 10000 + df_hourly["month"] * 100 + df_hourly["day"]
+    grouped = df_hourly.groupby(day_keys, sort=True)
+    df_daily = grouped[daily_columns].first()
+    df_daily["start_datetime"] = grouped["start_datetime"].min()
+    df_daily["worktime"] = grouped["worktime"].sum()
+    return df_daily.reset_index(drop=True)
 
 
 def create_ghost_plot(your_position, ghost_position, length=100):
@@ -181,32 +189,64 @@ def get_average_worktime_at(days, dt_time):
     return sum(worktimes_at) / len(worktimes_at)
 
 
-def get_quantile_worktime_at(days, dt_time, quantile):
-    worktimes_at = get_worktimes_at(days, dt_time)
+def get_work_days_worktimes_at(dt_time, weekday_indices=(1, 2, 3, 4, 5)):
+    """Worktimes at dt_time (at minute resolution, seconds are ignored) of the work days of the given weekdays (0 is
+    Sunday).
+
+    Same as get_worktimes_at on all the days of the history but reads a column of the worktime curves.
+    """
+    day_ordinals, curves = History().get_worktime_curves()
+    # Ordinals modulo 7 are the weekday indices, work days have more than 4 hours of work
+    is_work_day = np.isin(day_ordinals % 7, weekday_indices) & (curves[:, -1] > 4 * 3600)
+    minute = ((dt_time.hour - DAY_START_HOUR) % 24) * 60 + dt_time.minute
+    if minute == 0:
+        # Start of the day
+        return np.zeros(np.count_nonzero(is_work_day))
+    # The curves give the worktime at the end of each minute, i.e. at the start of the next one
+    return curves[is_work_day, minute - 1]
+
+
+def get_quantile_worktime_at(dt_time, quantile, weekday_indices=(1, 2, 3, 4, 5)):
+    worktimes_at = get_work_days_worktimes_at(dt_time, weekday_indices)
     if len(worktimes_at) == 0:
         print(f"WARNING: No worktimes at {dt_time}")
         return 0
     return np.quantile(worktimes_at, quantile)
 
 
-def get_ghost_plot(length=100):
+def get_ghost_plot_positions():
+    """Positions of you and of the ghost between 0 and 1 (today's target), None on days without target"""
     # TODO: Take timezone into account
-    days = History().days
     target = WorktimeTracker.targets[get_current_weekday()]
     if target == 0:
-        return ""
+        return None
     # Higher quantile = ghost calibrated on your best days, lower quantile = ghost calibrated on your worst days
-    ghost_worktime = get_quantile_worktime_at(days, datetime.datetime.now().time(), quantile=0.75)
+    ghost_worktime = get_quantile_worktime_at(datetime.datetime.now().time(), quantile=0.75)
     ghost_position = min(ghost_worktime / target, 1)
     your_worktime = get_worktime_from_weekday(get_current_weekday())
     your_position = min(your_worktime / target, 1)
+    return your_position, ghost_position
+
+
+def get_ghost_plot(length=100):
+    positions = get_ghost_plot_positions()
+    if positions is None:
+        return ""
+    your_position, ghost_position = positions
     return create_ghost_plot(your_position=your_position, ghost_position=ghost_position, length=length)
 
 
-def pause():
-    # TODO: Use the current time to check time left (sleep is not accurate because tmux pauses python execution)
+def pause(worker):
+    """Stop the polling of the worker (of the daemon when it is running) for a duration entered by the user, the current
+    state is kept meanwhile"""
     duration = parse_time(input("Enter a duration to pause during a certain time (e.g. 2h30).\nDuration: "))
     if duration is not None:
         print(f"Pausing for {duration}.")
-        for _ in tqdm(range(duration.seconds)):
-            time.sleep(1)
+        worker.pause(duration.total_seconds())
+        try:
+            # Only shows the progress, the worker resumes by itself
+            for _ in tqdm(range(int(duration.total_seconds()))):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.pause(0)
+            print("Resumed.")
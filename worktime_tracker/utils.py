@@ -61,6 +61,10 @@ def yield_lines(filepath):
             yield line.strip("\n")
 
 
+def get_modification_time(path):
+    return path.stat().st_mtime_ns if path.exists() else None
+
+
 def yield_lines_without_comments(filepath):
     for line in yield_lines(filepath):
         line, *_ = line.split("#", 1)
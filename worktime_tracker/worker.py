@@ -0,0 +1,160 @@
+"""Background worker that polls the state and computes the summaries for the interfaces.
+
+After each render of the scheduler, the worker publishes an immutable Snapshot. The interfaces read the last snapshot
+(a single reference, no lock needed) so that their UI loop never waits for the History computations. Anything else that
+reads or modifies the logs or the History (e.g. rewriting history) must hold the lock of the worker, which is only held
+for the duration of the operation (pausing doesn't hold it).
+"""
+
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from worktime_tracker.constants import STATES_TYPE
+from worktime_tracker.instrumentation import TIMINGS
+from worktime_tracker.logs import rewrite_history_batch
+from worktime_tracker.scheduler import PollScheduler
+from worktime_tracker.tools import create_ghost_plot, get_ghost_plot_positions, plot_productivity
+from worktime_tracker.worktime_tracker import (
+    WorktimeTracker,
+    get_current_rest_time,
+    get_current_work_streak,
+    get_work_ratio_since_timestamp,
+)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int  # Incremented at each snapshot
+    timestamp: float
+    state: STATES_TYPE
+    week_summaries: tuple[str, ...]
+    instant_summary: str
+    ghost_plot_positions: tuple[float, float]  # None on days without target
+    work_streak: float
+    rest_time: float
+    work_ratio_last_half_hour: float
+
+    def get_ghost_plot(self, length: int = 100) -> str:
+        if self.ghost_plot_positions is None:
+            return ""
+        your_position, ghost_position = self.ghost_plot_positions
+        return create_ghost_plot(your_position=your_position, ghost_position=ghost_position, length=length)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, snapshot_dict: dict) -> "Snapshot":
+        # Tuples are lists in JSON
+        snapshot_dict = dict(snapshot_dict, week_summaries=tuple(snapshot_dict["week_summaries"]))
+        if snapshot_dict["ghost_plot_positions"] is not None:
+            snapshot_dict["ghost_plot_positions"] = tuple(snapshot_dict["ghost_plot_positions"])
+        return cls(**snapshot_dict)
+
+
+class SnapshotSource(threading.Thread):
+    """Thread that publishes snapshots for the interfaces, on_snapshot() is called in the thread after each snapshot"""
+
+    def __init__(self, on_snapshot=None) -> None:
+        super().__init__(daemon=True)
+        self.on_snapshot = on_snapshot
+        self.snapshot = None
+        self.error = None
+        self._published = threading.Condition()
+        self._stopped = threading.Event()
+
+    def publish_snapshot(self, snapshot: Snapshot) -> None:
+        with self._published:
+            self.snapshot = snapshot
+            self._published.notify_all()
+        if self.on_snapshot is not None:
+            self.on_snapshot()
+
+    def fail(self, error: Exception) -> None:
+        with self._published:
+            self.error = error
+            self._published.notify_all()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def wait_for_new_snapshot(self, snapshot: Snapshot = None, timeout: float = None) -> Snapshot:
+        """Wait until a snapshot other than snapshot is published and return it (the last snapshot on timeout)"""
+        with self._published:
+            self._published.wait_for(lambda: self.snapshot is not snapshot or self.error is not None, timeout)
+            if self.error is not None:
+                raise RuntimeError("The tracker worker failed") from self.error
+            return self.snapshot
+
+
+class TrackerWorker(SnapshotSource):
+    def __init__(self, on_snapshot=None) -> None:
+        super().__init__(on_snapshot=on_snapshot)
+        self.worktime_tracker = WorktimeTracker()
+        self.scheduler = PollScheduler()
+        self.lock = threading.RLock()
+        self.n_snapshots = 0
+        self.paused_until = -float("inf")  # time.monotonic() at which the polling resumes
+        self._wakeup = threading.Event()
+
+    def compute_snapshot(self) -> Snapshot:
+        with TIMINGS.stage("summaries"):
+            week_summaries = tuple(self.worktime_tracker.get_week_summaries())
+        with TIMINGS.stage("instant summary"):
+            instant_summary = self.worktime_tracker.get_instant_summary()
+        with TIMINGS.stage("ghost plot"):
+            ghost_plot_positions = get_ghost_plot_positions()
+        self.n_snapshots += 1
+        return Snapshot(
+            version=self.n_snapshots,
+            timestamp=time.time(),
+            state=self.worktime_tracker.current_state,
+            week_summaries=week_summaries,
+            instant_summary=instant_summary,
+            ghost_plot_positions=ghost_plot_positions,
+            work_streak=get_current_work_streak(),
+            rest_time=get_current_rest_time(),
+            work_ratio_last_half_hour=get_work_ratio_since_timestamp(time.time() - 3600 / 2),
+        )
+
+    def publish(self) -> None:
+        self.publish_snapshot(self.compute_snapshot())
+
+    @property
+    def is_paused(self) -> bool:
+        return time.monotonic() < self.paused_until
+
+    def pause(self, duration: float) -> None:
+        """Stop polling for duration seconds (0 resumes), the current state is kept meanwhile"""
+        self.paused_until = time.monotonic() + duration
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        super().stop()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        delay = 0
+        while True:
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                with self.lock:
+                    if self.is_paused:
+                        delay = self.paused_until - time.monotonic()
+                    else:
+                        delay = self.scheduler.tick(self.worktime_tracker.probe_state, self.publish)
+            except Exception as e:
+                self.fail(e)
+                raise
+
+    def rewrite_history(self, edits) -> None:
+        with self.lock:
+            rewrite_history_batch(edits)
+
+    def plot_productivity(self) -> None:
+        with self.lock:
+            plot_productivity()
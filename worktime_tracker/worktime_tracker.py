@@ -3,6 +3,8 @@ from datetime import datetime
 from datetime import timedelta
 from functools import lru_cache
 
+import numpy as np
+
 from worktime_tracker.config import Config
 from worktime_tracker.constants import DONT_COUNT_DAYS_PATH, WORK_STATES, DAYS_OFF_PATH
 from worktime_tracker.date_utils import (
@@ -16,18 +18,29 @@ from worktime_tracker.date_utils import (
     get_weekday_start_and_end,
     get_year_start,
 )
+from worktime_tracker.instrumentation import TIMINGS
 from worktime_tracker.logs import Log, maybe_write_log, read_last_check_timestamp, read_last_log, write_last_check
+from worktime_tracker.segments import seal_segments
 from worktime_tracker.spaces import get_state
-from worktime_tracker.utils import seconds_to_human_readable, yield_lines_without_comments
+from worktime_tracker.utils import get_modification_time, seconds_to_human_readable, yield_lines_without_comments
 from worktime_tracker.history import History
 
 
-@lru_cache
+def get_days_off_signature():
+    """Changes when the days off or the "don't count" days are edited"""
+    return get_modification_time(DAYS_OFF_PATH), get_modification_time(DONT_COUNT_DAYS_PATH)
+
+
 def get_days_off():
     """Days off are used to set the target of days off to 0.
 
     Returns a dict of dates to day off proportion (e.g. 1 means full day off, 0.5 half a day off, 0 not a day off)
     """
+    return read_days_off(get_modification_time(DAYS_OFF_PATH))
+
+
+@lru_cache(maxsize=1)
+def read_days_off(modification_time):  # The modification time is only used to invalidate the cache
     days_off = {}
     if not DAYS_OFF_PATH.exists():
         return days_off
@@ -38,9 +51,13 @@ def get_days_off():
     return days_off
 
 
-@lru_cache
 def get_dont_count_days():
     """``Don't count" days are used to remove some days from the worktime tracker entirely (e.g. conference days so that they don't count as undertime)."""
+    return read_dont_count_days(get_modification_time(DONT_COUNT_DAYS_PATH))
+
+
+@lru_cache(maxsize=1)
+def read_dont_count_days(modification_time):
     # TODO: Not used yet
     dont_count_days = []
     if not DONT_COUNT_DAYS_PATH.exists():
@@ -58,6 +75,12 @@ def get_worktime_between(start_datetime: datetime, end_datetime: datetime):
     return history.get_worktime_between(start_datetime, end_datetime, dont_count_days=get_dont_count_days())
 
 
+def get_worktime_per_bin(bin_edges):
+    """Worktime in each bin between consecutive bin_edges (timestamps)"""
+    history = History()  # Singleton
+    return history.get_worktime_per_bin(bin_edges, dont_count_days=get_dont_count_days())
+
+
 def maybe_fix_unfinished_work_state():
     """If the app was killed during a work state, it will count everything from this moment as work.
     We want to fix it if this is the case"""
@@ -88,10 +111,9 @@ def get_todays_worktime():
 
 
 def get_worktime_target_from_datetime(dt):
-    if dt in get_dont_count_days():
+    if dt.date() in get_dont_count_days():
         return 0
-    if dt.date() not in [day.date for day in History().days if day.worktime > 0]:
-        # TODO: If that's too slow we can only compare to the oldest day in the history
+    if dt.date().toordinal() not in History().get_worked_ordinals():
         # Don't consider days that were not worked
         return 0
     # 1 means full day off, 0.5 half a day off, 0 not a day off
@@ -100,10 +122,8 @@ def get_worktime_target_from_datetime(dt):
 
 
 def get_worktime_target_between(start_datetime, end_datetime):
-    start_datetime = get_day_start(start_datetime)
-    end_datetime = get_day_start(end_datetime)  # Does not include the target of the last day
-    day_interval = (end_datetime - start_datetime).days
-    return sum(get_worktime_target_from_datetime(start_datetime + timedelta(days=i)) for i in range(day_interval))
+    # Does not include the target of the last day
+    return TARGET_TABLE.get_target_between(get_day_start(start_datetime), get_day_start(end_datetime))
 
 
 def get_overtime_between(start_datetime, end_datetime):
@@ -112,6 +132,104 @@ def get_overtime_between(start_datetime, end_datetime):
     return worktime - target
 
 
+class PastDaysOvertime:
+    """Overtime of each day that is over, so that the overtime summaries don't recompute the worktime and the target
+    of every day of the period at each refresh.
+
+    The cached overtimes are dropped when the worktime of past days can change (e.g. logs rewritten) or when the days
+    off are edited.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._version = None
+        self._day_overtimes = {}  # Date -> overtime of the day
+
+    def get_overtime_between(self, start_datetime, end_datetime):
+        """Overtime between the starts of two days, the days must be over"""
+        start_datetime = get_day_start(start_datetime)
+        end_datetime = get_day_start(end_datetime)
+        assert end_datetime <= get_day_start(), f"The day starting at {end_datetime} is not over"
+        version = (History().get_past_days_version(), get_days_off_signature())
+        if version != self._version:
+            self.clear()
+            self._version = version
+        overtime = 0
+        day_start = start_datetime
+        while day_start < end_datetime:
+            date = day_start.date()
+            if date not in self._day_overtimes:
+                self._day_overtimes[date] = get_overtime_between(day_start, day_start + timedelta(days=1))
+            overtime += self._day_overtimes[date]
+            day_start += timedelta(days=1)
+        return overtime
+
+
+PAST_DAYS_OVERTIME = PastDaysOvertime()
+
+
+class TargetTable:
+    """Worktime target of each day of the history, with the days off and the days that were not worked already
+    taken into account.
+
+    The targets are stored as prefix sums so that the target of a range of days is the difference of two elements.
+    The table is rebuilt when the worked days, the days off or the targets change.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self._version = None
+        self._first_ordinal = 0
+        # _cumulative_targets[i] is the total target of the days before the day _first_ordinal + i
+        self._cumulative_targets = np.zeros(1)
+
+    def _build(self, worked_ordinals: set[int]) -> None:
+        if len(worked_ordinals) == 0:
+            self.clear()
+            return
+        self._first_ordinal = min(worked_ordinals)
+        ordinals = np.arange(self._first_ordinal, max(worked_ordinals) + 1)
+        # Ordinals modulo 7 are the weekday indices (0 is Sunday)
+        targets = np.array(WorktimeTracker.targets, dtype=np.float64)[ordinals % 7]
+        # Days that were not worked don't have a target
+        targets[~np.isin(ordinals, list(worked_ordinals))] = 0
+        # 1 means full day off, 0.5 half a day off, 0 not a day off
+        for date, proportion in get_days_off().items():
+            if ordinals[0] <= date.toordinal() <= ordinals[-1]:
+                targets[date.toordinal() - self._first_ordinal] *= 1 - proportion
+        for date in get_dont_count_days():
+            if ordinals[0] <= date.toordinal() <= ordinals[-1]:
+                targets[date.toordinal() - self._first_ordinal] = 0
+        self._cumulative_targets = np.concatenate([[0], np.cumsum(targets)])
+
+    def get_target_between(self, start_day_start, end_day_start):
+        """Target of the days starting in [start_day_start, end_day_start)"""
+        history = History()
+        worked_ordinals = history.get_worked_ordinals()
+        version = (
+            history.generation,
+            history.worked_days_version,
+            get_days_off_signature(),
+            tuple(WorktimeTracker.targets),
+        )
+        if version != self._version:
+            self._build(worked_ordinals)
+            self._version = version
+        n_days = len(self._cumulative_targets) - 1
+        start_index = min(max(start_day_start.date().toordinal() - self._first_ordinal, 0), n_days)
+        end_index = min(max(end_day_start.date().toordinal() - self._first_ordinal, 0), n_days)
+        if end_index <= start_index:
+            return 0
+        return float(self._cumulative_targets[end_index] - self._cumulative_targets[start_index])
+
+
+TARGET_TABLE = TargetTable()
+
+
 class WorktimeTracker:
     # TODO: We should remove this class entirely
 
@@ -127,6 +245,7 @@ class WorktimeTracker:
 
     def __init__(self):
         maybe_fix_unfinished_work_state()
+        seal_segments()
 
     @staticmethod
     def is_work_state(state):
@@ -139,14 +258,22 @@ class WorktimeTracker:
     def check_state(self):
         """Checks the current state and update the logs. Returns a boolean of whether the state changed or not"""
         # TODO: We should split the writing logic and the state checking logic
-        last_log = read_last_log()
-        timestamp = time.time()
-        write_last_check(timestamp)
-        state = get_state()
-        maybe_write_log(Log(timestamp, state))
+        with TIMINGS.stage("check_state log read"):
+            last_log = read_last_log()
+            timestamp = time.time()
+            write_last_check(timestamp)
+        with TIMINGS.stage("get_state"):
+            state = get_state()
+        with TIMINGS.stage("check_state log write"):
+            maybe_write_log(Log(timestamp, state))
         print(f"State: {state}, last state: {last_log.state}")
         return state != last_log.state
 
+    def probe_state(self):
+        """Checks the current state and update the logs. Returns the current state"""
+        self.check_state()
+        return self.current_state
+
     def get_weekday_summary(self, weekday_idx):
         weekday = WEEKDAYS[weekday_idx]
         worktime = get_worktime_from_weekday(weekday_idx)
@@ -155,15 +282,15 @@ class WorktimeTracker:
         return f"{weekday[:3]}: {int(100 * ratio)}% ({seconds_to_human_readable(worktime)})"
 
     def get_week_overtime_summary(self):
-        overtime = get_overtime_between(get_week_start(), get_day_start())
+        overtime = PAST_DAYS_OVERTIME.get_overtime_between(get_week_start(), get_day_start())
         return f"Week overtime: {seconds_to_human_readable(overtime)}"
 
     def get_month_overtime_summary(self):
-        overtime = get_overtime_between(get_month_start(), get_day_start())
+        overtime = PAST_DAYS_OVERTIME.get_overtime_between(get_month_start(), get_day_start())
         return f"Month overtime: {seconds_to_human_readable(overtime)}"
 
     def get_year_overtime_summary(self):
-        overtime = get_overtime_between(get_year_start(), get_day_start())
+        overtime = PAST_DAYS_OVERTIME.get_overtime_between(get_year_start(), get_day_start())
         return f"Year overtime: {seconds_to_human_readable(overtime)}"
 
     def get_instant_summary(self):